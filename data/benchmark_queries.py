@@ -0,0 +1,184 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from explain_queries import classify_plan, explain
+from notebook_queries import load_notebook_queries
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.25
+# Differences below this are timer noise, even when the ratio looks large
+DEFAULT_MIN_DELTA_MS = 1.0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark the notebook queries and compare results files.')
+    parser.add_argument('--db', action='append',
+                        help='database to benchmark, repeat for several scale factors (default: data/ecommerce.db)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'timed runs per query after one warm-up run (default: {DEFAULT_REPEAT})')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'),
+                        help='compare two results files instead of running the benchmark')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'p50 ratio counted as a regression (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help=f'ignore p50 changes smaller than this (default: {DEFAULT_MIN_DELTA_MS})')
+    args = parser.parse_args()
+    if args.repeat <= 0:
+        parser.error('--repeat must be positive')
+    if args.compare and (args.db or args.output):
+        parser.error('--compare only reads results files')
+    return args
+
+# ============================================
+# RUN
+# ============================================
+
+def describe_database(conn, db_path):
+    cursor = conn.cursor()
+    counts = {table: cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+              for table in ('customers', 'orders', 'order_items', 'reviews')}
+    index_count = cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchone()[0]
+    return {
+        'db': db_path,
+        # Databases are matched by file name when comparing, so results from other machines line up
+        'label': os.path.basename(db_path),
+        'size_bytes': os.path.getsize(db_path),
+        'row_counts': counts,
+        'secondary_indexes': index_count,
+    }
+
+def time_query(conn, sql, repeat):
+    # One warm-up run fills the page cache, then every run fetches the full result like pandas does
+    rows = conn.execute(sql).fetchall()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings, len(rows)
+
+def benchmark_database(db_path, queries, repeat):
+    conn = connect_partitioned(db_path)
+    result = describe_database(conn, db_path)
+    result['queries'] = {}
+
+    for name, sql in queries:
+        plan = explain(conn, sql)
+        timings, row_count = time_query(conn, sql, repeat)
+        p50, p90, p99 = np.percentile(timings, [50, 90, 99]).tolist()
+        result['queries'][name] = {
+            'rows': row_count,
+            'min_ms': min(timings),
+            'mean_ms': sum(timings) / len(timings),
+            'p50_ms': p50,
+            'p90_ms': p90,
+            'p99_ms': p99,
+            # Plan shape: access per fact table loop, plus the raw plan for reading diffs
+            'access': sorted({f'{table} {access}' for _, table, access in classify_plan(sql, plan)}),
+            'plan': [detail for _, _, _, detail in plan],
+        }
+        print(f"   {name}: p50 {p50:.2f} ms, p90 {p90:.2f} ms, {row_count} rows")
+
+    conn.close()
+    return result
+
+def run_benchmark(db_paths, repeat):
+    queries = load_notebook_queries()
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'repeat': repeat,
+        'query_count': len(queries),
+        'databases': [],
+    }
+    for db_path in db_paths:
+        print(f"\n[*] Benchmarking {len(queries)} queries on {db_path} ({repeat} runs each)...")
+        started = time.perf_counter()
+        results['databases'].append(benchmark_database(db_path, queries, repeat))
+        print(f"[+] {db_path} done in {time.perf_counter() - started:.1f}s")
+    return results
+
+# ============================================
+# COMPARE
+# ============================================
+
+def compare_results(baseline, candidate, threshold, min_delta_ms):
+    # Returns (regressions, notes): slower p50 and new full scans are regressions,
+    # changed row counts and plans are only reported because they follow data and schema changes
+    regressions = []
+    notes = []
+    baseline_dbs = {db['label']: db for db in baseline['databases']}
+
+    for db in candidate['databases']:
+        old_db = baseline_dbs.get(db['label'])
+        if old_db is None:
+            notes.append(f"{db['label']}: not in the baseline")
+            continue
+
+        for name, new in db['queries'].items():
+            old = old_db['queries'].get(name)
+            key = f"{db['label']} {name}"
+            if old is None:
+                notes.append(f"{key}: new query")
+                continue
+
+            ratio = new['p50_ms'] / max(old['p50_ms'], 1e-9)
+            if ratio > threshold and new['p50_ms'] - old['p50_ms'] > min_delta_ms:
+                regressions.append(f"{key}: p50 {old['p50_ms']:.2f} -> {new['p50_ms']:.2f} ms ({ratio:.2f}x)")
+
+            new_full_scans = {access for access in new['access'] if access.endswith('full scan')} - set(old['access'])
+            if new_full_scans:
+                regressions.append(f"{key}: new {', '.join(sorted(new_full_scans))}")
+            elif new['plan'] != old['plan']:
+                notes.append(f"{key}: plan changed")
+
+            if new['rows'] != old['rows']:
+                notes.append(f"{key}: rows {old['rows']} -> {new['rows']}")
+
+        for name in old_db['queries'].keys() - db['queries'].keys():
+            notes.append(f"{db['label']} {name}: missing from the candidate")
+    return regressions, notes
+
+def main():
+    args = parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            candidate = json.load(f)
+
+        print(f"[*] Comparing {args.compare[1]} against {args.compare[0]} (threshold {args.threshold:g}x)...")
+        regressions, notes = compare_results(baseline, candidate, args.threshold, args.min_delta_ms)
+        for note in notes:
+            print(f"[*] {note}")
+        for regression in regressions:
+            print(f"[!] {regression}")
+        if regressions:
+            print(f"\n[!] {len(regressions)} regressions")
+            sys.exit(1)
+        print("\n[+] No regressions!")
+        return
+
+    results = run_benchmark(args.db or ['data/ecommerce.db'], args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n[+] Results written to {args.output}")
+
+if __name__ == '__main__':
+    main()
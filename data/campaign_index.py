@@ -0,0 +1,77 @@
+import bisect
+from datetime import date
+
+import numpy as np
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def to_epoch_day(value):
+    # Days since 1970-01-01 for a 'YYYY-MM-DD...' string, date or datetime
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - EPOCH_ORDINAL
+
+class CampaignIndex:
+    # The campaign calendar cut into elementary date segments. Each segment keeps the campaigns
+    # active on it in campaigns table order, so the first candidate meeting min_basket_amount wins,
+    # the same result as scanning the whole table for every order.
+
+    def __init__(self, campaigns_list):
+        self.campaigns = [(campaign_id, discount_rate, min_basket)
+                          for campaign_id, _, _, discount_rate, min_basket in campaigns_list]
+
+        # Sweep over start/stop events (stop is the day after end_date, ranges are inclusive)
+        events = {}
+        for pos, (_, start_date, end_date, _, _) in enumerate(campaigns_list):
+            events.setdefault(to_epoch_day(start_date), ([], []))[0].append(pos)
+            events.setdefault(to_epoch_day(end_date) + 1, ([], []))[1].append(pos)
+
+        self.segment_starts = []
+        self.segment_candidates = []
+        active = set()
+        for day in sorted(events):
+            starting, stopping = events[day]
+            active.difference_update(stopping)
+            active.update(starting)
+            self.segment_starts.append(day)
+            self.segment_candidates.append(sorted(active))
+
+        # Array form for lookup_many: candidate positions padded with -1, None baskets always match
+        width = max((len(candidates) for candidates in self.segment_candidates), default=0)
+        self.segment_array = np.array(self.segment_starts, dtype=np.int64)
+        self.candidate_matrix = np.full((len(self.segment_candidates), width), -1, dtype=np.int64)
+        for seg, candidates in enumerate(self.segment_candidates):
+            self.candidate_matrix[seg, :len(candidates)] = candidates
+        self.id_array = np.array([c[0] for c in self.campaigns], dtype=np.int64)
+        self.discount_array = np.array([c[1] for c in self.campaigns], dtype=np.float64)
+        self.min_basket_array = np.array([-np.inf if c[2] is None else c[2] for c in self.campaigns], dtype=np.float64)
+
+    def lookup(self, day, total_amount):
+        # O(log n) point lookup, returns (campaign_id, discount_rate) or (None, 0)
+        seg = bisect.bisect_right(self.segment_starts, day) - 1
+        if seg < 0:
+            return None, 0
+        for pos in self.segment_candidates[seg]:
+            campaign_id, discount_rate, min_basket = self.campaigns[pos]
+            if min_basket is None or total_amount >= min_basket:
+                return campaign_id, discount_rate
+        return None, 0
+
+    def lookup_many(self, days, total_amounts):
+        # Resolves whole arrays at once, campaign id 0 means no campaign
+        campaign_ids = np.zeros(len(days), dtype=np.int64)
+        discounts = np.zeros(len(days), dtype=np.float64)
+        if not self.candidate_matrix.size:
+            return campaign_ids, discounts
+
+        seg = np.searchsorted(self.segment_array, days, side='right') - 1
+        candidates = self.candidate_matrix[np.maximum(seg, 0)]
+        candidates[seg < 0] = -1
+
+        assigned = np.zeros(len(days), dtype=bool)
+        for column in candidates.T:
+            match = ~assigned & (column >= 0) & (total_amounts >= self.min_basket_array[column])
+            campaign_ids[match] = self.id_array[column[match]]
+            discounts[match] = self.discount_array[column[match]]
+            assigned |= match
+        return campaign_ids, discounts
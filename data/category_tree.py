@@ -0,0 +1,140 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Closure table of the category tree: one row per (ancestor, descendant) pair at any distance, the
+# category itself included at depth 0. Rolling products up to any level is then a single indexed join
+# instead of a self-join per level or a recursive CTE per query. category_roots keeps each category's
+# top-level category (root_category_id) and its own level (0 = top level) for the common "by main
+# category" report, next to categories so the notebooks' categories table keeps its columns.
+# Triggers keep both current when categories are added, moved or removed, however deep the tree gets.
+CATEGORY_TRIGGERS = ['category_tree_insert', 'category_tree_move', 'category_tree_delete']
+# Columns earlier versions added to categories itself
+LEGACY_TREE_COLUMNS = ['root_category_id', 'category_level']
+
+def drop_legacy_tree_columns(cursor):
+    # The triggers reading them must be gone first, see build_category_tree
+    existing = {row[1] for row in cursor.execute('PRAGMA table_info(categories)')}
+    for column in LEGACY_TREE_COLUMNS:
+        if column in existing:
+            cursor.execute(f'ALTER TABLE categories DROP COLUMN {column}')
+
+def create_closure_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS category_closure (
+        ancestor_id INTEGER NOT NULL,
+        descendant_id INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_id, descendant_id),
+        FOREIGN KEY (ancestor_id) REFERENCES categories(category_id),
+        FOREIGN KEY (descendant_id) REFERENCES categories(category_id)
+    ) WITHOUT ROWID
+    ''')
+    # products.category_id -> every ancestor: the join used by the rollups
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_category_closure_descendant ON category_closure(descendant_id, depth, ancestor_id)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS category_roots (
+        category_id INTEGER PRIMARY KEY,
+        root_category_id INTEGER NOT NULL,
+        category_level INTEGER NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES categories(category_id),
+        FOREIGN KEY (root_category_id) REFERENCES categories(category_id)
+    )
+    ''')
+
+def update_category_roots_sql(condition):
+    # Root and level of the matching categories, read back from the closure: the root is the ancestor
+    # at the largest depth (SQLite takes a bare column from the row that MAX() picked)
+    return f'''
+        INSERT OR REPLACE INTO category_roots (category_id, root_category_id, category_level)
+        SELECT descendant_id, ancestor_id, MAX(depth) FROM category_closure
+        WHERE {condition}
+        GROUP BY descendant_id;
+    '''
+
+def subtree_condition(category):
+    return f'descendant_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = {category})'
+
+def create_tree_triggers(cursor):
+    drop_tree_triggers(cursor)
+    # A new category gets its parent's ancestors plus itself
+    cursor.execute(f'''
+        CREATE TRIGGER category_tree_insert AFTER INSERT ON categories BEGIN
+            INSERT INTO category_closure (ancestor_id, descendant_id, depth) VALUES (NEW.category_id, NEW.category_id, 0);
+            INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, NEW.category_id, depth + 1 FROM category_closure WHERE descendant_id = NEW.parent_category_id;
+            {update_category_roots_sql(subtree_condition('NEW.category_id'))}
+        END
+    ''')
+    # Moving a category moves its whole subtree: paths from outside the subtree are replaced by paths
+    # through the new parent, paths inside it stay as they are
+    cursor.execute(f'''
+        CREATE TRIGGER category_tree_move AFTER UPDATE OF parent_category_id ON categories
+        WHEN NEW.parent_category_id IS NOT OLD.parent_category_id BEGIN
+            DELETE FROM category_closure
+            WHERE descendant_id IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = NEW.category_id)
+              AND ancestor_id NOT IN (SELECT descendant_id FROM category_closure WHERE ancestor_id = NEW.category_id);
+            INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+            FROM category_closure above, category_closure below
+            WHERE above.descendant_id = NEW.parent_category_id AND below.ancestor_id = NEW.category_id;
+            {update_category_roots_sql(subtree_condition('NEW.category_id'))}
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER category_tree_delete AFTER DELETE ON categories BEGIN
+            DELETE FROM category_closure WHERE descendant_id = OLD.category_id OR ancestor_id = OLD.category_id;
+            DELETE FROM category_roots WHERE category_id = OLD.category_id;
+        END
+    ''')
+
+def drop_tree_triggers(cursor):
+    for trigger_name in CATEGORY_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+
+def refresh_category_tree(cursor):
+    # Full rebuild from parent_category_id, returns the number of closure rows
+    create_closure_table(cursor)
+    cursor.execute('DELETE FROM category_closure')
+    cursor.execute('DELETE FROM category_roots')
+    cursor.execute('''
+        INSERT INTO category_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+            SELECT category_id, category_id, 0 FROM categories
+            UNION ALL
+            SELECT paths.ancestor_id, child.category_id, paths.depth + 1
+            FROM paths JOIN categories child ON child.parent_category_id = paths.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM paths
+    ''')
+    cursor.execute(update_category_roots_sql('true'))
+    return cursor.execute('SELECT COUNT(*) FROM category_closure').fetchone()[0]
+
+def build_category_tree(conn):
+    cursor = conn.cursor()
+    drop_tree_triggers(cursor)
+    drop_legacy_tree_columns(cursor)
+    count = refresh_category_tree(cursor)
+    create_tree_triggers(cursor)
+    conn.commit()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the category closure table, root category keys (category_roots) and their triggers.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    print(f"[*] Rebuilding category tree in {args.db}...")
+    started = time.perf_counter()
+    count = build_category_tree(conn)
+    conn.close()
+    print(f"[+] {count} closure rows written in {time.perf_counter() - started:.2f}s, triggers installed!")
+
+if __name__ == '__main__':
+    main()
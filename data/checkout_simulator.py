@@ -0,0 +1,380 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+import numpy as np
+
+from campaign_index import CampaignIndex
+from generate_data import SEED, build_order
+from partitions import is_partitioned, merge_partitions
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Live checkout traffic against a copy of the database: writer threads or processes place orders with
+# the generator's model (build_order), decrement products.stock_quantity in the same transaction and
+# commit under WAL, while readers run dashboard queries next to them. Reports orders/s, lock waits,
+# busy retries and latency percentiles, so runs with more writers show where the write lock saturates.
+DEFAULT_DURATION = 10
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+# Workers load products and campaigns first, everyone starts placing orders at the same moment
+STARTUP_DELAY = {'thread': 0.5, 'process': 2.0}
+# Sleep between attempts once the busy timeout ran out, randomized so writers do not retry in lockstep
+RETRY_BACKOFF_MS = (1, 20)
+MAX_ATTEMPTS = 100
+
+# Reporting traffic: what a dashboard refreshes while orders come in
+REPORT_QUERIES = [
+    ('recent_status', '''
+        SELECT order_status, COUNT(*), SUM(total_amount) FROM orders
+        WHERE order_id > (SELECT MAX(order_id) FROM orders) - 1000 GROUP BY order_status
+    '''),
+    ('top_products', '''
+        SELECT product_id, SUM(quantity) AS sold FROM order_items
+        WHERE item_id > (SELECT MAX(item_id) FROM order_items) - 3000
+        GROUP BY product_id ORDER BY sold DESC LIMIT 10
+    '''),
+    ('low_stock', '''
+        SELECT product_id, product_name, stock_quantity FROM products
+        WHERE stock_quantity < 20 ORDER BY stock_quantity LIMIT 20
+    '''),
+    ('daily_sales', '''
+        SELECT period, order_count, total_amount FROM sales_rollup
+        WHERE grain = 'day' AND dimension = 'total' ORDER BY period DESC LIMIT 30
+    '''),
+]
+# Databases generated before sales_rollup existed (like an old data/ecommerce.db) answer the same report from orders
+DAILY_SALES_FROM_ORDERS = '''
+    SELECT date(order_date) AS period, COUNT(*), SUM(total_amount) FROM orders
+    WHERE order_date >= (SELECT date(MAX(order_date), '-29 days') FROM orders)
+    GROUP BY period ORDER BY period DESC
+'''
+
+def writer_counts(value):
+    counts = [int(count) for count in value.split(',')]
+    if not counts or min(counts) <= 0:
+        raise argparse.ArgumentTypeError('writer counts must be positive, e.g. 1,2,4,8')
+    return counts
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Simulate concurrent checkouts with stock decrement against a copy of the database.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='source database, it is copied and never written (default: data/ecommerce.db)')
+    parser.add_argument('--target', help='keep the work copy at this path instead of a temporary file')
+    parser.add_argument('--writers', type=writer_counts, default=[4],
+                        help='concurrent writers; a list like 1,2,4,8 runs one simulation per count on a fresh copy (default: 4)')
+    parser.add_argument('--readers', type=int, default=2, help='concurrent reporting readers (default: 2)')
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help='run writers and readers as threads of one process or as separate processes (default: thread)')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help=f'seconds of traffic per simulation (default: {DEFAULT_DURATION})')
+    parser.add_argument('--commit-every', type=int, default=1, help='orders per write transaction (default: 1)')
+    parser.add_argument('--busy-timeout', type=int, default=DEFAULT_BUSY_TIMEOUT_MS,
+                        help=f'SQLite busy timeout in ms before a locked write is retried (default: {DEFAULT_BUSY_TIMEOUT_MS})')
+    parser.add_argument('--synchronous', choices=['OFF', 'NORMAL', 'FULL'], default='NORMAL',
+                        help='PRAGMA synchronous of the writers (default: NORMAL, the usual WAL setting)')
+    parser.add_argument('--initial-stock', type=int, help='set every product to this stock before the run')
+    parser.add_argument('--seed', type=int, default=SEED, help=f'random seed of the writers (default: {SEED})')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+    if args.readers < 0:
+        parser.error('--readers cannot be negative')
+    if args.duration <= 0:
+        parser.error('--duration must be positive')
+    if args.commit_every <= 0:
+        parser.error('--commit-every must be positive')
+    if args.busy_timeout < 0:
+        parser.error('--busy-timeout cannot be negative')
+    if args.target and len(args.writers) > 1:
+        parser.error('--target keeps a single work copy, use it with one writer count')
+    return args
+
+def is_busy(error):
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99]).tolist()
+    return {'p50_ms': round(p50, 3), 'p90_ms': round(p90, 3), 'p99_ms': round(p99, 3), 'max_ms': round(max(values), 3)}
+
+def history_end(conn):
+    # Simulated orders continue the history where the generator (or the last --append) stopped
+    has_state = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'generation_state'").fetchone()[0]
+    state = conn.execute('SELECT history_end FROM generation_state').fetchone() if has_state else None
+    if state is None:
+        state = conn.execute('SELECT MAX(order_date) FROM orders').fetchone()
+    return datetime.fromisoformat(state[0])
+
+# ============================================
+# WORK COPY
+# ============================================
+
+def copy_database(source, target, initial_stock=None):
+    # Online backup, so the source can stay open elsewhere; the copy is switched to WAL for the run.
+    # A partitioned source is copied with its years merged back in: writers insert into orders.
+    for path in (target, f'{target}-wal', f'{target}-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    source_conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(source))}?mode=ro', uri=True)
+    conn = sqlite3.connect(target)
+    source_conn.backup(conn)
+    source_conn.close()
+    if is_partitioned(conn.cursor()):
+        merge_partitions(conn, source)
+    conn.execute('PRAGMA journal_mode = WAL')
+    if initial_stock is not None:
+        conn.execute('UPDATE products SET stock_quantity = ?', (initial_stock,))
+    conn.commit()
+    conn.close()
+
+def stock_snapshot(db_path):
+    conn = sqlite3.connect(db_path)
+    snapshot = conn.execute('''
+        SELECT (SELECT SUM(stock_quantity) FROM products), (SELECT COALESCE(MAX(item_id), 0) FROM order_items),
+               (SELECT COALESCE(MAX(order_id), 0) FROM orders)
+    ''').fetchone()
+    conn.close()
+    return snapshot
+
+# ============================================
+# WRITERS AND READERS
+# ============================================
+
+def write_orders(conn, orders):
+    # Runs inside BEGIN IMMEDIATE: the write lock is held, so MAX(order_id) + 1 is ours. An order whose
+    # items are not all in stock is rolled back to its savepoint and counted as rejected.
+    # Returns (orders placed, items placed, orders rejected).
+    next_order_id = conn.execute('SELECT COALESCE(MAX(order_id), 0) + 1 FROM orders').fetchone()[0]
+    placed = items = rejected = 0
+    for order, order_items in orders:
+        conn.execute('SAVEPOINT checkout')
+        in_stock = True
+        for _, product_id, quantity, _, _ in order_items:
+            cursor = conn.execute('UPDATE products SET stock_quantity = stock_quantity - ? WHERE product_id = ? AND stock_quantity >= ?',
+                                  (quantity, product_id, quantity))
+            if cursor.rowcount == 0:
+                in_stock = False
+                break
+        if in_stock:
+            conn.execute('''
+                INSERT INTO orders (order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (next_order_id,) + order[1:])
+            conn.executemany('''
+                INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_rate)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(next_order_id,) + item[1:] for item in order_items])
+            next_order_id += 1
+            placed += 1
+            items += len(order_items)
+        else:
+            conn.execute('ROLLBACK TO checkout')
+            rejected += 1
+        conn.execute('RELEASE checkout')
+    return placed, items, rejected
+
+def run_writer(config):
+    random.seed(f"{config['seed']}:{config['writer']}")
+    conn = sqlite3.connect(config['db'], timeout=config['busy_timeout'] / 1000, isolation_level=None)
+    conn.execute(f"PRAGMA synchronous = {config['synchronous']}")
+    products_list = conn.execute('SELECT product_id, price FROM products').fetchall()
+    customer_total = conn.execute('SELECT MAX(customer_id) FROM customers').fetchone()[0]
+    clock_start = history_end(conn)
+    campaign_index = CampaignIndex(conn.execute('''
+        SELECT campaign_id, start_date, end_date, discount_rate, min_basket_amount FROM campaigns
+        WHERE end_date >= ? ORDER BY campaign_id
+    ''', (clock_start.date(),)).fetchall())
+
+    stats = {'orders': 0, 'items': 0, 'rejected': 0, 'transactions': 0, 'retries': 0, 'failed': 0,
+             'latencies_ms': [], 'lock_waits_ms': []}
+    time.sleep(max(0.0, config['start_at'] - time.time()))
+    while time.time() < config['stop_at']:
+        # Orders are built before the transaction, the write lock only covers the SQL. The order
+        # clock runs with wall time from the history end, so campaigns keep applying.
+        order_date = clock_start + timedelta(seconds=time.time() - config['start_at'])
+        orders = [build_order(None, random.randint(1, customer_total), order_date, products_list, campaign_index)
+                  for _ in range(config['commit_every'])]
+
+        started = time.perf_counter()
+        for _ in range(MAX_ATTEMPTS):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                lock_wait = time.perf_counter() - started
+                placed, items, rejected = write_orders(conn, orders)
+                conn.execute('COMMIT')
+                break
+            except sqlite3.OperationalError as error:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                if not is_busy(error):
+                    raise
+                stats['retries'] += 1
+                time.sleep(random.uniform(*RETRY_BACKOFF_MS) / 1000)
+        else:
+            stats['failed'] += len(orders)
+            continue
+
+        stats['transactions'] += 1
+        stats['orders'] += placed
+        stats['items'] += items
+        stats['rejected'] += rejected
+        stats['lock_waits_ms'].append(lock_wait * 1000)
+        stats['latencies_ms'].append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return stats
+
+def report_queries(conn):
+    has_rollup = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sales_rollup'").fetchone()[0]
+    return [(name, DAILY_SALES_FROM_ORDERS if name == 'daily_sales' and not has_rollup else sql)
+            for name, sql in REPORT_QUERIES]
+
+def run_reader(config):
+    rng = random.Random(f"{config['seed']}:reader:{config['reader']}")
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(config['db']))}?mode=ro", uri=True,
+                           timeout=config['busy_timeout'] / 1000)
+    queries = report_queries(conn)
+    stats = {'queries': 0, 'errors': 0, 'latencies_ms': [], 'failed_reports': {}}
+    time.sleep(max(0.0, config['start_at'] - time.time()))
+    while queries and time.time() < config['stop_at']:
+        name, sql = rng.choice(queries)
+        started = time.perf_counter()
+        try:
+            conn.execute(sql).fetchall()
+        except sqlite3.OperationalError as error:
+            if not is_busy(error):
+                # A report this database cannot answer is dropped, the other readers' reports go on
+                stats['failed_reports'][name] = str(error)
+                queries.remove((name, sql))
+                continue
+            stats['errors'] += 1
+            continue
+        stats['queries'] += 1
+        stats['latencies_ms'].append((time.perf_counter() - started) * 1000)
+    conn.close()
+    return stats
+
+# ============================================
+# RUN
+# ============================================
+
+def simulate(db_path, writers, args):
+    stock_before, last_item_id, last_order_id = stock_snapshot(db_path)
+    start_at = time.time() + STARTUP_DELAY[args.mode]
+    stop_at = start_at + args.duration
+    shared = {'db': db_path, 'start_at': start_at, 'stop_at': stop_at, 'seed': args.seed,
+              'busy_timeout': args.busy_timeout, 'synchronous': args.synchronous, 'commit_every': args.commit_every}
+
+    executor_class = ProcessPoolExecutor if args.mode == 'process' else ThreadPoolExecutor
+    with executor_class(max_workers=writers + args.readers) as executor:
+        writer_futures = [executor.submit(run_writer, dict(shared, writer=writer)) for writer in range(writers)]
+        reader_futures = [executor.submit(run_reader, dict(shared, reader=reader)) for reader in range(args.readers)]
+        writer_stats = [future.result() for future in writer_futures]
+        reader_stats = [future.result() for future in reader_futures]
+    elapsed = max(time.time(), stop_at) - start_at
+
+    conn = sqlite3.connect(db_path)
+    wal_bytes = os.path.getsize(f'{db_path}-wal') if os.path.exists(f'{db_path}-wal') else 0
+    stock_after = conn.execute('SELECT SUM(stock_quantity) FROM products').fetchone()[0]
+    sold, new_orders = conn.execute('SELECT COALESCE(SUM(quantity), 0), COUNT(DISTINCT order_id) FROM order_items WHERE item_id > ?',
+                                    (last_item_id,)).fetchone()
+    negative_stock = conn.execute('SELECT COUNT(*) FROM products WHERE stock_quantity < 0').fetchone()[0]
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+
+    total = {name: sum(stats[name] for stats in writer_stats)
+             for name in ('orders', 'items', 'rejected', 'transactions', 'retries', 'failed')}
+    queries = sum(stats['queries'] for stats in reader_stats)
+    return {
+        'writers': writers,
+        'readers': args.readers,
+        'seconds': round(elapsed, 3),
+        **total,
+        'orders_per_second': round(total['orders'] / elapsed, 1),
+        'transactions_per_second': round(total['transactions'] / elapsed, 1),
+        'transaction_latency': percentiles([value for stats in writer_stats for value in stats['latencies_ms']]),
+        'lock_wait': percentiles([value for stats in writer_stats for value in stats['lock_waits_ms']]),
+        'reader_queries': queries,
+        'reader_errors': sum(stats['errors'] for stats in reader_stats),
+        'failed_reports': {name: error for stats in reader_stats for name, error in stats['failed_reports'].items()},
+        'reader_queries_per_second': round(queries / elapsed, 1),
+        'reader_latency': percentiles([value for stats in reader_stats for value in stats['latencies_ms']]),
+        'wal_bytes': wal_bytes,
+        # Every committed unit left the shelf exactly once and no product went below zero
+        'stock_consistent': stock_before - stock_after == sold and new_orders == total['orders'] and negative_stock == 0,
+        'first_order_id': last_order_id + 1,
+    }
+
+def print_run(result):
+    latency = result['transaction_latency']
+    lock_wait = result['lock_wait']
+    print(f"[+] {result['writers']} writers: {result['orders']:,} orders ({result['orders_per_second']:,} orders/s), "
+          f"{result['rejected']} out of stock, {result['retries']} busy retries, {result['failed']} failed")
+    if latency['p50_ms'] is not None:
+        print(f"   transaction p50 {latency['p50_ms']:.2f} ms, p90 {latency['p90_ms']:.2f} ms, p99 {latency['p99_ms']:.2f} ms; "
+              f"lock wait p50 {lock_wait['p50_ms']:.2f} ms, p99 {lock_wait['p99_ms']:.2f} ms")
+    if result['readers']:
+        reader_latency = result['reader_latency']
+        p50 = f"{reader_latency['p50_ms']:.2f}" if reader_latency['p50_ms'] is not None else '-'
+        p99 = f"{reader_latency['p99_ms']:.2f}" if reader_latency['p99_ms'] is not None else '-'
+        print(f"   readers: {result['reader_queries_per_second']:,} queries/s, p50 {p50} ms, p99 {p99} ms, "
+              f"{result['reader_errors']} busy errors")
+        for name, error in result['failed_reports'].items():
+            print(f"   [!] report {name} skipped: {error}")
+    if not result['stock_consistent']:
+        print("[!] Stock does not add up with the committed order items")
+
+def main():
+    args = parse_args()
+    work_dir = None if args.target else tempfile.mkdtemp(prefix='checkout_')
+    target = args.target or os.path.join(work_dir, 'checkout.db')
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'source': os.path.abspath(args.db),
+        'settings': {name: value for name, value in vars(args).items() if name not in ('db', 'output')},
+        'runs': [],
+    }
+    try:
+        for writers in args.writers:
+            # Every writer count starts from the same copy and stock
+            copy_database(args.db, target, args.initial_stock)
+            print(f"\n[*] {writers} {args.mode} writers, {args.readers} readers, {args.commit_every} orders per commit, "
+                  f"{args.duration:g}s...")
+            result = simulate(target, writers, args)
+            results['runs'].append(result)
+            print_run(result)
+    except ValueError as error:
+        print(f"[!] {error}")
+        sys.exit(1)
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if len(results['runs']) > 1:
+        print("\n[*] Writers  orders/s  retries  txn p99 ms  lock wait p99 ms")
+        for result in results['runs']:
+            print(f"   {result['writers']:>7}  {result['orders_per_second']:>8,}  {result['retries']:>7}  "
+                  f"{result['transaction_latency']['p99_ms'] or 0:>10.2f}  {result['lock_wait']['p99_ms'] or 0:>16.2f}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n[+] Results written to {args.output}")
+    if args.target:
+        print(f"[+] Work copy kept at {args.target}")
+
+if __name__ == '__main__':
+    main()
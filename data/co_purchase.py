@@ -0,0 +1,237 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Sparse product x product co-purchase matrix: product_pairs keeps one row per pair of products that
+# were ever ordered together, with the number of orders containing both. Only the upper triangle is
+# stored (first_product_id < second_product_id), pairs never bought together take no space at all.
+# product_orders holds the diagonal (orders containing the product) and co_purchase_state the number
+# of orders counted, which is all confidence and lift need. The matrix is built in one pass over
+# order_items sorted by order_id instead of a self-join on order_id, and --append only folds in the
+# new orders.
+DEFAULT_CHUNK_SIZE = 200000
+RANKINGS = {
+    'orders': 'pair.order_count',
+    'confidence': 'confidence',
+    'lift': 'lift',
+}
+
+def create_co_purchase_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_pairs (
+        first_product_id INTEGER NOT NULL,
+        second_product_id INTEGER NOT NULL,
+        order_count INTEGER NOT NULL,
+        PRIMARY KEY (first_product_id, second_product_id),
+        CHECK (first_product_id < second_product_id),
+        FOREIGN KEY (first_product_id) REFERENCES products(product_id),
+        FOREIGN KEY (second_product_id) REFERENCES products(product_id)
+    ) WITHOUT ROWID
+    ''')
+    # The lower half of a product's row: pairs where it is the second product, covering with the key columns
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_pairs_second ON product_pairs(second_product_id, order_count)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_orders (
+        product_id INTEGER PRIMARY KEY,
+        order_count INTEGER NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS co_purchase_state (
+        state_id INTEGER PRIMARY KEY CHECK (state_id = 1),
+        last_order_id INTEGER NOT NULL,
+        order_count INTEGER NOT NULL
+    )
+    ''')
+
+def has_co_purchase(cursor):
+    return cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'product_pairs'").fetchone()[0] > 0
+
+# ============================================
+# MATRIX
+# ============================================
+
+def read_baskets(cursor, last_order_id, max_order_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Yields (order_ids, product_ids) arrays sorted by order and product, every order whole in one chunk:
+    # the rows of the last order of a chunk are held back until the next one
+    cursor.execute('''
+        SELECT order_id, product_id FROM order_items
+        WHERE order_id > ? AND order_id <= ?
+        ORDER BY order_id, product_id
+    ''', (last_order_id, max_order_id))
+    pending = np.empty((0, 2), dtype=np.int64)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        chunk = np.vstack([pending, np.array(rows, dtype=np.int64).reshape(-1, 2)])
+        if rows:
+            cut = np.searchsorted(chunk[:, 0], chunk[-1, 0])
+            chunk, pending = chunk[:cut], chunk[cut:]
+        if len(chunk):
+            # The same product twice in an order is one basket entry
+            keep = np.ones(len(chunk), dtype=bool)
+            keep[1:] = (chunk[1:] != chunk[:-1]).any(axis=1)
+            chunk = chunk[keep]
+            yield chunk[:, 0], chunk[:, 1]
+        if not rows:
+            break
+
+def basket_pairs(order_ids, product_ids):
+    # Row i and row i + offset belong to the same order when their order ids match, so comparing the
+    # chunk with itself shifted by 1, 2, ... finds every pair of every basket; products are sorted
+    # within an order, so the earlier row always has the smaller id. Once no order spans `offset`
+    # rows, no order spans more either. Pairs are packed into one int64 key: first << 32 | second.
+    keys = []
+    offset = 1
+    while offset < len(order_ids):
+        same = order_ids[offset:] == order_ids[:-offset]
+        if not same.any():
+            break
+        keys.append(product_ids[:-offset][same] << 32 | product_ids[offset:][same])
+        offset += 1
+    return np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+
+def merge_counts(keys, counts):
+    keys, inverse = np.unique(keys, return_inverse=True)
+    return keys, np.bincount(inverse, weights=counts).astype(np.int64)
+
+def count_pairs(cursor, last_order_id, max_order_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Returns (pair keys, pair counts, product ids, product counts, orders); memory grows with the number
+    # of distinct pairs, not with order_items
+    pair_keys, pair_counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    product_ids, product_counts = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order_count = 0
+    for orders, products in read_baskets(cursor, last_order_id, max_order_id, chunk_size):
+        keys, counts = np.unique(basket_pairs(orders, products), return_counts=True)
+        pair_keys, pair_counts = merge_counts(np.concatenate([pair_keys, keys]), np.concatenate([pair_counts, counts]))
+        ids, counts = np.unique(products, return_counts=True)
+        product_ids, product_counts = merge_counts(np.concatenate([product_ids, ids]), np.concatenate([product_counts, counts]))
+        order_count += np.count_nonzero(orders[1:] != orders[:-1]) + 1
+    return pair_keys, pair_counts, product_ids, product_counts, order_count
+
+def update_co_purchase(conn, incremental=True, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Returns (pairs, folded_orders). Incremental runs only read orders added since the last run (orders
+    # and their items are assumed append-only, like in update_rfm) and add their counts to the matrix.
+    cursor = conn.cursor()
+    create_co_purchase_tables(cursor)
+
+    max_order_id = cursor.execute('SELECT COALESCE(MAX(order_id), 0) FROM orders').fetchone()[0]
+    state = cursor.execute('SELECT last_order_id, order_count FROM co_purchase_state').fetchone() if incremental else None
+    if state is None:
+        cursor.execute('DELETE FROM product_pairs')
+        cursor.execute('DELETE FROM product_orders')
+        last_order_id, total_orders = 0, 0
+    else:
+        last_order_id, total_orders = state
+
+    pair_keys, pair_counts, product_ids, product_counts, order_count = count_pairs(cursor, last_order_id, max_order_id, chunk_size)
+    cursor.executemany('''
+        INSERT INTO product_pairs (first_product_id, second_product_id, order_count) VALUES (?, ?, ?)
+        ON CONFLICT (first_product_id, second_product_id) DO UPDATE SET order_count = order_count + excluded.order_count
+    ''', zip((pair_keys >> 32).tolist(), (pair_keys & 0xFFFFFFFF).tolist(), pair_counts.tolist()))
+    cursor.executemany('''
+        INSERT INTO product_orders (product_id, order_count) VALUES (?, ?)
+        ON CONFLICT (product_id) DO UPDATE SET order_count = order_count + excluded.order_count
+    ''', zip(product_ids.tolist(), product_counts.tolist()))
+
+    cursor.execute('INSERT OR REPLACE INTO co_purchase_state (state_id, last_order_id, order_count) VALUES (1, ?, ?)',
+                   (max_order_id, total_orders + order_count))
+    pairs = cursor.execute('SELECT COUNT(*) FROM product_pairs').fetchone()[0]
+    return pairs, order_count
+
+def build_co_purchase(conn):
+    pairs, _ = update_co_purchase(conn, incremental=False)
+    conn.commit()
+    return pairs
+
+# ============================================
+# QUERIES
+# ============================================
+
+def frequently_bought_together(conn, product_id, limit=10, rank_by='orders', min_orders=1):
+    # (product_id, product_name, orders together, confidence, lift) for the products most often in the
+    # same order as product_id. confidence = P(other | product), lift = confidence / P(other): above 1
+    # the pair is bought together more often than chance. Lift of pairs seen in a handful of orders
+    # is noisy, min_orders drops them. The product's row of the matrix is two index range scans.
+    return conn.execute(f'''
+        SELECT pair.other_product_id, p.product_name, pair.order_count,
+               pair.order_count * 1.0 / mine.order_count AS confidence,
+               pair.order_count * 1.0 * state.order_count / (mine.order_count * theirs.order_count) AS lift
+        FROM (
+            SELECT second_product_id AS other_product_id, order_count FROM product_pairs WHERE first_product_id = :product_id
+            UNION ALL
+            SELECT first_product_id, order_count FROM product_pairs WHERE second_product_id = :product_id
+        ) pair
+        JOIN product_orders mine ON mine.product_id = :product_id
+        JOIN product_orders theirs ON theirs.product_id = pair.other_product_id
+        JOIN products p ON p.product_id = pair.other_product_id
+        CROSS JOIN co_purchase_state state
+        WHERE pair.order_count >= :min_orders
+        ORDER BY {RANKINGS[rank_by]} DESC, pair.other_product_id
+        LIMIT :limit
+    ''', {'product_id': product_id, 'limit': limit, 'min_orders': min_orders}).fetchall()
+
+def brand_affinity(conn, limit=10):
+    # (brand, brand, orders together) for the brand pairs most often bought together: product pairs summed
+    # per brand pair, so an order with two products of each brand counts once per product pair
+    return conn.execute('''
+        SELECT MIN(a.brand, b.brand) AS brand, MAX(a.brand, b.brand) AS other_brand, SUM(pair.order_count) AS order_count
+        FROM product_pairs pair
+        JOIN products a ON a.product_id = pair.first_product_id
+        JOIN products b ON b.product_id = pair.second_product_id
+        WHERE a.brand <> b.brand
+        GROUP BY 1, 2
+        ORDER BY order_count DESC, brand, other_brand
+        LIMIT ?
+    ''', (limit,)).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the product co-purchase matrix (product_pairs).')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--full', action='store_true', help='rebuild from all orders instead of folding in new ones')
+    parser.add_argument('--product', type=int, help='show the products most often bought together with this product_id')
+    parser.add_argument('--brands', action='store_true', help='show the brand pairs most often bought together')
+    parser.add_argument('--rank-by', choices=list(RANKINGS), default='orders', help='ranking of --product (default: orders)')
+    parser.add_argument('--min-orders', type=int, default=1, help='pairs seen in fewer orders are left out of --product (default: 1)')
+    parser.add_argument('--limit', type=int, default=10, help='rows shown by --product and --brands (default: 10)')
+    args = parser.parse_args()
+
+    if args.product is not None or args.brands:
+        conn = connect_partitioned(args.db)
+        if not has_co_purchase(conn.cursor()):
+            conn.close()
+            print("[!] No co-purchase matrix yet, build it first without --product/--brands")
+            sys.exit(1)
+        started = time.perf_counter()
+        if args.product is not None:
+            rows = frequently_bought_together(conn, args.product, args.limit, args.rank_by, args.min_orders)
+            print(f"[*] Bought together with product {args.product} ({(time.perf_counter() - started) * 1000:.1f} ms):")
+            for product_id, product_name, order_count, confidence, lift in rows:
+                print(f"   #{product_id} {product_name}: {order_count} orders, confidence {confidence:.1%}, lift {lift:.2f}")
+        if args.brands:
+            started = time.perf_counter()
+            rows = brand_affinity(conn, args.limit)
+            print(f"[*] Brands bought together ({(time.perf_counter() - started) * 1000:.1f} ms):")
+            for brand, other_brand, order_count in rows:
+                print(f"   {brand} + {other_brand}: {order_count} co-purchases")
+        conn.close()
+        return
+
+    conn = connect_partitioned(args.db, writable=True)
+    print(f"[*] Updating co-purchase matrix in {args.db}...")
+    started = time.perf_counter()
+    pairs, folded_orders = update_co_purchase(conn, incremental=not args.full)
+    conn.commit()
+    conn.close()
+    print(f"[+] {folded_orders} orders folded in, {pairs} product pairs in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Column-per-file export of the analysis tables: every column is a .npy file that loads with
+# mmap_mode='r', so opening a table only maps the files and pages are read on first touch.
+EXPORT_TABLES = ['customers', 'products', 'categories', 'campaigns', 'orders', 'order_items', 'reviews']
+MANIFEST_NAME = 'manifest.json'
+
+# Text columns with at most this share of distinct values are stored as dictionary codes
+DICTIONARY_MAX_RATIO = 0.5
+
+def default_directory(db_path):
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'columnar')
+
+def smallest_int_dtype(low, high):
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+# ============================================
+# EXPORT
+# ============================================
+
+def column_kind(declared_type):
+    declared_type = declared_type.upper()
+    if declared_type in ('DATE', 'DATETIME'):
+        return 'datetime'
+    if 'INT' in declared_type:
+        return 'int'
+    if declared_type == 'REAL':
+        return 'float'
+    return 'text'
+
+def fetch_column(conn, table, expression, dtype, row_count, order_column):
+    # One column at a time straight into a typed array, no per-row tuples kept around
+    cursor = conn.execute(f'SELECT {expression} FROM {table} ORDER BY {order_column}')
+    return np.fromiter((row[0] for row in cursor), dtype=dtype, count=row_count)
+
+def export_column(conn, table, name, kind, row_count, table_dir, order_column):
+    null_count = conn.execute(f'SELECT COUNT(*) - COUNT({name}) FROM {table}').fetchone()[0]
+    column = {'name': name, 'kind': kind, 'nullable': null_count > 0}
+
+    if kind == 'text':
+        distinct_count = conn.execute(f'SELECT COUNT(DISTINCT {name}) FROM {table}').fetchone()[0]
+        if distinct_count <= max(1, row_count * DICTIONARY_MAX_RATIO):
+            # Low-cardinality strings: sorted dictionary in the manifest, codes on disk, NULL = -1
+            dictionary = [row[0] for row in conn.execute(f'SELECT DISTINCT {name} FROM {table} WHERE {name} IS NOT NULL ORDER BY {name}')]
+            codes = {value: code for code, value in enumerate(dictionary)}
+            cursor = conn.execute(f'SELECT {name} FROM {table} ORDER BY {order_column}')
+            values = np.fromiter((codes.get(row[0], -1) for row in cursor),
+                                 dtype=smallest_int_dtype(-1, len(dictionary)), count=row_count)
+            column.update(kind='dictionary', dictionary=dictionary)
+        else:
+            # Free text: UTF-8 bytes back to back plus row end offsets, NULL rows are empty and masked
+            cursor = conn.execute(f"SELECT COALESCE({name}, '') FROM {table} ORDER BY {order_column}")
+            encoded = [row[0].encode('utf-8') for row in cursor]
+            np.save(os.path.join(table_dir, f'{name}.offsets.npy'),
+                    np.cumsum([len(value) for value in encoded], dtype=np.int64))
+            values = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+            column['kind'] = 'string'
+    elif kind == 'datetime':
+        # Seconds since the epoch, viewed as datetime64[s] by the loader
+        values = fetch_column(conn, table, f"COALESCE(CAST(strftime('%s', {name}) AS INTEGER), 0)", np.int64, row_count, order_column)
+    elif kind == 'int':
+        low, high = conn.execute(f'SELECT COALESCE(MIN({name}), 0), COALESCE(MAX({name}), 0) FROM {table}').fetchone()
+        values = fetch_column(conn, table, f'COALESCE({name}, 0)', smallest_int_dtype(low, high), row_count, order_column)
+    else:
+        values = fetch_column(conn, table, f'COALESCE({name}, 0)', np.float64, row_count, order_column)
+
+    if column['nullable'] and column['kind'] != 'dictionary':
+        np.save(os.path.join(table_dir, f'{name}.mask.npy'),
+                fetch_column(conn, table, f'{name} IS NULL', np.bool_, row_count, order_column))
+
+    np.save(os.path.join(table_dir, f'{name}.npy'), values)
+    column['dtype'] = str(values.dtype)
+    return column
+
+def export_table(conn, table, directory):
+    table_dir = os.path.join(directory, table)
+    if os.path.exists(table_dir):
+        shutil.rmtree(table_dir)
+    os.makedirs(table_dir)
+
+    row_count = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    table_info = conn.execute(f'PRAGMA table_info({table})').fetchall()
+    # Every exported table starts with its INTEGER PRIMARY KEY; unlike rowid it also exists on the
+    # views of a compact database
+    order_column = table_info[0][1]
+    columns = [export_column(conn, table, name, column_kind(declared_type), row_count, table_dir, order_column)
+               for _, name, declared_type, _, _, _ in table_info]
+    return {'rows': row_count, 'columns': columns}
+
+def export_columnar(db_path, directory=None, tables=None):
+    directory = directory or default_directory(db_path)
+    os.makedirs(directory, exist_ok=True)
+
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    manifest = {'source': os.path.abspath(db_path), 'source_mtime': os.path.getmtime(db_path), 'tables': {}}
+    if tables and os.path.exists(manifest_path):
+        # Exporting a subset keeps the other tables of an earlier export of the same file
+        previous = read_manifest(directory)
+        if previous['source'] == manifest['source']:
+            manifest['tables'] = previous['tables']
+
+    conn = connect_partitioned(db_path)
+    for table in tables or EXPORT_TABLES:
+        manifest['tables'][table] = export_table(conn, table, directory)
+    conn.close()
+
+    # Written last, so a loader never sees a manifest describing files that are still being written
+    temp_path = f'{manifest_path}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(temp_path, manifest_path)
+    return manifest
+
+# ============================================
+# LOAD
+# ============================================
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+        return json.load(f)
+
+def load_arrays(table, directory, columns=None):
+    # Returns {column: (array, info)}; numeric, datetime and dictionary code arrays are read-only memory maps
+    manifest = read_manifest(directory)
+    table_dir = os.path.join(directory, table)
+    arrays = {}
+    for info in manifest['tables'][table]['columns']:
+        name = info['name']
+        if columns is not None and name not in columns:
+            continue
+
+        values = np.load(os.path.join(table_dir, f'{name}.npy'), mmap_mode='r')
+        if info['kind'] == 'datetime':
+            values = values.view('datetime64[s]')
+        elif info['kind'] == 'string':
+            # Strings are the one kind that has to be decoded into Python objects
+            offsets = np.load(os.path.join(table_dir, f'{name}.offsets.npy'))
+            data = values.tobytes()
+            starts = np.concatenate(([0], offsets[:-1]))
+            values = np.array([data[start:end].decode('utf-8') for start, end in zip(starts.tolist(), offsets.tolist())],
+                              dtype=object)
+        arrays[name] = (values, info)
+    return arrays
+
+def load_dataframe(table, directory, columns=None):
+    # pandas is only needed here, the export side works with NumPy alone
+    import pandas as pd
+
+    table_dir = os.path.join(directory, table)
+    data = {}
+    for name, (values, info) in load_arrays(table, directory, columns).items():
+        mask = None
+        if info['nullable'] and info['kind'] != 'dictionary':
+            mask = np.load(os.path.join(table_dir, f'{name}.mask.npy'), mmap_mode='r')
+
+        if info['kind'] == 'dictionary':
+            values = pd.Categorical.from_codes(values, categories=info['dictionary'])
+        elif mask is None:
+            pass
+        elif info['kind'] == 'int':
+            values = pd.arrays.IntegerArray(np.asarray(values), np.asarray(mask))
+        elif info['kind'] == 'float':
+            values = np.where(mask, np.nan, values)
+        elif info['kind'] == 'datetime':
+            values = np.where(mask, np.datetime64('NaT'), values)
+        else:
+            values = np.where(mask, None, values)
+        data[name] = values
+    # copy=False keeps one block per column, so memory-mapped columns are not copied into a 2D block
+    return pd.DataFrame(data, copy=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the database tables to memory-mappable column files.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--out', help='output directory (default: columnar/ next to the database)')
+    parser.add_argument('--tables', nargs='+', choices=EXPORT_TABLES, help='tables to export (default: all)')
+    args = parser.parse_args()
+
+    directory = args.out or default_directory(args.db)
+    print(f"[*] Exporting {args.db} to {directory}...")
+    started = time.perf_counter()
+    manifest = export_columnar(args.db, directory, args.tables)
+    for table, info in manifest['tables'].items():
+        encodings = ', '.join(f"{column['name']}:{column['kind']}" for column in info['columns'])
+        print(f"   {table}: {info['rows']:,} rows ({encodings})")
+    print(f"[+] Export finished in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+
+from date_keys import add_date_keys, has_date_keys
+from rollups import create_rollup_triggers, drop_rollup_triggers
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Compact schema variant: repeated TEXT values are stored as small integer codes in {table}_data,
+# the strings live once in lookup tables and views named like the original tables put them back,
+# so notebooks and existing queries keep working. INSTEAD OF triggers make the views writable.
+# {table: {column: lookup table}}; customers first, orders refer to it
+COMPACT_COLUMNS = {
+    'customers': {'gender': 'genders', 'city': 'cities', 'customer_segment': 'customer_segments'},
+    'orders': {'order_status': 'order_statuses', 'payment_method': 'payment_methods'},
+}
+
+DATA_TABLES = {
+    'customers': '''
+    CREATE TABLE customers_compact (
+        customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        email TEXT NOT NULL,
+        phone TEXT,
+        birth_date DATE,
+        gender_id INTEGER,
+        registration_date DATE NOT NULL,
+        city_id INTEGER,
+        customer_segment_id INTEGER,
+        FOREIGN KEY (gender_id) REFERENCES genders(gender_id),
+        FOREIGN KEY (city_id) REFERENCES cities(city_id),
+        FOREIGN KEY (customer_segment_id) REFERENCES customer_segments(customer_segment_id)
+    )
+    ''',
+    'orders': '''
+    CREATE TABLE orders_compact (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER NOT NULL,
+        order_date DATETIME NOT NULL,
+        order_status_id INTEGER NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_method_id INTEGER NOT NULL,
+        shipping_cost REAL NOT NULL,
+        campaign_id INTEGER,
+        FOREIGN KEY (customer_id) REFERENCES customers_data(customer_id),
+        FOREIGN KEY (order_status_id) REFERENCES order_statuses(order_status_id),
+        FOREIGN KEY (payment_method_id) REFERENCES payment_methods(payment_method_id),
+        FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id)
+    )
+    ''',
+}
+
+def is_compact(cursor):
+    return cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'view' AND name = 'orders'").fetchone()[0] > 0
+
+def storage_table(cursor, table):
+    # Table that actually holds the rows, indexes have to be created on it
+    return f'{table}_data' if table in COMPACT_COLUMNS and is_compact(cursor) else table
+
+def storage_definition(cursor, definition):
+    # 'orders(order_status, total_amount)' -> 'orders_data(order_status_id, total_amount)' in a compact database
+    table, columns = definition.split('(', 1)
+    table = table.strip()
+    if storage_table(cursor, table) == table:
+        return definition
+    for column in COMPACT_COLUMNS[table]:
+        columns = re.sub(rf'\b{column}\b', f'{column}_id', columns)
+    return f'{table}_data({columns}'
+
+def drop_compact_schema(cursor):
+    # Views have to go with DROP VIEW, a plain DROP TABLE on them fails
+    if is_compact(cursor):
+        for table in COMPACT_COLUMNS:
+            cursor.execute(f'DROP VIEW IF EXISTS {table}')
+    for table, columns in COMPACT_COLUMNS.items():
+        cursor.execute(f'DROP TABLE IF EXISTS {table}_data')
+        for lookup in columns.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {lookup}')
+
+# ============================================
+# VIEWS AND TRIGGERS
+# ============================================
+
+def code_expression(column, lookup, row):
+    return f'(SELECT {column}_id FROM {lookup} WHERE {column} = {row}.{column})'
+
+def create_compact_view(cursor, table, table_columns):
+    columns = COMPACT_COLUMNS[table]
+    selected = ', '.join(f'{columns[name]}.{name}' if name in columns else f'd.{name}' for name in table_columns)
+    joins = ' '.join(f'LEFT JOIN {lookup} ON {lookup}.{column}_id = d.{column}_id' for column, lookup in columns.items())
+    cursor.execute(f'CREATE VIEW {table} AS SELECT {selected} FROM {table}_data d {joins}')
+
+def create_compact_triggers(cursor, table, table_columns):
+    # Values not seen before (a new city in --append) get the next code
+    columns = COMPACT_COLUMNS[table]
+    key = table_columns[0]
+    add_values = ' '.join(f'INSERT OR IGNORE INTO {lookup} ({column}) SELECT NEW.{column} WHERE NEW.{column} IS NOT NULL;'
+                          for column, lookup in columns.items())
+    stored = [f'{name}_id' if name in columns else name for name in table_columns]
+    values = [code_expression(name, columns[name], 'NEW') if name in columns else f'NEW.{name}' for name in table_columns]
+
+    cursor.execute(f'''
+        CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table} BEGIN
+            {add_values}
+            INSERT INTO {table}_data ({', '.join(stored)}) VALUES ({', '.join(values)});
+        END
+    ''')
+    assignments = ', '.join(f'{name} = {value}' for name, value in zip(stored, values))
+    cursor.execute(f'''
+        CREATE TRIGGER {table}_update INSTEAD OF UPDATE ON {table} BEGIN
+            {add_values}
+            UPDATE {table}_data SET {assignments} WHERE {key} = OLD.{key};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER {table}_delete INSTEAD OF DELETE ON {table} BEGIN
+            DELETE FROM {table}_data WHERE {key} = OLD.{key};
+        END
+    ''')
+
+# ============================================
+# CONVERSION
+# ============================================
+
+def compact_table(cursor, table):
+    columns = COMPACT_COLUMNS[table]
+    # hidden = 0 for stored columns, the generated date keys are only computed, never copied or inserted
+    table_columns = [row[1] for row in cursor.execute(f'PRAGMA table_xinfo({table})') if row[6] == 0]
+    date_keys = has_date_keys(cursor, table)
+
+    for column, lookup in columns.items():
+        cursor.execute(f'CREATE TABLE {lookup} ({column}_id INTEGER PRIMARY KEY, {column} TEXT NOT NULL UNIQUE)')
+        cursor.execute(f'INSERT INTO {lookup} ({column}) SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL ORDER BY {column}')
+
+    # Renaming first rewrites the REFERENCES clauses of order_items, reviews, customer_rfm, ...
+    # to {table}_data, the rebuilt table then takes over that name
+    cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_data')
+    cursor.execute(DATA_TABLES[table])
+    if date_keys:
+        add_date_keys(cursor, table, f'{table}_compact')
+    stored = [f'{name}_id' if name in columns else name for name in table_columns]
+    selected = [f'{columns[name]}.{name}_id' if name in columns else f'd.{name}' for name in table_columns]
+    joins = ' '.join(f'LEFT JOIN {lookup} ON {lookup}.{column} = d.{column}' for column, lookup in columns.items())
+    cursor.execute(f'''
+        INSERT INTO {table}_compact ({', '.join(stored)})
+        SELECT {', '.join(selected)} FROM {table}_data d {joins} ORDER BY d.{table_columns[0]}
+    ''')
+    cursor.execute(f'DROP TABLE {table}_data')
+    cursor.execute(f'ALTER TABLE {table}_compact RENAME TO {table}_data')
+
+    # Same column order as the original table, code columns under their text names
+    view_columns = [row[1] for row in cursor.execute(f'PRAGMA table_xinfo({table}_data)')]
+    create_compact_view(cursor, table, [name[:-3] if name[:-3] in columns else name for name in view_columns])
+    create_compact_triggers(cursor, table, table_columns)
+
+def compact_database(conn, vacuum=True):
+    # Converts a generated database in place, returns the number of lookup values
+    cursor = conn.cursor()
+    if is_compact(cursor):
+        return None
+    conn.execute('PRAGMA foreign_keys = OFF')
+
+    # Indexes go away with the old tables and are rebuilt on the code columns
+    indexes = cursor.execute(f'''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({', '.join('?' for _ in COMPACT_COLUMNS)})
+    ''', list(COMPACT_COLUMNS)).fetchall()
+    # The rollup triggers read the text columns, they are put back on the orders view afterwards
+    has_rollups = cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sales_rollup'").fetchone()[0] > 0
+    drop_rollup_triggers(cursor)
+
+    for table in COMPACT_COLUMNS:
+        compact_table(cursor, table)
+
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_email ON customers_data(email)')
+    for index_name, sql in indexes:
+        unique, definition = re.match(r'CREATE\s+(UNIQUE\s+)?INDEX\s+\S+\s+ON\s+(.*)$', sql, re.IGNORECASE | re.DOTALL).groups()
+        cursor.execute(f"CREATE {unique or ''}INDEX IF NOT EXISTS {index_name} ON {storage_definition(cursor, definition)}")
+    if has_rollups:
+        create_rollup_triggers(cursor)
+
+    lookup_values = sum(cursor.execute(f'SELECT COUNT(*) FROM {lookup}').fetchone()[0]
+                        for columns in COMPACT_COLUMNS.values() for lookup in columns.values())
+    conn.commit()
+    if vacuum:
+        # The rebuilt tables leave the old pages on the freelist until the file is vacuumed
+        conn.execute('VACUUM')
+    return lookup_values
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a database to the dictionary-encoded compact schema.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    args = parser.parse_args()
+
+    # Imported here: partitions.py imports this module
+    from partitions import is_partitioned
+
+    conn = sqlite3.connect(args.db)
+    if is_partitioned(conn.cursor()):
+        conn.close()
+        print("[!] Partitioned databases cannot be compacted, their orders live in the year files")
+        sys.exit(1)
+    print(f"[*] Compacting {args.db}...")
+    size_before = os.path.getsize(args.db)
+    started = time.perf_counter()
+    lookup_values = compact_database(conn)
+    conn.close()
+    if lookup_values is None:
+        print("[!] Database already uses the compact schema")
+        return
+    print(f"[+] {lookup_values} lookup values, {size_before / 1024 / 1024:.1f} MB -> "
+          f"{os.path.getsize(args.db) / 1024 / 1024:.1f} MB in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
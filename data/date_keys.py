@@ -0,0 +1,93 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Integer date keys next to the text dates, so trends and ranges can use an index instead of
+# strftime()/JULIANDAY() on every row:
+#   {prefix}_day   = days since 1970-01-01 (date({prefix}_day * 86400, 'unixepoch') turns it back)
+#   {prefix}_month = YYYYMM, e.g. 202405
+#   {prefix}_year  = YYYY
+# They are VIRTUAL generated columns: nothing is stored in the table rows, inserts and --append
+# keep them right by construction and only indexes on them take space. They are opt-in
+# (generate_data.py --date-keys or this script): the notebooks show the tables with SELECT *, so
+# the default schema keeps the columns the course material displays.
+# (table, date column, key prefix)
+DATE_KEYS = [
+    ('customers', 'registration_date', 'registration'),
+    ('orders', 'order_date', 'order'),
+    ('reviews', 'review_date', 'review'),
+]
+
+# julianday('1970-01-01')
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+def year_expression(date_column):
+    # Dates are stored as 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'
+    return f'CAST(substr({date_column}, 1, 4) AS INTEGER)'
+
+def date_key_columns(date_column, prefix):
+    return [
+        (f'{prefix}_day', f'CAST(julianday({date_column}) - {UNIX_EPOCH_JULIAN_DAY} AS INTEGER)'),
+        (f'{prefix}_month', f'CAST(substr({date_column}, 1, 4) || substr({date_column}, 6, 2) AS INTEGER)'),
+        (f'{prefix}_year', year_expression(date_column)),
+    ]
+
+def has_date_keys(cursor, table):
+    return any(row[6] != 0 for row in cursor.execute(f'PRAGMA table_xinfo({table})'))
+
+def add_date_keys(cursor, table, target=None):
+    # Adds the missing key columns of `table` to `target` (the table holding its rows, default `table`).
+    # ALTER TABLE can add VIRTUAL generated columns without rewriting the table.
+    target = target or table
+    existing = {row[1] for row in cursor.execute(f'PRAGMA table_xinfo({target})')}
+    added = 0
+    for key_table, date_column, prefix in DATE_KEYS:
+        if key_table != table:
+            continue
+        for name, expression in date_key_columns(date_column, prefix):
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {target} ADD COLUMN {name} INTEGER GENERATED ALWAYS AS ({expression}) VIRTUAL')
+                added += 1
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description='Add the integer date key columns to an existing database.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--indexes', action='store_true', help='also create the secondary indexes from indexes.py')
+    args = parser.parse_args()
+
+    # Imported here: partitions.py imports this module
+    from partitions import is_partitioned
+
+    conn = sqlite3.connect(args.db)
+    cursor = conn.cursor()
+    if is_partitioned(cursor):
+        # orders and reviews live in the year files, the main file has no table to alter
+        conn.close()
+        print("[!] Partitioned databases get their date keys when they are generated, regenerate with --partition-by-year --date-keys")
+        sys.exit(1)
+    print(f"[*] Adding date keys to {args.db}...")
+    started = time.perf_counter()
+    view_count = cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'view' AND name = 'orders'").fetchone()[0]
+    if view_count:
+        # Generated columns of a compact database live on the *_data tables behind the views
+        conn.close()
+        print("[!] Compact databases get their date keys when they are generated, regenerate with --compact --date-keys")
+        sys.exit(1)
+    added = sum(add_date_keys(cursor, table) for table, _, _ in DATE_KEYS)
+    if args.indexes:
+        # Imported here: indexes.py pulls in the compact schema helpers, which import this module
+        from indexes import create_secondary_indexes
+        create_secondary_indexes(cursor)
+        cursor.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    print(f"[+] {added} date key columns added in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import re
+import sys
+
+from notebook_queries import load_notebook_queries
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Tables that grow with --scale; small dimension tables are fine to scan
+FACT_TABLES = {'customers', 'orders', 'order_items', 'reviews'}
+
+TABLE_REF_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+SQL_KEYWORDS = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'ON', 'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'CROSS', 'USING'}
+
+def table_aliases(sql):
+    aliases = {}
+    for table, alias in TABLE_REF_PATTERN.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+def explain(conn, sql):
+    return conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+
+def classify_plan(sql, plan):
+    # Returns (detail, table, access) for every loop over a fact table. A plain SCAN is only
+    # acceptable as the outer loop of a query without WHERE, where every row is part of the result.
+    aliases = table_aliases(sql)
+    has_where = re.search(r'\bWHERE\b', sql, re.I) is not None
+    seen_parents = set()
+    steps = []
+
+    for _, parent, _, detail in plan:
+        match = re.match(r'(SCAN|SEARCH) (\w+)', detail)
+        if not match:
+            continue
+        outer_loop = parent not in seen_parents
+        seen_parents.add(parent)
+
+        table = aliases.get(match.group(2), match.group(2))
+        if table not in FACT_TABLES:
+            continue
+
+        if 'AUTOMATIC' in detail:
+            access = 'full scan'
+        elif match.group(1) == 'SEARCH':
+            access = 'search'
+        elif 'INDEX' in detail:
+            access = 'index scan'
+        elif outer_loop and not has_where:
+            access = 'driving scan'
+        else:
+            access = 'full scan'
+        steps.append((detail, table, access))
+    return steps
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN QUERY PLAN report for the notebook queries.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--verbose', action='store_true', help='print the full plan of every query')
+    parser.add_argument('--strict', action='store_true', help='exit with status 1 if any query does a full scan')
+    args = parser.parse_args()
+
+    conn = connect_partitioned(args.db)
+    index_count = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchone()[0]
+    has_stats = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()[0]
+
+    print(f"[*] EXPLAIN QUERY PLAN report: {args.db}")
+    print(f"[*] {index_count} secondary indexes, sqlite_stat1 {'present' if has_stats else 'missing'}\n")
+
+    queries = load_notebook_queries()
+    flagged = []
+    for name, sql in queries:
+        plan = explain(conn, sql)
+        steps = classify_plan(sql, plan)
+        full_scans = sorted({table for _, table, access in steps if access == 'full scan'})
+
+        if full_scans:
+            flagged.append(name)
+            print(f"[!] {name}: FULL SCAN {', '.join(full_scans)}")
+        else:
+            accesses = ', '.join(sorted({f'{table} {access}' for _, table, access in steps})) or 'dimension tables only'
+            print(f"[+] {name}: {accesses}")
+
+        if args.verbose or full_scans:
+            for _, _, _, detail in plan:
+                print(f"      {detail}")
+
+    conn.close()
+
+    print(f"\n[*] {len(queries) - len(flagged)} of {len(queries)} queries avoid full scans of {', '.join(sorted(FACT_TABLES))}")
+    if flagged and args.strict:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
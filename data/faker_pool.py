@@ -0,0 +1,56 @@
+import json
+import os
+from importlib import metadata
+
+# Pre-generated tr_TR names and phones, so customer generation samples from a file
+# instead of calling Faker row by row. Faker is only imported to build a missing pool.
+POOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+POOL_LOCALE = 'tr_TR'
+POOL_SIZE = 20000
+
+def clean_name_for_email(name):
+    char_map = {
+        'ı': 'i', 'ğ': 'g', 'ü': 'u', 'ş': 's', 'ö': 'o', 'ç': 'c',
+        'İ': 'i', 'Ğ': 'g', 'Ü': 'u', 'Ş': 's', 'Ö': 'o', 'Ç': 'c',
+    }
+    for turkish_char, latin_char in char_map.items():
+        name = name.replace(turkish_char, latin_char)
+    return name.lower()
+
+def faker_pool_path(seed):
+    # A new Faker release can change its word lists, so the version is part of the key
+    faker_version = metadata.version('faker')
+    return os.path.join(POOL_DIR, f'faker_pool_{POOL_LOCALE}_{faker_version}_seed{seed}_{POOL_SIZE}.json')
+
+def build_faker_pool(seed):
+    from faker import Faker
+
+    fake = Faker(POOL_LOCALE)
+    fake.seed_instance(seed)
+
+    first_names = [fake.first_name() for _ in range(POOL_SIZE)]
+    last_names = [fake.last_name() for _ in range(POOL_SIZE)]
+    # Phone with +90, leading 0 removed
+    phones = [f"+90{fake.phone_number().replace('0', '', 1)}" for _ in range(POOL_SIZE)]
+
+    # Names are stored next to their email-safe form so the cleanup runs once per pool entry
+    return {
+        'first_names': [[name, clean_name_for_email(name)] for name in first_names],
+        'last_names': [[name, clean_name_for_email(name)] for name in last_names],
+        'phones': phones,
+    }
+
+def load_faker_pool(seed):
+    path = faker_pool_path(seed)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    pool = build_faker_pool(seed)
+    os.makedirs(POOL_DIR, exist_ok=True)
+    # Write then rename, so a concurrent reader never sees a half-written pool
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(pool, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return pool
@@ -1,144 +1,304 @@
+import argparse
+import itertools
+import math
+import os
+import tempfile
 import sqlite3
 import sys
-import io
 import random
-from datetime import datetime, timedelta
-from faker import Faker
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import numpy as np
+
+from campaign_index import CampaignIndex, to_epoch_day
+from category_tree import build_category_tree
+from co_purchase import build_co_purchase, has_co_purchase, update_co_purchase
+from columnar import default_directory, export_columnar
+from compact_schema import compact_database, drop_compact_schema, storage_table
+from date_keys import DATE_KEYS, add_date_keys
+from faker_pool import load_faker_pool
+from indexes import create_secondary_indexes
+from partitions import (add_partitions, connect_partitioned, is_partitioned, partition_database, partition_directory,
+                        partition_schema, rows_by_year)
+from phase_metrics import PhaseMetrics, stop_memory_tracing
+from review_search import build_text_index, has_text_index, update_review_terms
+from rfm import update_rfm
+from rollups import build_rollups, refresh_rollups
 
 if sys.platform == 'win32':
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Row counts at scale factor 1, everything else is derived from these
+BASE_CUSTOMER_COUNT = 5000
+BASE_REVIEW_COUNT = 3000
+DEFAULT_BATCH_SIZE = 10000
+SEED = 42
+
+# Bulk-load profile: fixed-size page cache (negative = KiB) and a larger page for sequential appends
+BULK_LOAD_PAGE_SIZE = 16384
+BULK_LOAD_CACHE_SIZE = -65536
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Generate the e-commerce training database.')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help=f'scale factor, 1 = {BASE_CUSTOMER_COUNT} customers (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f'rows per executemany batch (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--engine', choices=['python', 'numpy'], default='python',
+                        help='order generation engine, numpy draws whole batches as arrays (default: python)')
+    parser.add_argument('--db', default='data/ecommerce.db',
+                        help='output database path (default: data/ecommerce.db)')
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help=f'global random seed (default: {SEED})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of customer shards generated in parallel processes (default: 1)')
+    parser.add_argument('--bulk-load', action='store_true',
+                        help='rebuild the file from scratch with journaling off and indexes built after the load')
+    parser.add_argument('--indexes', action='store_true',
+                        help='create the secondary indexes from indexes.py and populate sqlite_stat1')
+    parser.add_argument('--resegment', action='store_true',
+                        help='only re-segment customers of an existing database, using orders added since the last run')
+    parser.add_argument('--date-keys', action='store_true',
+                        help='add integer day/month/year key columns to customers, orders and reviews (date_keys.py)')
+    parser.add_argument('--compact', action='store_true',
+                        help='store status, payment method, gender, city and segment as integer codes behind compatibility views')
+    parser.add_argument('--partition-by-year', action='store_true',
+                        help='move orders, order_items and reviews into one file per year under {db name}_partitions/')
+    parser.add_argument('--fts', action='store_true',
+                        help='create the reviews_fts full-text index and per-rating term counts (review_terms)')
+    parser.add_argument('--co-purchase', action='store_true',
+                        help='build the product_pairs co-purchase matrix for "bought together" queries')
+    parser.add_argument('--columnar', action='store_true',
+                        help='also export the tables as memory-mappable column files to columnar/ next to the database')
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='write per-phase wall time, rows/s and memory as JSON to PATH')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='add the Python heap peak and allocation hot spots of every phase (tracemalloc, slower)')
+    parser.add_argument('--profile-orders', metavar='PATH',
+                        help='run the order loop under cProfile and write the stats to PATH (single-process runs)')
+    parser.add_argument('--append', action='store_true',
+                        help='extend an existing database with customers, orders, reviews and campaigns up to --until')
+    parser.add_argument('--until', type=date.fromisoformat,
+                        help='new end of the order history for --append, YYYY-MM-DD (exclusive)')
+    args = parser.parse_args()
+    if args.scale <= 0:
+        parser.error('--scale must be positive')
+    if args.batch_size <= 0:
+        parser.error('--batch-size must be positive')
+    if args.workers <= 0:
+        parser.error('--workers must be positive')
+    if args.append != (args.until is not None):
+        parser.error('--append and --until must be used together')
+    if args.append and (args.bulk_load or args.resegment):
+        parser.error('--append cannot be combined with --bulk-load or --resegment')
+    if args.partition_by_year and (args.compact or args.fts or args.append or args.resegment):
+        parser.error('--partition-by-year cannot be combined with --compact, --fts, --append or --resegment')
+    if args.profile_orders and args.workers > 1:
+        parser.error('--profile-orders profiles the in-process order loop, use it with --workers 1')
+    return args
+
+def batched(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def random_date_between(start_date, end_date):
+    return start_date + timedelta(days=random.randint(0, (end_date - start_date).days))
+
+def random_datetime_between(start_date, end_date):
+    return start_date + timedelta(seconds=random.randint(0, int((end_date - start_date).total_seconds())))
+
+def insert_rows(cursor, sql, rows, batch_size):
+    # Consume a row generator in fixed-size batches so memory does not grow with the row count
+    count = 0
+    for batch in batched(rows, batch_size):
+        cursor.executemany(sql, batch)
+        count += len(batch)
+    return count
 
-fake = Faker('tr_TR')
-Faker.seed(42)
-random.seed(42)
-
-def clean_name_for_email(name):
-    char_map = {
-        'ı': 'i', 'ğ': 'g', 'ü': 'u', 'ş': 's', 'ö': 'o', 'ç': 'c',
-        'İ': 'i', 'Ğ': 'g', 'Ü': 'u', 'Ş': 's', 'Ö': 'o', 'Ç': 'c',
-    }
-    for turkish_char, latin_char in char_map.items():
-        name = name.replace(turkish_char, latin_char)
-    return name.lower()
-
-conn = sqlite3.connect('data/ecommerce.db')
-cursor = conn.cursor()
+# ============================================
+# CREATE TABLES
+# ============================================
 
-print("[*] Creating e-commerce database...")
+def create_tables(cursor, defer_unique=False, date_keys=False):
+    # In bulk-load mode the email uniqueness is enforced by an index built after the load
+    email_column = 'email TEXT NOT NULL' if defer_unique else 'email TEXT UNIQUE NOT NULL'
+
+    # Drop existing tables if any
+    drop_compact_schema(cursor)
+    cursor.execute('DROP TABLE IF EXISTS partitions')
+    cursor.execute('DROP TABLE IF EXISTS reviews_fts')
+    cursor.execute('DROP TABLE IF EXISTS review_terms_state')
+    cursor.execute('DROP TABLE IF EXISTS review_terms')
+    cursor.execute('DROP TABLE IF EXISTS co_purchase_state')
+    cursor.execute('DROP TABLE IF EXISTS product_orders')
+    cursor.execute('DROP TABLE IF EXISTS product_pairs')
+    cursor.execute('DROP TABLE IF EXISTS rfm_state')
+    cursor.execute('DROP TABLE IF EXISTS customer_rfm')
+    cursor.execute('DROP TABLE IF EXISTS sales_rollup')
+    cursor.execute('DROP TABLE IF EXISTS category_roots')
+    cursor.execute('DROP TABLE IF EXISTS category_closure')
+    cursor.execute('DROP TABLE IF EXISTS generation_state')
+    cursor.execute('DROP TABLE IF EXISTS product_quality')
+    cursor.execute('DROP TABLE IF EXISTS segmentation_state')
+    cursor.execute('DROP TABLE IF EXISTS customer_spending')
+    cursor.execute('DROP TABLE IF EXISTS reviews')
+    cursor.execute('DROP TABLE IF EXISTS order_items')
+    cursor.execute('DROP TABLE IF EXISTS orders')
+    cursor.execute('DROP TABLE IF EXISTS products')
+    cursor.execute('DROP TABLE IF EXISTS campaigns')
+    cursor.execute('DROP TABLE IF EXISTS customers')
+    cursor.execute('DROP TABLE IF EXISTS categories')
+
+    cursor.execute(f'''
+    CREATE TABLE IF NOT EXISTS customers (
+        customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        first_name TEXT NOT NULL,
+        last_name TEXT NOT NULL,
+        {email_column},
+        phone TEXT,
+        birth_date DATE,
+        gender TEXT,
+        registration_date DATE NOT NULL,
+        city TEXT,
+        customer_segment TEXT
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS categories (
+        category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        category_name TEXT NOT NULL,
+        parent_category_id INTEGER,
+        FOREIGN KEY (parent_category_id) REFERENCES categories(category_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_name TEXT NOT NULL,
+        category_id INTEGER NOT NULL,
+        brand TEXT,
+        price REAL NOT NULL,
+        stock_quantity INTEGER NOT NULL,
+        created_date DATE NOT NULL,
+        FOREIGN KEY (category_id) REFERENCES categories(category_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS campaigns (
+        campaign_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        campaign_name TEXT NOT NULL,
+        discount_rate REAL NOT NULL,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        min_basket_amount REAL
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS orders (
+        order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER NOT NULL,
+        order_date DATETIME NOT NULL,
+        order_status TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        payment_method TEXT NOT NULL,
+        shipping_cost REAL NOT NULL,
+        campaign_id INTEGER,
+        FOREIGN KEY (customer_id) REFERENCES customers(customer_id),
+        FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS order_items (
+        item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        discount_rate REAL DEFAULT 0,
+        FOREIGN KEY (order_id) REFERENCES orders(order_id),
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''')
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS reviews (
+        review_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id INTEGER NOT NULL,
+        customer_id INTEGER NOT NULL,
+        rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
+        review_text TEXT,
+        review_date DATETIME NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(product_id),
+        FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+    )
+    ''')
 
-# Drop existing tables if any
-cursor.execute('DROP TABLE IF EXISTS reviews')
-cursor.execute('DROP TABLE IF EXISTS order_items')
-cursor.execute('DROP TABLE IF EXISTS orders')
-cursor.execute('DROP TABLE IF EXISTS products')
-cursor.execute('DROP TABLE IF EXISTS campaigns')
-cursor.execute('DROP TABLE IF EXISTS customers')
-cursor.execute('DROP TABLE IF EXISTS categories')
+    # Integer day/month/year keys of registration_date, order_date and review_date (generated columns)
+    if date_keys:
+        for table, _, _ in DATE_KEYS:
+            add_date_keys(cursor, table)
 
 # ============================================
-# CREATE TABLES
+# BULK LOAD
 # ============================================
 
-print("\n[*] Creating tables...")
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS customers (
-    customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    first_name TEXT NOT NULL,
-    last_name TEXT NOT NULL,
-    email TEXT UNIQUE NOT NULL,
-    phone TEXT,
-    birth_date DATE,
-    gender TEXT,
-    registration_date DATE NOT NULL,
-    city TEXT,
-    customer_segment TEXT
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS categories (
-    category_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    category_name TEXT NOT NULL,
-    parent_category_id INTEGER,
-    FOREIGN KEY (parent_category_id) REFERENCES categories(category_id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS products (
-    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_name TEXT NOT NULL,
-    category_id INTEGER NOT NULL,
-    brand TEXT,
-    price REAL NOT NULL,
-    stock_quantity INTEGER NOT NULL,
-    created_date DATE NOT NULL,
-    FOREIGN KEY (category_id) REFERENCES categories(category_id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS campaigns (
-    campaign_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    campaign_name TEXT NOT NULL,
-    discount_rate REAL NOT NULL,
-    start_date DATE NOT NULL,
-    end_date DATE NOT NULL,
-    min_basket_amount REAL
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS orders (
-    order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    customer_id INTEGER NOT NULL,
-    order_date DATETIME NOT NULL,
-    order_status TEXT NOT NULL,
-    total_amount REAL NOT NULL,
-    payment_method TEXT NOT NULL,
-    shipping_cost REAL NOT NULL,
-    campaign_id INTEGER,
-    FOREIGN KEY (customer_id) REFERENCES customers(customer_id),
-    FOREIGN KEY (campaign_id) REFERENCES campaigns(campaign_id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS order_items (
-    item_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    order_id INTEGER NOT NULL,
-    product_id INTEGER NOT NULL,
-    quantity INTEGER NOT NULL,
-    unit_price REAL NOT NULL,
-    discount_rate REAL DEFAULT 0,
-    FOREIGN KEY (order_id) REFERENCES orders(order_id),
-    FOREIGN KEY (product_id) REFERENCES products(product_id)
-)
-''')
-
-cursor.execute('''
-CREATE TABLE IF NOT EXISTS reviews (
-    review_id INTEGER PRIMARY KEY AUTOINCREMENT,
-    product_id INTEGER NOT NULL,
-    customer_id INTEGER NOT NULL,
-    rating INTEGER NOT NULL CHECK(rating >= 1 AND rating <= 5),
-    review_text TEXT,
-    review_date DATETIME NOT NULL,
-    FOREIGN KEY (product_id) REFERENCES products(product_id),
-    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-)
-''')
-
-print("[+] Tables created successfully!")
+def remove_database(db_path):
+    for path in (db_path, f'{db_path}-journal', f'{db_path}-wal', f'{db_path}-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+
+def apply_bulk_load_pragmas(conn):
+    # page_size only takes effect before the first table is written, so call this on a fresh file
+    conn.execute(f'PRAGMA page_size = {BULK_LOAD_PAGE_SIZE}')
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute(f'PRAGMA cache_size = {BULK_LOAD_CACHE_SIZE}')
+    conn.execute('PRAGMA foreign_keys = OFF')
+
+def create_deferred_indexes(cursor):
+    cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_customers_email ON {storage_table(cursor, 'customers')}(email)")
+
+def finish_bulk_load(conn, metrics, secondary_indexes=False):
+    cursor = conn.cursor()
+
+    started = metrics.start()
+    create_deferred_indexes(cursor)
+    if secondary_indexes:
+        create_secondary_indexes(cursor)
+    conn.commit()
+    metrics.add('indexes', None, started)
+
+    # Foreign keys are declared but were not enforced during the load, check them once at the end
+    violations = cursor.execute('PRAGMA foreign_key_check').fetchall()
+    if violations:
+        raise sqlite3.IntegrityError(f'{len(violations)} foreign key violations, first: {violations[0]}')
+
+    started = metrics.start()
+    cursor.execute('ANALYZE')
+    conn.commit()
+    metrics.add('analyze', None, started)
+
+    started = metrics.start()
+    cursor.execute('VACUUM')
+    metrics.add('vacuum', None, started)
+
+    # Leave the file with a normal rollback journal for readers
+    cursor.execute('PRAGMA journal_mode = DELETE')
 
 # ============================================
 # CATEGORIES
 # ============================================
 
-print("\n[*] Inserting categories...")
-
 categories_data = [
     ('Elektronik', None),
     ('Moda', None),
@@ -160,15 +320,14 @@ categories_data = [
     ('Bilim', 5),
 ]
 
-cursor.executemany('INSERT INTO categories (category_name, parent_category_id) VALUES (?, ?)', categories_data)
-print(f"[+] {len(categories_data)} categories inserted!")
+def insert_categories(cursor):
+    cursor.executemany('INSERT INTO categories (category_name, parent_category_id) VALUES (?, ?)', categories_data)
+    return len(categories_data)
 
 # ============================================
 # CAMPAIGNS
 # ============================================
 
-print("\n[*] Inserting campaigns...")
-
 campaigns_data = [
     ('Yılbaşı Kampanyası', 20, '2022-12-20', '2023-01-05', 500),
     ('Sevgililer Günü', 15, '2023-02-10', '2023-02-14', 200),
@@ -185,19 +344,17 @@ campaigns_data = [
     ('Black Friday 2024', 45, '2024-11-29', '2024-12-02', 700),
 ]
 
-cursor.executemany('''
-    INSERT INTO campaigns (campaign_name, discount_rate, start_date, end_date, min_basket_amount)
-    VALUES (?, ?, ?, ?, ?)
-''', campaigns_data)
-
-print(f"[+] {len(campaigns_data)} campaigns inserted!")
+def insert_campaigns(cursor):
+    cursor.executemany('''
+        INSERT INTO campaigns (campaign_name, discount_rate, start_date, end_date, min_basket_amount)
+        VALUES (?, ?, ?, ?, ?)
+    ''', campaigns_data)
+    return len(campaigns_data)
 
 # ============================================
 # PRODUCTS
 # ============================================
 
-print("\n[*] Inserting products...")
-
 brands = {
     6: ['Apple', 'Samsung', 'Xiaomi', 'Huawei', 'Oppo'],
     7: ['Apple', 'Lenovo', 'HP', 'Dell', 'Asus'],
@@ -230,41 +387,32 @@ product_templates = {
     18: ['Bilim Kitabı', 'Astronomi', 'Fizik', 'Biyoloji', 'Matematik'],
 }
 
-products = []
-start_date = datetime(2021, 1, 1)
-end_date = datetime(2025, 1, 1)
-
-for category_id in range(6, 19):
-    for _ in range(random.randint(15, 30)):
-        template = random.choice(product_templates[category_id])
-        brand = random.choice(brands[category_id])
-        product_name = f"{brand} {template}"
-        
-        if category_id in [6, 7, 8, 12]:
-            price = round(random.uniform(500, 25000), 2)
-        elif category_id in [9, 10, 11]:
-            price = round(random.uniform(50, 2000), 2)
-        else:
-            price = round(random.uniform(20, 500), 2)
-        
-        stock = random.randint(0, 500)
-        created_date = fake.date_between(start_date=start_date, end_date=end_date)
-        
-        products.append((product_name, category_id, brand, price, stock, created_date))
-
-cursor.executemany('''
-    INSERT INTO products (product_name, category_id, brand, price, stock_quantity, created_date)
-    VALUES (?, ?, ?, ?, ?, ?)
-''', products)
-
-print(f"[+] {len(products)} products inserted!")
+def generate_products():
+    start_date = date(2021, 1, 1)
+    end_date = date(2025, 1, 1)
+
+    for category_id in range(6, 19):
+        for _ in range(random.randint(15, 30)):
+            template = random.choice(product_templates[category_id])
+            brand = random.choice(brands[category_id])
+            product_name = f"{brand} {template}"
+
+            if category_id in [6, 7, 8, 12]:
+                price = round(random.uniform(500, 25000), 2)
+            elif category_id in [9, 10, 11]:
+                price = round(random.uniform(50, 2000), 2)
+            else:
+                price = round(random.uniform(20, 500), 2)
+
+            stock = random.randint(0, 500)
+            created_date = random_date_between(start_date, end_date)
+
+            yield (product_name, category_id, brand, price, stock, created_date)
 
 # ============================================
 # CUSTOMERS
 # ============================================
 
-print("\n[*] Inserting customers...")
-
 turkish_cities = {
     'İstanbul': 30,
     'Ankara': 15,
@@ -280,57 +428,61 @@ turkish_cities = {
     'Diyarbakır': 3
 }
 
-customers = []
-customer_count = 5000
-
-for _ in range(customer_count):
-    first_name = fake.first_name()
-    last_name = fake.last_name()
-    
-    # Clean email from Turkish characters
-    email_first = clean_name_for_email(first_name)
-    email_last = clean_name_for_email(last_name)
-    email = f"{email_first}.{email_last}{random.randint(1, 9999)}@gmail.com"
-    
-    # Phone with +90
-    phone_number = fake.phone_number().replace('0', '', 1)  # Remove leading 0
-    phone = f"+90{phone_number}"
-    
-    birth_date = fake.date_of_birth(minimum_age=18, maximum_age=75)
-    
-    # Normalized gender values
-    gender = random.choice(['erkek', 'kadin', 'belirtmek_istemiyorum'])
-    
-    registration_date = fake.date_between(start_date=datetime(2022, 1, 1), end_date=datetime(2025, 1, 1))
-    city = random.choices(list(turkish_cities.keys()), weights=list(turkish_cities.values()))[0]
-    
-    customers.append((first_name, last_name, email, phone, birth_date, gender, registration_date, city, None))
-
-cursor.executemany('''
-    INSERT INTO customers (first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-''', customers)
-
-print(f"[+] {customer_count} customers inserted!")
+# Customers are 18-75 years old at the end of the order history, not on the day the script runs
+birth_reference_date = date(2025, 10, 29)
+
+registration_start_date = date(2022, 1, 1)
+registration_end_date = date(2025, 1, 1)
+
+def generate_customers(customer_count, faker_pool, first_customer_number=1,
+                       registration_start=registration_start_date, registration_end=registration_end_date):
+    city_names = list(turkish_cities.keys())
+    city_weights = list(turkish_cities.values())
+    first_names = faker_pool['first_names']
+    last_names = faker_pool['last_names']
+    phones = faker_pool['phones']
+    oldest_birth_date = birth_reference_date.replace(year=birth_reference_date.year - 76) + timedelta(days=1)
+    youngest_birth_date = birth_reference_date.replace(year=birth_reference_date.year - 18)
+
+    for customer_number in range(first_customer_number, first_customer_number + customer_count):
+        # Pool entries carry the email form already cleaned from Turkish characters
+        first_name, email_first = random.choice(first_names)
+        last_name, email_last = random.choice(last_names)
+
+        email_suffix = random.randint(1, 9999)
+        if customer_number > BASE_CUSTOMER_COUNT:
+            # Beyond scale 1 the random suffix alone collides, prefix it with the customer number
+            email_suffix = f"{customer_number}{email_suffix:04d}"
+        email = f"{email_first}.{email_last}{email_suffix}@gmail.com"
+
+        phone = random.choice(phones)
+        birth_date = random_date_between(oldest_birth_date, youngest_birth_date)
+
+        # Normalized gender values
+        gender = random.choice(['erkek', 'kadin', 'belirtmek_istemiyorum'])
+
+        registration_date = random_date_between(registration_start, registration_end)
+        city = random.choices(city_names, weights=city_weights)[0]
+
+        yield (first_name, last_name, email, phone, birth_date, gender, registration_date, city, None)
 
 # ============================================
 # ORDERS WITH GROWTH TREND AND SEASONALITY
 # ============================================
 
-print("\n[*] Creating orders...")
-
 # Normalized status and payment method values
 order_statuses = ['teslim_edildi', 'teslim_edildi', 'teslim_edildi', 'kargoda', 'hazirlaniyor', 'iptal']
 payment_methods = ['kredi_karti', 'kredi_karti', 'havale', 'kapida_odeme']
+shipping_costs = [0, 0, 0, 15.99, 24.99, 34.99]
 
-cursor.execute('SELECT product_id, price FROM products')
-products_list = cursor.fetchall()
+# (values, weights) pairs shared by both order engines
+order_count_distribution = ([0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 15, 20],
+                            [100, 200, 250, 200, 150, 100, 50, 30, 20, 10, 5, 3, 1])
+product_count_distribution = ([1, 2, 3, 4, 5], [40, 30, 15, 10, 5])
+quantity_distribution = ([1, 2, 3, 4], [70, 20, 7, 3])
+discount_distribution = ([0, 5, 10, 15, 20, 25], [60, 15, 10, 8, 5, 2])
 
-cursor.execute('SELECT customer_id, registration_date FROM customers')
-customers_list = cursor.fetchall()
-
-cursor.execute('SELECT campaign_id, start_date, end_date, discount_rate, min_basket_amount FROM campaigns')
-campaigns_list = cursor.fetchall()
+order_end_date = datetime(2025, 10, 29)
 
 def get_monthly_multiplier(month):
     seasonal_factors = {
@@ -344,123 +496,290 @@ def get_yearly_growth(year):
     growth_rate = 0.25
     return 1.0 + (year - base_year) * growth_rate
 
-def get_applicable_campaign(order_date, total_amount):
-    order_date_str = order_date.strftime('%Y-%m-%d')
-    for campaign_id, start_date, end_date, discount_rate, min_basket in campaigns_list:
-        if start_date <= order_date_str <= end_date:
-            if min_basket is None or total_amount >= min_basket:
-                return campaign_id, discount_rate
-    return None, 0
-
-orders = []
-order_items_list = []
-customer_spending = {c[0]: 0 for c in customers_list}
-
-order_id_counter = 1
-
-for customer_id, registration_date in customers_list:
-    order_count = random.choices(
-        [0, 1, 2, 3, 4, 5, 6, 7, 8, 10, 12, 15, 20],
-        weights=[100, 200, 250, 200, 150, 100, 50, 30, 20, 10, 5, 3, 1]
-    )[0]
-    
-    for _ in range(order_count):
-        order_date = fake.date_time_between(
-            start_date=datetime.strptime(registration_date, '%Y-%m-%d'),
-            end_date=datetime(2025, 10, 29)
-        )
-        
-        year = order_date.year
-        month = order_date.month
-        
-        growth_factor = get_yearly_growth(year)
-        seasonal_factor = get_monthly_multiplier(month)
-        
-        if random.random() > (growth_factor * seasonal_factor) / 3.0:
+def get_applicable_campaign(order_date, total_amount, campaign_index):
+    return campaign_index.lookup(to_epoch_day(order_date), total_amount)
+
+def build_order(order_id, customer_id, order_date, products_list, campaign_index):
+    # Status, payment, items and campaign of one accepted order, returns (order_row, order_item_rows)
+    order_status = random.choice(order_statuses)
+    payment_method = random.choice(payment_methods)
+    shipping_cost = round(random.choice(shipping_costs), 2)
+
+    product_count = random.choices(*product_count_distribution)[0]
+    selected_products = random.sample(products_list, min(product_count, len(products_list)))
+
+    total_amount = shipping_cost
+    order_items = []
+
+    for product_id, product_price in selected_products:
+        quantity = random.choices(*quantity_distribution)[0]
+        unit_price = product_price
+        discount_rate = random.choices(*discount_distribution)[0]
+
+        line_total = quantity * unit_price * (1 - discount_rate / 100)
+        total_amount += line_total
+
+        order_items.append((order_id, product_id, quantity, unit_price, discount_rate))
+
+    total_amount = round(total_amount, 2)
+
+    campaign_id, campaign_discount = get_applicable_campaign(order_date, total_amount, campaign_index)
+    if campaign_id:
+        total_amount = round(total_amount * (1 - campaign_discount / 100), 2)
+
+    return (order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id), order_items
+
+def generate_orders(customers_list, products_list, campaign_index):
+    # Yields (order_row, order_item_rows) one order at a time; customers_list may be a live cursor
+    order_id_counter = 1
+
+    for customer_id, registration_date in customers_list:
+        order_count = random.choices(*order_count_distribution)[0]
+
+        for _ in range(order_count):
+            order_date = random_datetime_between(datetime.strptime(registration_date, '%Y-%m-%d'), order_end_date)
+
+            year = order_date.year
+            month = order_date.month
+
+            growth_factor = get_yearly_growth(year)
+            seasonal_factor = get_monthly_multiplier(month)
+
+            if random.random() > (growth_factor * seasonal_factor) / 3.0:
+                continue
+
+            yield build_order(order_id_counter, customer_id, order_date, products_list, campaign_index)
+            order_id_counter += 1
+
+def batch_orders(orders, batch_size):
+    # Groups (order_row, order_item_rows) pairs into (order_rows, order_item_rows) batches
+    order_batch = []
+    item_batch = []
+    for order, order_items in orders:
+        order_batch.append(order)
+        item_batch.extend(order_items)
+        if len(item_batch) >= batch_size:
+            yield order_batch, item_batch
+            order_batch = []
+            item_batch = []
+    if order_batch:
+        yield order_batch, item_batch
+
+# ============================================
+# ORDERS (NUMPY ENGINE)
+# ============================================
+
+def choose(rng, distribution, size):
+    values, weights = distribution
+    weights = np.asarray(weights, dtype=np.float64)
+    return rng.choice(np.asarray(values), size=size, p=weights / weights.sum())
+
+def sample_without_replacement(rng, population, max_count, size):
+    # Draws max_count distinct indices per row like random.sample: each pick is taken from the
+    # remaining slots and shifted past the smaller indices already picked in that row
+    picks = np.empty((size, max_count), dtype=np.int64)
+    for slot in range(max_count):
+        pick = rng.integers(0, population - slot, size=size)
+        for taken in np.sort(picks[:, :slot], axis=1).T:
+            pick += pick >= taken
+        picks[:, slot] = pick
+    return picks
+
+def generate_order_batches_numpy(customers_list, products_list, campaign_index, batch_size, seed):
+    # Same model as generate_orders, drawn as arrays for a whole batch of customers at once
+    rng = np.random.default_rng(seed)
+
+    product_ids = np.array([row[0] for row in products_list], dtype=np.int64)
+    product_prices = np.array([row[1] for row in products_list], dtype=np.float64)
+    max_products = min(max(product_count_distribution[0]), len(products_list))
+
+    # Seasonality and growth as lookup tables built from the scalar model functions
+    monthly_multiplier = np.array([get_monthly_multiplier(month) for month in range(1, 13)])
+    statuses = np.array(order_statuses)
+    methods = np.array(payment_methods)
+    end_ts = int((order_end_date - datetime(1970, 1, 1)).total_seconds())
+
+    order_id_counter = 1
+
+    for customer_batch in batched(customers_list, batch_size):
+        customer_ids = np.array([row[0] for row in customer_batch], dtype=np.int64)
+        start_ts = np.array([row[1] for row in customer_batch], dtype='datetime64[s]').astype(np.int64)
+
+        order_counts = choose(rng, order_count_distribution, len(customer_batch))
+        owner = np.repeat(np.arange(len(customer_batch)), order_counts)
+        customer_col = customer_ids[owner]
+        order_ts = rng.integers(start_ts[owner], end_ts, endpoint=True)
+
+        months = order_ts.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+        years = months // 12 + 1970
+        year_values, year_index = np.unique(years, return_inverse=True)
+        growth = np.array([get_yearly_growth(year) for year in year_values.tolist()])[year_index]
+        keep = rng.random(len(order_ts)) <= growth * monthly_multiplier[months % 12] / 3.0
+
+        customer_col = customer_col[keep]
+        order_ts = order_ts[keep]
+        order_total = len(order_ts)
+        if not order_total:
             continue
-        
-        order_status = random.choice(order_statuses)
-        payment_method = random.choice(payment_methods)
-        shipping_cost = round(random.choice([0, 0, 0, 15.99, 24.99, 34.99]), 2)
-        
-        product_count = random.choices([1, 2, 3, 4, 5], weights=[40, 30, 15, 10, 5])[0]
-        selected_products = random.sample(products_list, min(product_count, len(products_list)))
-        
-        total_amount = shipping_cost
-        
-        for product_id, product_price in selected_products:
-            quantity = random.choices([1, 2, 3, 4], weights=[70, 20, 7, 3])[0]
-            unit_price = product_price
-            discount_rate = random.choices([0, 5, 10, 15, 20, 25], weights=[60, 15, 10, 8, 5, 2])[0]
-            
-            line_total = quantity * unit_price * (1 - discount_rate / 100)
-            total_amount += line_total
-            
-            order_items_list.append((order_id_counter, product_id, quantity, unit_price, discount_rate))
-        
-        total_amount = round(total_amount, 2)
-        
-        campaign_id, campaign_discount = get_applicable_campaign(order_date, total_amount)
-        if campaign_id:
-            total_amount = round(total_amount * (1 - campaign_discount / 100), 2)
-        
-        if order_status == 'teslim_edildi':
-            customer_spending[customer_id] += total_amount
-        
-        orders.append((order_id_counter, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id))
-        order_id_counter += 1
-
-cursor.executemany('''
-    INSERT INTO orders (order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id)
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-''', orders)
-
-cursor.executemany('''
-    INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_rate)
-    VALUES (?, ?, ?, ?, ?)
-''', order_items_list)
-
-print(f"[+] {len(orders)} orders and {len(order_items_list)} order items inserted!")
+
+        status_col = statuses[rng.integers(0, len(statuses), size=order_total)]
+        method_col = methods[rng.integers(0, len(methods), size=order_total)]
+        shipping_col = np.round(choose(rng, (shipping_costs, [1] * len(shipping_costs)), order_total), 2)
+
+        product_counts = np.minimum(choose(rng, product_count_distribution, order_total), len(products_list))
+        picks = sample_without_replacement(rng, len(products_list), max_products, order_total)
+        item_mask = np.arange(max_products) < product_counts[:, None]
+        quantities = choose(rng, quantity_distribution, picks.shape)
+        discounts = choose(rng, discount_distribution, picks.shape)
+        unit_prices = product_prices[picks]
+
+        # Slot by slot so the running sum adds line totals in the same order as the Python engine
+        line_totals = quantities * unit_prices * (1 - discounts / 100)
+        total_col = shipping_col.astype(np.float64)
+        for slot in range(max_products):
+            total_col = total_col + np.where(item_mask[:, slot], line_totals[:, slot], 0.0)
+        total_col = np.round(total_col, 2)
+
+        # First matching campaign wins, the same rule as get_applicable_campaign
+        campaign_col, discount_col = campaign_index.lookup_many(order_ts // 86400, total_col)
+        has_campaign = campaign_col != 0
+        total_col[has_campaign] = np.round(total_col[has_campaign] * (1 - discount_col[has_campaign] / 100), 2)
+
+        order_ids = np.arange(order_id_counter, order_id_counter + order_total)
+        order_id_counter += order_total
+        order_dates = [date.replace('T', ' ') for date in np.datetime_as_string(order_ts.astype('datetime64[s]'))]
+
+        order_rows = list(zip(
+            order_ids.tolist(), customer_col.tolist(), order_dates, status_col.tolist(), total_col.tolist(),
+            method_col.tolist(), shipping_col.tolist(), [c or None for c in campaign_col.tolist()],
+        ))
+        item_rows = list(zip(
+            np.broadcast_to(order_ids[:, None], picks.shape)[item_mask].tolist(),
+            product_ids[picks][item_mask].tolist(),
+            quantities[item_mask].tolist(),
+            unit_prices[item_mask].tolist(),
+            discounts[item_mask].tolist(),
+        ))
+        yield order_rows, item_rows
+
+def insert_orders(conn, batch_size, engine='python', seed=SEED):
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT product_id, price FROM products')
+    products_list = cursor.fetchall()
+
+    cursor.execute('SELECT campaign_id, start_date, end_date, discount_rate, min_basket_amount FROM campaigns ORDER BY campaign_id')
+    campaign_index = CampaignIndex(cursor.fetchall())
+
+    # Stream customers straight from the table instead of loading them all
+    customers_cursor = conn.execute('SELECT customer_id, registration_date FROM customers ORDER BY customer_id')
+
+    if engine == 'numpy':
+        batches = generate_order_batches_numpy(customers_cursor, products_list, campaign_index, batch_size, seed)
+    else:
+        batches = batch_orders(generate_orders(customers_cursor, products_list, campaign_index), batch_size)
+
+    order_total = 0
+    item_total = 0
+    for order_batch, item_batch in batches:
+        cursor.executemany('''
+            INSERT INTO orders (order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', order_batch)
+        cursor.executemany('''
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_rate)
+            VALUES (?, ?, ?, ?, ?)
+        ''', item_batch)
+        order_total += len(order_batch)
+        item_total += len(item_batch)
+    return order_total, item_total
 
 # ============================================
 # CUSTOMER SEGMENTATION
 # ============================================
 
-print("\n[*] Calculating customer segmentation...")
+# Share of customers (ranked by delivered spending) in each segment, the rest are bronze
+segment_limits = [('platinum', 0.10), ('gold', 0.30), ('silver', 0.65)]
 
-spending_sorted = sorted(customer_spending.items(), key=lambda x: x[1], reverse=True)
+def create_segmentation_tables(cursor):
+    # Running delivered spend per customer and the last order folded into it
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_spending (
+        customer_id INTEGER PRIMARY KEY,
+        spending REAL NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_customer_spending_rank ON customer_spending(spending DESC, customer_id)')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS segmentation_state (
+        state_id INTEGER PRIMARY KEY CHECK (state_id = 1),
+        last_order_id INTEGER NOT NULL,
+        customer_count INTEGER NOT NULL
+    )
+    ''')
 
-total_customers = len(spending_sorted)
-platinum_limit = int(total_customers * 0.10)
-gold_limit = int(total_customers * 0.30)
-silver_limit = int(total_customers * 0.65)
+def segment_customers(conn, incremental=False):
+    # Set-based: spending is kept in customer_spending, ranked with a window function and written
+    # back in one UPDATE that only touches customers whose segment actually changes.
+    # Incremental mode assumes orders are append-only; edits to existing orders need a full run.
+    cursor = conn.cursor()
+    create_segmentation_tables(cursor)
 
-for idx, (customer_id, spending) in enumerate(spending_sorted):
-    if idx < platinum_limit:
-        segment = 'platinum'
-    elif idx < gold_limit:
-        segment = 'gold'
-    elif idx < silver_limit:
-        segment = 'silver'
-    else:
-        segment = 'bronze'
-    
-    cursor.execute('UPDATE customers SET customer_segment = ? WHERE customer_id = ?', (segment, customer_id))
+    total_customers = cursor.execute('SELECT COUNT(*) FROM customers').fetchone()[0]
+    max_order_id = cursor.execute('SELECT COALESCE(MAX(order_id), 0) FROM orders').fetchone()[0]
+    state = cursor.execute('SELECT last_order_id, customer_count FROM segmentation_state').fetchone() if incremental else None
 
-print("[+] Customer segmentation completed!")
+    if state == (max_order_id, total_customers):
+        return total_customers, 0
 
-cursor.execute('SELECT customer_segment, COUNT(*) FROM customers GROUP BY customer_segment')
-segment_stats = cursor.fetchall()
-print("\n[*] Segment Distribution:")
-for segment, count in segment_stats:
-    print(f"   {segment}: {count} customers ({count/customer_count*100:.1f}%)")
+    if state is None:
+        cursor.execute('DELETE FROM customer_spending')
+        last_order_id = 0
+    else:
+        last_order_id = state[0]
+
+    # New customers start with zero spending, customer ids only grow
+    cursor.execute('''
+        INSERT INTO customer_spending (customer_id)
+        SELECT customer_id FROM customers
+        WHERE customer_id > (SELECT COALESCE(MAX(customer_id), 0) FROM customer_spending)
+    ''')
+    cursor.execute('''
+        INSERT INTO customer_spending (customer_id, spending)
+        SELECT customer_id, SUM(total_amount)
+        FROM orders
+        WHERE order_id > ? AND order_status = 'teslim_edildi'
+        GROUP BY customer_id
+        ON CONFLICT(customer_id) DO UPDATE SET spending = spending + excluded.spending
+    ''', (last_order_id,))
+
+    # Ties keep customer_id order, like the original stable sort
+    limits = [int(total_customers * share) for _, share in segment_limits]
+    changes_before = conn.total_changes
+    segment_case = ' '.join(f"WHEN idx < {limit} THEN '{segment}'" for (segment, _), limit in zip(segment_limits, limits))
+    cursor.execute(f'''
+        UPDATE customers SET customer_segment = segments.segment
+        FROM (
+            SELECT customer_id, CASE {segment_case} ELSE 'bronze' END AS segment
+            FROM (
+                SELECT customer_id, ROW_NUMBER() OVER (ORDER BY spending DESC, customer_id) - 1 AS idx
+                FROM customer_spending
+            )
+        ) AS segments
+        WHERE customers.customer_id = segments.customer_id
+          AND customers.customer_segment IS NOT segments.segment
+    ''')
+    # rowcount stays 0 when customers is a compact view, the rows are written by its INSTEAD OF trigger
+    changed = conn.total_changes - changes_before
+
+    cursor.execute('INSERT OR REPLACE INTO segmentation_state (state_id, last_order_id, customer_count) VALUES (1, ?, ?)',
+                   (max_order_id, total_customers))
+    return total_customers, changed
 
 # ============================================
 # REVIEWS
 # ============================================
 
-print("\n[*] Inserting reviews...")
-
 review_templates = {
     5: [
         'Mükemmel bir ürün! Kesinlikle tavsiye ederim. Kalitesi çok yüksek ve beklentilerimin çok üstünde çıktı.',
@@ -505,89 +824,684 @@ review_templates = {
     ]
 }
 
-reviews = []
-review_count = 3000
-
-cursor.execute('''
-    SELECT DISTINCT oi.product_id, o.customer_id, o.order_date
-    FROM order_items oi
-    JOIN orders o ON oi.order_id = o.order_id
-    WHERE o.order_status = 'teslim_edildi'
-''')
-reviewable_items = cursor.fetchall()
-
-cursor.execute('SELECT product_id FROM products')
-all_product_ids = [row[0] for row in cursor.fetchall()]
+def pick_product_quality(cursor):
+    # Bad and average products are global, so every shard rates the same products the same way
+    cursor.execute('SELECT product_id FROM products')
+    all_product_ids = [row[0] for row in cursor.fetchall()]
 
-bad_products = set(random.sample(all_product_ids, int(len(all_product_ids) * 0.10)))
-average_products = set(random.sample([p for p in all_product_ids if p not in bad_products], 
-                                     int(len(all_product_ids) * 0.20)))
+    bad_products = set(random.sample(all_product_ids, int(len(all_product_ids) * 0.10)))
+    average_products = set(random.sample([p for p in all_product_ids if p not in bad_products],
+                                         int(len(all_product_ids) * 0.20)))
+    return bad_products, average_products
 
-for _ in range(min(review_count, len(reviewable_items))):
-    product_id, customer_id, order_date_str = random.choice(reviewable_items)
-    
+def build_review(product_id, customer_id, order_date, end_date, bad_products, average_products):
     if product_id in bad_products:
         rating = random.choices([1, 2, 3], weights=[50, 40, 10])[0]
     elif product_id in average_products:
         rating = random.choices([2, 3, 4], weights=[10, 50, 40])[0]
     else:
         rating = random.choices([3, 4, 5], weights=[10, 35, 55])[0]
-    
+
     if random.random() > 0.15:
         review_text = random.choice(review_templates[rating])
     else:
         review_text = None
-    
-    order_date = datetime.strptime(order_date_str, '%Y-%m-%d %H:%M:%S')
-    review_date = fake.date_time_between(
-        start_date=order_date,
-        end_date=datetime(2025, 10, 29)
-    )
-    
-    reviews.append((product_id, customer_id, rating, review_text, review_date))
 
-cursor.executemany('''
-    INSERT INTO reviews (product_id, customer_id, rating, review_text, review_date)
-    VALUES (?, ?, ?, ?, ?)
-''', reviews)
+    review_date = random_datetime_between(order_date, end_date)
+
+    return (product_id, customer_id, rating, review_text, review_date)
+
+def generate_reviews(conn, review_count, bad_products, average_products):
+    cursor = conn.cursor()
+
+    # Reviewable items are kept in a temp table and picked by rowid, so they are never all in memory
+    cursor.execute('DROP TABLE IF EXISTS temp.reviewable_items')
+    cursor.execute('''
+        CREATE TEMP TABLE reviewable_items AS
+        SELECT DISTINCT oi.product_id, o.customer_id, o.order_date
+        FROM order_items oi
+        JOIN orders o ON oi.order_id = o.order_id
+        WHERE o.order_status = 'teslim_edildi'
+    ''')
+    reviewable_count = cursor.execute('SELECT COUNT(*) FROM temp.reviewable_items').fetchone()[0]
 
-print(f"[+] {len(reviews)} reviews inserted!")
+    for _ in range(min(review_count, reviewable_count)):
+        cursor.execute('SELECT product_id, customer_id, order_date FROM temp.reviewable_items WHERE rowid = ?',
+                       (random.randrange(reviewable_count) + 1,))
+        product_id, customer_id, order_date_str = cursor.fetchone()
 
-cursor.execute('SELECT rating, COUNT(*) FROM reviews GROUP BY rating ORDER BY rating DESC')
-print("\n[*] Rating Distribution:")
-for rating, count in cursor.fetchall():
-    print(f"   {rating} stars: {count} reviews ({count/len(reviews)*100:.1f}%)")
+        order_date = datetime.strptime(order_date_str, '%Y-%m-%d %H:%M:%S')
+        yield build_review(product_id, customer_id, order_date, order_end_date, bad_products, average_products)
 
 # ============================================
-# STATISTICS
+# SHARDED GENERATION
 # ============================================
 
-print("\n" + "="*50)
-print("[*] DATABASE STATISTICS")
-print("="*50)
+def split_evenly(total, parts):
+    return [total * (idx + 1) // parts - total * idx // parts for idx in range(parts)]
+
+def make_shards(args, shard_dir, customer_count, review_count, bad_products, average_products):
+    shard_count = min(args.workers, customer_count)
+    # Shard seeds are spawned from the global seed, so output only depends on (seed, workers)
+    shard_seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(args.seed).spawn(shard_count)]
+
+    shards = []
+    first_customer_number = 1
+    for idx, (shard_customers, shard_reviews) in enumerate(zip(split_evenly(customer_count, shard_count),
+                                                                split_evenly(review_count, shard_count))):
+        shards.append({
+            'path': os.path.join(shard_dir, f'shard_{idx}.db'),
+            'source_db': args.db,
+            'seed': shard_seeds[idx],
+            'pool_seed': args.seed,
+            'first_customer_number': first_customer_number,
+            'customer_count': shard_customers,
+            'review_count': shard_reviews,
+            'engine': args.engine,
+            'batch_size': args.batch_size,
+            'bad_products': bad_products,
+            'average_products': average_products,
+            'bulk_load': args.bulk_load,
+        })
+        first_customer_number += shard_customers
+    return shards
+
+def generate_shard(shard):
+    # Runs in a worker process: customers, orders, order items and reviews for one customer range,
+    # written to a private database with local ids starting at 1
+    random.seed(shard['seed'])
+    faker_pool = load_faker_pool(shard['pool_seed'])
+
+    conn = sqlite3.connect(shard['path'])
+    if shard['bulk_load']:
+        apply_bulk_load_pragmas(conn)
+    cursor = conn.cursor()
+    create_tables(cursor, defer_unique=shard['bulk_load'])
+
+    cursor.execute('ATTACH DATABASE ? AS source', (shard['source_db'],))
+    cursor.execute('INSERT INTO products SELECT * FROM source.products')
+    cursor.execute('INSERT INTO campaigns SELECT * FROM source.campaigns')
+    conn.commit()
+    cursor.execute('DETACH DATABASE source')
+
+    insert_rows(cursor, '''
+        INSERT INTO customers (first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', generate_customers(shard['customer_count'], faker_pool, shard['first_customer_number']), shard['batch_size'])
+
+    insert_orders(conn, shard['batch_size'], shard['engine'], shard['seed'])
+
+    insert_rows(cursor, '''
+        INSERT INTO reviews (product_id, customer_id, rating, review_text, review_date)
+        VALUES (?, ?, ?, ?, ?)
+    ''', generate_reviews(conn, shard['review_count'], shard['bad_products'], shard['average_products']), shard['batch_size'])
+
+    conn.commit()
+    conn.close()
+    return shard['path']
+
+def merge_shard(conn, shard_path, customer_offset, order_offset):
+    cursor = conn.cursor()
+    cursor.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+
+    cursor.execute('''
+        INSERT INTO customers (customer_id, first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment)
+        SELECT customer_id + ?, first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment
+        FROM shard.customers ORDER BY customer_id
+    ''', (customer_offset,))
+    cursor.execute('''
+        INSERT INTO orders (order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id)
+        SELECT order_id + ?, customer_id + ?, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id
+        FROM shard.orders ORDER BY order_id
+    ''', (order_offset, customer_offset))
+    cursor.execute('''
+        INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_rate)
+        SELECT order_id + ?, product_id, quantity, unit_price, discount_rate
+        FROM shard.order_items ORDER BY item_id
+    ''', (order_offset,))
+    cursor.execute('''
+        INSERT INTO reviews (product_id, customer_id, rating, review_text, review_date)
+        SELECT product_id, customer_id + ?, rating, review_text, review_date
+        FROM shard.reviews ORDER BY review_id
+    ''', (customer_offset,))
+
+    shard_customers = cursor.execute('SELECT COUNT(*) FROM shard.customers').fetchone()[0]
+    shard_orders = cursor.execute('SELECT COALESCE(MAX(order_id), 0) FROM shard.orders').fetchone()[0]
+
+    conn.commit()
+    cursor.execute('DETACH DATABASE shard')
+    return shard_customers, shard_orders
+
+def generate_sharded(conn, args, customer_count, review_count, bad_products, average_products):
+    conn.commit()
+    shard_dir = tempfile.mkdtemp(prefix='ecommerce_shards_', dir=os.path.dirname(os.path.abspath(args.db)))
+    try:
+        shards = make_shards(args, shard_dir, customer_count, review_count, bad_products, average_products)
+        # Forked workers would inherit --trace-memory tracing, which only the parent reports
+        with ProcessPoolExecutor(max_workers=len(shards), initializer=stop_memory_tracing) as executor:
+            shard_paths = list(executor.map(generate_shard, shards))
+
+        # Shards are merged in order, so ids are offset by everything merged before them
+        customer_offset = 0
+        order_offset = 0
+        for shard_path in shard_paths:
+            shard_customers, shard_orders = merge_shard(conn, shard_path, customer_offset, order_offset)
+            customer_offset += shard_customers
+            order_offset += shard_orders
+        return len(shards)
+    finally:
+        for name in os.listdir(shard_dir):
+            os.remove(os.path.join(shard_dir, name))
+        os.rmdir(shard_dir)
 
-tables = ['customers', 'categories', 'products', 'orders', 'order_items', 'reviews', 'campaigns']
+# ============================================
+# APPEND
+# ============================================
+
+# Yearly campaigns continued by --append: (name, discount_rate, (month, day) start, (month, day) end, min_basket_amount).
+# An end before the start runs into the next year; moving holidays like Ramazan are left out.
+recurring_campaigns = [
+    ('Yılbaşı Kampanyası', 20, (12, 20), (1, 5), 500),
+    ('Sevgililer Günü', 15, (2, 10), (2, 14), 200),
+    ('23 Nisan Özel', 10, (4, 20), (4, 24), 100),
+    ('Yaz İndirimi', 30, (6, 15), (8, 31), 400),
+    ('Eylül Kampanyası', 20, (9, 1), (9, 30), 400),
+    ('Kasım Fırsatları', 30, (11, 1), (11, 30), 500),
+    ('Black Friday', 40, (11, 24), (11, 27), 600),
+]
 
-for table in tables:
-    cursor.execute(f'SELECT COUNT(*) FROM {table}')
-    count = cursor.fetchone()[0]
-    print(f"   {table.upper()}: {count:,} records")
+def create_generation_tables(cursor):
+    # What --append needs to continue the model: where the history ends, the daily registration
+    # rate, the share of delivered items that get a review and the product quality groups
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS generation_state (
+        state_id INTEGER PRIMARY KEY CHECK (state_id = 1),
+        history_end DATETIME NOT NULL,
+        daily_customers REAL NOT NULL,
+        review_rate REAL NOT NULL
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS product_quality (
+        product_id INTEGER PRIMARY KEY,
+        quality TEXT NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''')
+
+def save_product_quality(cursor, bad_products, average_products):
+    create_generation_tables(cursor)
+    cursor.execute('DELETE FROM product_quality')
+    cursor.executemany('INSERT INTO product_quality (product_id, quality) VALUES (?, ?)',
+                       [(product_id, 'bad') for product_id in sorted(bad_products)] +
+                       [(product_id, 'average') for product_id in sorted(average_products)])
+
+def save_generation_state(cursor, history_end, daily_customers, review_rate):
+    create_generation_tables(cursor)
+    cursor.execute('INSERT OR REPLACE INTO generation_state (state_id, history_end, daily_customers, review_rate) VALUES (1, ?, ?, ?)',
+                   (history_end, daily_customers, review_rate))
+
+def delivered_review_rate(cursor):
+    cursor.execute('''
+        SELECT (SELECT COUNT(*) FROM reviews),
+               (SELECT COUNT(*) FROM order_items oi JOIN orders o ON oi.order_id = o.order_id
+                WHERE o.order_status = 'teslim_edildi')
+    ''')
+    review_total, delivered_items = cursor.fetchone()
+    return min(1.0, review_total / delivered_items) if delivered_items else 0.0
+
+def load_generation_state(cursor):
+    # Returns (history_end, daily_customers, review_rate, bad_products, average_products)
+    create_generation_tables(cursor)
+    state = cursor.execute('SELECT history_end, daily_customers, review_rate FROM generation_state').fetchone()
+
+    if state is None:
+        # Databases generated before --append existed: the base model stands in for the missing state
+        # and the quality groups are recovered from the ratings the products already received
+        customer_total = cursor.execute('SELECT COUNT(*) FROM customers').fetchone()[0]
+        state = (order_end_date, customer_total / (registration_end_date - registration_start_date).days,
+                 delivered_review_rate(cursor))
+        save_generation_state(cursor, *state)
+        cursor.execute('''
+            INSERT OR REPLACE INTO product_quality (product_id, quality)
+            SELECT product_id, CASE WHEN AVG(rating) < 2.5 THEN 'bad' ELSE 'average' END
+            FROM reviews GROUP BY product_id HAVING AVG(rating) < 3.9
+        ''')
+    else:
+        state = (datetime.fromisoformat(state[0]), state[1], state[2])
+
+    cursor.execute('SELECT product_id, quality FROM product_quality')
+    quality_rows = cursor.fetchall()
+    bad_products = {product_id for product_id, quality in quality_rows if quality == 'bad'}
+    average_products = {product_id for product_id, quality in quality_rows if quality == 'average'}
+    return state + (bad_products, average_products)
+
+def daily_order_rate():
+    # Candidate orders per customer and day at the end of the base history: each customer spreads
+    # order_count_distribution evenly from registration to order_end_date, averaged over the
+    # registration window (the mean of 1/span for a uniform span is log(longest/shortest)/(longest-shortest))
+    values, weights = order_count_distribution
+    mean_orders = sum(value * weight for value, weight in zip(values, weights)) / sum(weights)
+    shortest = (order_end_date.date() - registration_end_date).days
+    longest = (order_end_date.date() - registration_start_date).days
+    return mean_orders * math.log(longest / shortest) / (longest - shortest)
+
+def random_count(expected):
+    # Rounds up or down at random, so fractional daily rates still add up over many days
+    count = int(expected)
+    return count + (random.random() < expected - count)
+
+def generate_recurring_campaigns(start_day, end_day):
+    campaigns = []
+    for year in range(start_day.year, end_day.year + 1):
+        for name, discount_rate, start, end, min_basket in recurring_campaigns:
+            start_date = date(year, *start)
+            end_date = date(year + (end < start), *end)
+            if start_day <= start_date < end_day:
+                campaigns.append((f'{name} {year}', discount_rate, start_date, end_date, min_basket))
+    # Campaign ids follow the calendar like the base table, earlier ids win overlaps
+    return sorted(campaigns, key=lambda campaign: campaign[2])
+
+def write_append_batch(cursor, counts, customer_rows, order_rows, item_rows, review_rows, partitioned=False):
+    cursor.executemany('''
+        INSERT INTO customers (first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', customer_rows)
+    order_years = {order[0]: order[2].year for order in order_rows}
+    tables = [
+        ('orders', None, 'order_id, customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id',
+         order_rows, [order[2].year for order in order_rows]),
+        ('order_items', 'item_id', 'order_id, product_id, quantity, unit_price, discount_rate',
+         item_rows, [order_years[item[0]] for item in item_rows]),
+        ('reviews', 'review_id', 'product_id, customer_id, rating, review_text, review_date',
+         review_rows, [review[4].year for review in review_rows]),
+    ]
+    for table, key, columns, rows, years in tables:
+        if not partitioned:
+            cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' for _ in columns.split(', '))})", rows)
+            continue
+        # The TEMP views over the year files cannot be written, rows go straight to their year.
+        # Every file has its own AUTOINCREMENT counter, so item and review ids are handed out here.
+        if key:
+            next_id = cursor.execute(f'SELECT COALESCE(MAX({key}), 0) + 1 FROM {table}').fetchone()[0]
+            rows = [(next_id + offset,) + row for offset, row in enumerate(rows)]
+            columns = f'{key}, {columns}'
+        placeholders = ', '.join('?' for _ in columns.split(', '))
+        for year, year_rows in rows_by_year(rows, years).items():
+            cursor.executemany(f'INSERT INTO {partition_schema(year)}.{table} ({columns}) VALUES ({placeholders})', year_rows)
+    for name, rows in (('customers', customer_rows), ('orders', order_rows),
+                       ('order_items', item_rows), ('reviews', review_rows)):
+        counts[name] += len(rows)
+
+def append_history(conn, until, seed, batch_size):
+    # Extends the history day by day from the stored end to `until`. Work is proportional to the
+    # appended days: customers are picked by id and nothing scans the existing orders.
+    cursor = conn.cursor()
+    partitioned = is_partitioned(cursor)
+    history_end, daily_customers, review_rate, bad_products, average_products = load_generation_state(cursor)
+    new_end = datetime.combine(until, datetime.min.time())
+    if new_end <= history_end:
+        raise ValueError(f'--until must be after the current history end {history_end:%Y-%m-%d}')
+
+    # Same database, seed and range always append the same rows
+    random.seed(f'{seed}:{history_end:%Y-%m-%d}:{until}')
+    start_day = history_end.date()
+    counts = {'campaigns': 0, 'customers': 0, 'orders': 0, 'order_items': 0, 'reviews': 0}
+
+    new_campaigns = generate_recurring_campaigns(start_day, until)
+    cursor.executemany('''
+        INSERT INTO campaigns (campaign_name, discount_rate, start_date, end_date, min_basket_amount)
+        VALUES (?, ?, ?, ?, ?)
+    ''', new_campaigns)
+    counts['campaigns'] = len(new_campaigns)
+
+    cursor.execute('SELECT product_id, price FROM products')
+    products_list = cursor.fetchall()
+    cursor.execute('''
+        SELECT campaign_id, start_date, end_date, discount_rate, min_basket_amount FROM campaigns
+        WHERE end_date >= ? AND start_date < ? ORDER BY campaign_id
+    ''', (start_day, until))
+    campaign_index = CampaignIndex(cursor.fetchall())
+
+    # Customer ids are dense (AUTOINCREMENT, never deleted), so the highest id is also the count
+    customer_total = cursor.execute('SELECT COALESCE(MAX(customer_id), 0) FROM customers').fetchone()[0]
+    order_id_counter = cursor.execute('SELECT COALESCE(MAX(order_id), 0) FROM orders').fetchone()[0] + 1
+    faker_pool = load_faker_pool(seed)
+    order_rate = daily_order_rate()
+
+    customer_rows, order_rows, item_rows, review_rows = [], [], [], []
+    for offset in range((until - start_day).days):
+        day = start_day + timedelta(days=offset)
+        day_start = datetime.combine(day, datetime.min.time())
+        acceptance = get_yearly_growth(day.year) * get_monthly_multiplier(day.month) / 3.0
+
+        # Orders come from customers registered before the day, accepted like in generate_orders
+        for _ in range(random_count(customer_total * order_rate)):
+            customer_id = random.randint(1, customer_total)
+            order_date = random_datetime_between(day_start, day_start + timedelta(seconds=86399))
+            if random.random() > acceptance:
+                continue
+
+            order, order_items = build_order(order_id_counter, customer_id, order_date, products_list, campaign_index)
+            order_id_counter += 1
+            order_rows.append(order)
+            item_rows.extend(order_items)
+
+            if order[3] == 'teslim_edildi':
+                for _, product_id, _, _, _ in order_items:
+                    if random.random() < review_rate:
+                        review_rows.append(build_review(product_id, customer_id, order_date, new_end,
+                                                        bad_products, average_products))
+
+        new_customers = random_count(daily_customers)
+        customer_rows.extend(generate_customers(new_customers, faker_pool, customer_total + 1, day, day))
+        customer_total += new_customers
+
+        if len(item_rows) >= batch_size:
+            write_append_batch(cursor, counts, customer_rows, order_rows, item_rows, review_rows, partitioned)
+            customer_rows, order_rows, item_rows, review_rows = [], [], [], []
+
+    write_append_batch(cursor, counts, customer_rows, order_rows, item_rows, review_rows, partitioned)
+    save_generation_state(cursor, new_end, daily_customers, review_rate)
+    return history_end, counts
 
-cursor.execute('SELECT SUM(total_amount) FROM orders WHERE order_status = "teslim_edildi"')
-total_sales = cursor.fetchone()[0]
-print(f"\n[*] Total Sales (Delivered): {total_sales:,.2f} TL")
+# ============================================
+# STATISTICS
+# ============================================
 
-cursor.execute('SELECT MIN(order_date), MAX(order_date) FROM orders')
-min_date, max_date = cursor.fetchone()
-print(f"[*] Date Range: {min_date[:10]} - {max_date[:10]}")
+def print_statistics(cursor):
+    print("\n" + "="*50)
+    print("[*] DATABASE STATISTICS")
+    print("="*50)
 
-cursor.execute('SELECT COUNT(*) FROM orders WHERE campaign_id IS NOT NULL')
-campaign_orders = cursor.fetchone()[0]
-print(f"[*] Orders with Campaign: {campaign_orders:,} ({campaign_orders/len(orders)*100:.1f}%)")
+    tables = ['customers', 'categories', 'products', 'orders', 'order_items', 'reviews', 'campaigns']
 
-print("\n" + "="*50)
+    for table in tables:
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        count = cursor.fetchone()[0]
+        print(f"   {table.upper()}: {count:,} records")
 
-conn.commit()
-conn.close()
+    cursor.execute('SELECT COALESCE(SUM(total_amount), 0) FROM orders WHERE order_status = "teslim_edildi"')
+    total_sales = cursor.fetchone()[0]
+    print(f"\n[*] Total Sales (Delivered): {total_sales:,.2f} TL")
 
-print("\n[+] Database successfully created: data/ecommerce.db")
+    # Very small --scale values can leave the history without any order
+    cursor.execute('SELECT COUNT(*), COUNT(campaign_id), MIN(order_date), MAX(order_date) FROM orders')
+    order_count, campaign_orders, min_date, max_date = cursor.fetchone()
+    if order_count:
+        print(f"[*] Date Range: {min_date[:10]} - {max_date[:10]}")
+        print(f"[*] Orders with Campaign: {campaign_orders:,} ({campaign_orders/order_count*100:.1f}%)")
+    else:
+        print("[*] No orders generated")
+
+    print("\n" + "="*50)
+
+def export_columnar_files(db_path, metrics):
+    print("\n[*] Exporting column files...")
+    started = metrics.start()
+    manifest = export_columnar(db_path)
+    row_total = sum(table['rows'] for table in manifest['tables'].values())
+    metrics.add('columnar', row_total, started)
+    print(f"[+] {row_total:,} rows exported to {default_directory(db_path)} in {metrics.phases[-1]['seconds']:.2f}s!")
+
+def finish_metrics(args, metrics):
+    metrics.print_report()
+    if args.metrics:
+        run = {name: value.isoformat() if isinstance(value, date) else value for name, value in vars(args).items()}
+        # Only a sharded generation runs worker processes, --append ignores --workers
+        metrics.write_json(args.metrics, run, worker_processes=args.workers > 1 and not args.append)
+        print(f"[+] Phase metrics written to {args.metrics}")
+    if metrics.profile:
+        print(f"[+] Order loop profile written to {metrics.profile['stats_file']}")
+
+def main():
+    args = parse_args()
+    metrics = PhaseMetrics(args.trace_memory, args.profile_orders)
+
+    random.seed(args.seed)
+
+    customer_count = max(1, int(BASE_CUSTOMER_COUNT * args.scale))
+    review_count = int(BASE_REVIEW_COUNT * args.scale)
+
+    if args.resegment:
+        conn = connect_partitioned(args.db, writable=True)
+        print(f"[*] Re-segmenting customers in {args.db}...")
+        total_customers, changed = segment_customers(conn, incremental=True)
+        conn.commit()
+        conn.close()
+        print(f"[+] {changed} of {total_customers} customers changed segment!")
+        return
+
+    if args.append:
+        conn = connect_partitioned(args.db, writable=True)
+        partitioned = is_partitioned(conn.cursor())
+        print(f"[*] Appending history to {args.db} until {args.until}...")
+        started = metrics.start()
+        try:
+            if partitioned:
+                # Reviews can be dated up to --until itself, so its year needs a file too
+                for year in add_partitions(conn, args.db, args.until.year):
+                    print(f"[+] Partition {year} created")
+            history_end, counts = append_history(conn, args.until, args.seed, args.batch_size)
+        except ValueError as error:
+            conn.close()
+            print(f"[!] {error}")
+            sys.exit(1)
+        metrics.add('append', sum(counts.values()), started)
+        print(f"[+] {history_end:%Y-%m-%d} - {args.until}: " + ', '.join(f"{count} {name}" for name, count in counts.items()) + " added!")
+
+        print("\n[*] Updating customer segmentation...")
+        started = metrics.start()
+        total_customers, changed = segment_customers(conn, incremental=True)
+        metrics.add('segmentation', changed, started)
+        print(f"[+] {changed} of {total_customers} customers changed segment!")
+
+        print("\n[*] Updating RFM scores...")
+        started = metrics.start()
+        scored_customers, folded_orders = update_rfm(conn)
+        metrics.add('customer_rfm', folded_orders, started)
+        print(f"[+] {folded_orders} orders folded in, {scored_customers} customers scored!")
+
+        # Triggers cannot sit on the TEMP views over the year files, so a partitioned sales_rollup is rebuilt
+        if partitioned:
+            print("\n[*] Rebuilding sales rollups...")
+            started = metrics.start()
+            count = refresh_rollups(conn.cursor())
+            metrics.add('sales_rollup', count, started)
+            print(f"[+] {count} rollup rows rebuilt!")
+
+        # reviews_fts follows reviews through its triggers, only the term counts need a pass
+        if has_text_index(conn.cursor()):
+            print("\n[*] Updating review term counts...")
+            started = metrics.start()
+            count = update_review_terms(conn.cursor())
+            metrics.add('review_terms', count, started)
+            print(f"[+] {count} new reviews counted!")
+
+        if has_co_purchase(conn.cursor()):
+            print("\n[*] Updating co-purchase matrix...")
+            started = metrics.start()
+            pairs, folded_orders = update_co_purchase(conn)
+            metrics.add('product_pairs', folded_orders, started)
+            print(f"[+] {folded_orders} orders folded in, {pairs} product pairs!")
+
+        print_statistics(conn.cursor())
+        conn.commit()
+        conn.close()
+        if args.columnar:
+            export_columnar_files(args.db, metrics)
+        finish_metrics(args, metrics)
+        return
+
+    # Sharded runs promise the same file for the same --seed and --workers, which a reused file breaks:
+    # its freelist and page order depend on whatever it held before
+    if args.bulk_load or args.workers > 1:
+        remove_database(args.db)
+    conn = sqlite3.connect(args.db)
+    if args.bulk_load:
+        apply_bulk_load_pragmas(conn)
+    cursor = conn.cursor()
+
+    print(f"[*] Creating e-commerce database (scale {args.scale:g})...")
+
+    print("\n[*] Creating tables...")
+    create_tables(cursor, defer_unique=args.bulk_load, date_keys=args.date_keys)
+    print("[+] Tables created successfully!")
+
+    print("\n[*] Inserting categories...")
+    started = metrics.start()
+    count = insert_categories(cursor)
+    metrics.add('categories', count, started)
+    print(f"[+] {count} categories inserted!")
+
+    print("\n[*] Building category closure table...")
+    started = metrics.start()
+    count = build_category_tree(conn)
+    metrics.add('category_closure', count, started)
+    print(f"[+] {count} ancestor/descendant pairs, root category keys set!")
+
+    print("\n[*] Inserting campaigns...")
+    started = metrics.start()
+    count = insert_campaigns(cursor)
+    metrics.add('campaigns', count, started)
+    print(f"[+] {count} campaigns inserted!")
+
+    print("\n[*] Inserting products...")
+    started = metrics.start()
+    count = insert_rows(cursor, '''
+        INSERT INTO products (product_name, category_id, brand, price, stock_quantity, created_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', generate_products(), args.batch_size)
+    metrics.add('products', count, started)
+    print(f"[+] {count} products inserted!")
+
+    # Built (and cached under data/cache) before any worker starts, so workers only read it
+    faker_pool = load_faker_pool(args.seed)
+
+    if args.workers > 1:
+        print(f"\n[*] Generating customers, orders and reviews with {args.workers} workers...")
+        bad_products, average_products = pick_product_quality(cursor)
+        save_product_quality(cursor, bad_products, average_products)
+        started = metrics.start()
+        shard_count = generate_sharded(conn, args, customer_count, review_count, bad_products, average_products)
+        cursor.execute('SELECT (SELECT COUNT(*) FROM customers), (SELECT COUNT(*) FROM orders), (SELECT COUNT(*) FROM order_items), (SELECT COUNT(*) FROM reviews)')
+        count, order_count, item_count, review_total = cursor.fetchone()
+        # Shards produce every table at once, so they share the same wall time
+        metrics.add('customers', count, started)
+        for name, rows in (('orders', order_count), ('order_items', item_count), ('reviews', review_total)):
+            metrics.add_shared(name, rows)
+        print(f"[+] {shard_count} shards merged: {count} customers, {order_count} orders and {item_count} order items inserted!")
+    else:
+        print("\n[*] Inserting customers...")
+        started = metrics.start()
+        count = insert_rows(cursor, '''
+            INSERT INTO customers (first_name, last_name, email, phone, birth_date, gender, registration_date, city, customer_segment)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', generate_customers(customer_count, faker_pool), args.batch_size)
+        metrics.add('customers', count, started)
+        print(f"[+] {count} customers inserted!")
+
+        print("\n[*] Creating orders...")
+        started = metrics.start()
+        order_count, item_count = metrics.run_profiled('orders', insert_orders, conn, args.batch_size, args.engine, args.seed)
+        # Orders and their items are written in the same batches, so they share the same wall time
+        metrics.add('orders', order_count, started)
+        metrics.add_shared('order_items', item_count)
+        print(f"[+] {order_count} orders and {item_count} order items inserted!")
+
+        print("\n[*] Inserting reviews...")
+        started = metrics.start()
+        bad_products, average_products = pick_product_quality(cursor)
+        save_product_quality(cursor, bad_products, average_products)
+        count = insert_rows(cursor, '''
+            INSERT INTO reviews (product_id, customer_id, rating, review_text, review_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', generate_reviews(conn, review_count, bad_products, average_products), args.batch_size)
+        metrics.add('reviews', count, started)
+        print(f"[+] {count} reviews inserted!")
+
+    # Lets a later --append continue this history
+    save_generation_state(cursor, order_end_date, customer_count / (registration_end_date - registration_start_date).days,
+                          delivered_review_rate(cursor))
+
+    print("\n[*] Calculating customer segmentation...")
+    started = metrics.start()
+    total_customers, _ = segment_customers(conn)
+    metrics.add('segmentation', total_customers, started)
+    print("[+] Customer segmentation completed!")
+
+    if args.fts:
+        print("\n[*] Building review full-text index...")
+        started = metrics.start()
+        count = build_text_index(conn)
+        metrics.add('review_terms', count, started)
+        print(f"[+] reviews_fts and {count} term counts built!")
+
+    if args.co_purchase:
+        print("\n[*] Building co-purchase matrix...")
+        started = metrics.start()
+        count = build_co_purchase(conn)
+        metrics.add('product_pairs', count, started)
+        print(f"[+] {count} product pairs counted!")
+
+    print("\n[*] Calculating RFM scores...")
+    started = metrics.start()
+    count, _ = update_rfm(conn, incremental=False)
+    metrics.add('customer_rfm', count, started)
+    print(f"[+] {count} customers scored!")
+
+    print("\n[*] Building sales rollups...")
+    started = metrics.start()
+    count = build_rollups(conn)
+    metrics.add('sales_rollup', count, started)
+    print(f"[+] {count} rollup rows built, triggers keep them current!")
+
+    cursor.execute('SELECT customer_segment, COUNT(*) FROM customers GROUP BY customer_segment')
+    segment_stats = cursor.fetchall()
+    print("\n[*] Segment Distribution:")
+    for segment, count in segment_stats:
+        print(f"   {segment}: {count} customers ({count/total_customers*100:.1f}%)")
+
+    review_total = cursor.execute('SELECT COUNT(*) FROM reviews').fetchone()[0]
+    if review_total:
+        cursor.execute('SELECT rating, COUNT(*) FROM reviews GROUP BY rating ORDER BY rating DESC')
+        print("\n[*] Rating Distribution:")
+        for rating, rating_count in cursor.fetchall():
+            print(f"   {rating} stars: {rating_count} reviews ({rating_count/review_total*100:.1f}%)")
+
+    print_statistics(cursor)
+
+    conn.commit()
+    if args.compact:
+        print("\n[*] Converting to the compact schema...")
+        started = metrics.start()
+        # Bulk-load runs VACUUM in finish_bulk_load anyway
+        count = compact_database(conn, vacuum=not args.bulk_load)
+        metrics.add('compact', None, started)
+        print(f"[+] {count} lookup values, customers and orders are now views over customers_data/orders_data!")
+    if args.partition_by_year:
+        print("\n[*] Splitting orders, order items and reviews into year files...")
+        started = metrics.start()
+        years, moved = partition_database(conn, args.db, vacuum=not args.bulk_load)
+        metrics.add('partitions', moved, started)
+        print(f"[+] {moved:,} rows moved to {years} year files in {partition_directory(args.db)}!")
+    if args.bulk_load:
+        print("\n[*] Building indexes, ANALYZE and VACUUM...")
+        finish_bulk_load(conn, metrics, args.indexes)
+    elif args.indexes:
+        print("\n[*] Building secondary indexes and planner statistics...")
+        started = metrics.start()
+        count = create_secondary_indexes(cursor)
+        cursor.execute('ANALYZE')
+        conn.commit()
+        metrics.add('indexes', count, started)
+        print(f"[+] {count} indexes created and sqlite_stat1 populated!")
+    conn.close()
+    if args.columnar:
+        export_columnar_files(args.db, metrics)
+
+    finish_metrics(args, metrics)
+    print(f"\n[+] Database successfully created: {args.db}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+from compact_schema import storage_definition
+
+# Opt-in secondary indexes for the joins, filters and aggregates used in the notebooks.
+# Trailing columns make the common aggregate shapes covering, so they never touch the table rows.
+SECONDARY_INDEXES = [
+    # customers LEFT JOIN orders per customer: COUNT, MAX(order_date), SUM(CASE status ... total_amount)
+    ('idx_orders_customer', 'orders(customer_id, order_date, order_status, total_amount)'),
+    # Date ranges and monthly trends
+    ('idx_orders_date', 'orders(order_date, order_status, total_amount)'),
+    # Integer date keys (date_keys.py, opt-in): GROUP BY order_month/order_year as an index scan, order_day ranges
+    ('idx_orders_month', 'orders(order_month, order_status, total_amount, customer_id)'),
+    ('idx_orders_day', 'orders(order_day, order_status, total_amount)'),
+    ('idx_reviews_month', 'reviews(review_month, rating)'),
+    ('idx_customers_registration_month', 'customers(registration_month)'),
+    # GROUP BY order_status / WHERE order_status = 'teslim_edildi'
+    ('idx_orders_status', 'orders(order_status, total_amount)'),
+    # GROUP BY payment_method with success/cancel ratios
+    ('idx_orders_payment', 'orders(payment_method, order_status, total_amount)'),
+    # campaigns LEFT JOIN orders
+    ('idx_orders_campaign', 'orders(campaign_id, order_status, total_amount)'),
+    # orders JOIN order_items
+    ('idx_order_items_order', 'order_items(order_id)'),
+    # products JOIN order_items revenue: SUM(quantity * unit_price * (1 - discount_rate/100))
+    ('idx_order_items_product', 'order_items(product_id, order_id, quantity, unit_price, discount_rate)'),
+    # products JOIN reviews with AVG(rating)
+    ('idx_reviews_product', 'reviews(product_id, rating)'),
+    ('idx_reviews_customer', 'reviews(customer_id)'),
+    # categories JOIN products
+    ('idx_products_category', 'products(category_id)'),
+    # GROUP BY city / segment reports
+    ('idx_customers_city', 'customers(city, customer_segment)'),
+    ('idx_customers_segment', 'customers(customer_segment)'),
+    ('idx_customers_name', 'customers(first_name, last_name)'),
+    # LIKE is case-insensitive, so prefix searches need a NOCASE index
+    ('idx_customers_first_name_nocase', 'customers(first_name COLLATE NOCASE)'),
+    # Oldest/newest members
+    ('idx_customers_registration', 'customers(registration_date)'),
+]
+
+def has_index_columns(cursor, definition):
+    # False for the date key indexes of a database without the opt-in date keys
+    table, columns = definition.split('(', 1)
+    existing = {row[1] for row in cursor.execute(f'PRAGMA main.table_xinfo({table})')}
+    return all(column.split()[0] in existing for column in columns.rstrip(')').split(','))
+
+def create_secondary_indexes(cursor):
+    # In a compact database the same indexes go on the code columns of customers_data/orders_data.
+    # A partitioned main file has no orders, order_items or reviews; every year file has their indexes.
+    tables = {row[0] for row in cursor.execute("SELECT name FROM main.sqlite_master WHERE type IN ('table', 'view')")}
+    created = 0
+    for index_name, definition in SECONDARY_INDEXES:
+        if definition.split('(', 1)[0] not in tables or not has_index_columns(cursor, definition):
+            continue
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {storage_definition(cursor, definition)}')
+        created += 1
+    return created
+
+def drop_secondary_indexes(cursor):
+    for index_name, _ in SECONDARY_INDEXES:
+        cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
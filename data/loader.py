@@ -0,0 +1,113 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Chunked, dtype-compact replacement for pd.read_sql_query in the notebooks. Rows are fetched
+# chunksize at a time and every chunk is compacted before the next one is read, so the object
+# columns of a full read_sql_query result never exist at once.
+DEFAULT_CHUNKSIZE = 50000
+
+# Low-cardinality text columns of the schema, loaded as categoricals
+CATEGORY_COLUMNS = {
+    'first_name', 'last_name', 'city', 'order_status', 'payment_method', 'gender', 'customer_segment',
+    'brand', 'category_name', 'campaign_name', 'review_text',
+}
+
+# Date and datetime columns of the schema, parsed while loading
+DATE_COLUMNS = {'order_date', 'birth_date', 'registration_date', 'created_date', 'start_date', 'end_date', 'review_date'}
+
+# Aggregations that can be computed per chunk and combined afterwards
+CHUNK_AGGREGATIONS = {'sum', 'count', 'min', 'max', 'mean'}
+
+def compact_frame(frame, integer_columns=()):
+    for name in frame.columns:
+        column = frame[name]
+        if name in DATE_COLUMNS:
+            frame[name] = pd.to_datetime(column, format='ISO8601')
+        elif name in CATEGORY_COLUMNS:
+            frame[name] = column.astype('category')
+        elif pd.api.types.is_integer_dtype(column):
+            frame[name] = pd.to_numeric(column, downcast='integer')
+        elif name in integer_columns:
+            # INTEGER columns with NULLs (campaign_id) arrive as float64, keep them as nullable integers
+            frame[name] = pd.to_numeric(column.astype('Int64'), downcast='integer')
+    return frame
+
+def concat_chunks(chunks):
+    frame = pd.concat(chunks, ignore_index=True)
+    for name in frame.columns:
+        # Chunks see different category sets, pd.concat would fall back to object for those columns
+        if isinstance(chunks[0][name].dtype, pd.CategoricalDtype):
+            frame[name] = union_categoricals([chunk[name] for chunk in chunks])
+        elif pd.api.types.is_integer_dtype(frame[name]):
+            # The widest chunk decides the concatenated dtype, narrow it again for the whole column
+            frame[name] = pd.to_numeric(frame[name], downcast='integer')
+    return frame
+
+def iter_query(conn, sql, params=(), chunksize=DEFAULT_CHUNKSIZE, integer_columns=()):
+    cursor = conn.execute(sql, params)
+    columns = [description[0] for description in cursor.description]
+    while True:
+        rows = cursor.fetchmany(chunksize)
+        if not rows:
+            return
+        yield compact_frame(pd.DataFrame.from_records(rows, columns=columns), integer_columns)
+
+def read_query(conn, sql, params=(), chunksize=DEFAULT_CHUNKSIZE, integer_columns=()):
+    chunks = list(iter_query(conn, sql, params, chunksize, integer_columns))
+    if not chunks:
+        cursor = conn.execute(sql, params)
+        return pd.DataFrame(columns=[description[0] for description in cursor.description])
+    return concat_chunks(chunks)
+
+def table_integer_columns(conn, table):
+    return {name for _, name, declared_type, _, _, _ in conn.execute(f'PRAGMA table_info({table})')
+            if 'INT' in declared_type.upper()}
+
+def iter_table(conn, table, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    selected = ', '.join(columns) if columns else '*'
+    return iter_query(conn, f'SELECT {selected} FROM {table}', chunksize=chunksize,
+                      integer_columns=table_integer_columns(conn, table))
+
+def read_table(conn, table, columns=None, chunksize=DEFAULT_CHUNKSIZE):
+    selected = ', '.join(columns) if columns else '*'
+    return read_query(conn, f'SELECT {selected} FROM {table}', chunksize=chunksize,
+                      integer_columns=table_integer_columns(conn, table))
+
+def aggregate_chunks(chunks, by, aggregations):
+    # groupby(by).agg(aggregations) over a chunk iterator without keeping the chunks: every chunk is
+    # reduced to sum/count/min/max partials, which are combined once at the end (mean = sum / count).
+    # aggregations maps column -> function name or list of names, like DataFrame.agg.
+    aggregations = {column: [functions] if isinstance(functions, str) else list(functions)
+                    for column, functions in aggregations.items()}
+    unsupported = {function for functions in aggregations.values() for function in functions} - CHUNK_AGGREGATIONS
+    if unsupported:
+        raise ValueError(f"Aggregations {sorted(unsupported)} cannot be combined across chunks")
+
+    partial_specs = {}
+    for column, functions in aggregations.items():
+        partials = set(functions)
+        if 'mean' in partials:
+            partials = (partials - {'mean'}) | {'sum', 'count'}
+        partial_specs[column] = sorted(partials)
+
+    partials = [chunk.groupby(by, observed=True).agg(partial_specs) for chunk in chunks]
+    if not partials:
+        return pd.DataFrame()
+    combined = pd.concat(partials)
+    combine_functions = {(column, partial): 'sum' if partial in ('sum', 'count') else partial
+                         for column, column_partials in partial_specs.items() for partial in column_partials}
+    combined = combined.groupby(level=list(range(combined.index.nlevels)), observed=True).agg(combine_functions)
+
+    result = pd.DataFrame(index=combined.index)
+    for column, functions in aggregations.items():
+        for function in functions:
+            if function == 'mean':
+                result[(column, function)] = combined[(column, 'sum')] / combined[(column, 'count')]
+            else:
+                result[(column, function)] = combined[(column, function)]
+    result.columns = pd.MultiIndex.from_tuples(result.columns)
+    result.index.names = combined.index.names
+    return result
+
+def aggregate_query(conn, sql, by, aggregations, params=(), chunksize=DEFAULT_CHUNKSIZE):
+    return aggregate_chunks(iter_query(conn, sql, params, chunksize), by, aggregations)
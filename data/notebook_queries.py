@@ -0,0 +1,39 @@
+import json
+import os
+import re
+
+# The notebooks are the reference workload; their SQL is read straight from the .ipynb files
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTEBOOKS = ['01_temel_sql.ipynb', '02_temel_python.ipynb']
+
+# pd.read_sql_query("...", conn) calls with a plain (non f-string) literal
+READ_SQL_PATTERN = re.compile(r'read_sql_query\(\s*("""|\'\'\'|"|\')(.*?)\1', re.S)
+
+def extract_queries(notebook_path):
+    with open(notebook_path, encoding='utf-8') as f:
+        notebook = json.load(f)
+
+    name = os.path.splitext(os.path.basename(notebook_path))[0]
+    queries = []
+    for cell_idx, cell in enumerate(notebook['cells']):
+        if cell['cell_type'] != 'code':
+            continue
+        source = ''.join(cell['source']).strip()
+
+        if source.startswith('%%sql'):
+            sql = source.split('\n', 1)[1] if '\n' in source else ''
+            queries.append((f'{name}:cell{cell_idx}', sql.strip()))
+            continue
+
+        for query_idx, match in enumerate(READ_SQL_PATTERN.finditer(source)):
+            query_name = f'{name}:cell{cell_idx}' if query_idx == 0 else f'{name}:cell{cell_idx}.{query_idx}'
+            queries.append((query_name, match.group(2).strip()))
+
+    # Catalog lookups are not part of the workload
+    return [(query_name, sql) for query_name, sql in queries if sql and 'sqlite_master' not in sql]
+
+def load_notebook_queries(notebooks=None):
+    queries = []
+    for notebook in notebooks or NOTEBOOKS:
+        queries.extend(extract_queries(os.path.join(REPO_DIR, notebook)))
+    return queries
@@ -0,0 +1,314 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from urllib.request import pathname2url
+
+from compact_schema import is_compact
+from date_keys import year_expression
+from indexes import SECONDARY_INDEXES, has_index_columns
+from rollups import create_rollup_triggers
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Year-partitioned layout: orders, order_items and reviews of every calendar year live in a file of
+# their own under {db name}_partitions/, the main file keeps customers, products, campaigns and the
+# derived tables. Order items go with the year of their order, reviews with their review_date.
+# Years before the one the history ends in are closed: nothing writes them again, so they are
+# attached read-only with immutable=1 and can be copied, cached or backed up once.
+# connect_partitioned() attaches the files and puts TEMP views named like the original tables over
+# them (a view stored in the main file cannot refer to attached databases). Date filters are pushed
+# into every branch of the UNION ALL, where the per-year indexes turn the other years into one seek.
+PARTITIONED_TABLES = ['orders', 'order_items', 'reviews']
+PARTITION_FILE = re.compile(r'^\d{4}\.db$')
+
+def partition_directory(db_path):
+    return f'{os.path.splitext(os.path.abspath(db_path))[0]}_partitions'
+
+def partition_schema(year):
+    return f'p{year}'
+
+def database_uri(path, writable=False, immutable=False):
+    uri = f'file:{pathname2url(os.path.abspath(path))}'
+    if not writable:
+        uri += '?mode=ro' + ('&immutable=1' if immutable else '')
+    return uri
+
+def is_partitioned(cursor):
+    return cursor.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE type = 'table' AND name = 'partitions'").fetchone()[0] > 0
+
+def partition_years(cursor):
+    return [row[0] for row in cursor.execute('SELECT year FROM main.partitions ORDER BY year')]
+
+def open_year(cursor):
+    # The year the history ends in still gets orders from --append, every earlier year is closed
+    has_state = cursor.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE name = 'generation_state'").fetchone()[0]
+    state = cursor.execute('SELECT history_end FROM main.generation_state').fetchone() if has_state else None
+    if state is not None:
+        return int(state[0][:4])
+    return cursor.execute('SELECT MAX(year) FROM main.partitions').fetchone()[0]
+
+def in_schema(sql, schema):
+    # 'CREATE TABLE orders (...' -> 'CREATE TABLE p2024.orders (...', same for CREATE INDEX
+    return re.sub(r'^CREATE (TABLE|INDEX) ', rf'CREATE \1 {schema}.', sql.strip(), count=1)
+
+def stored_columns(cursor, table):
+    # hidden = 0: the generated date keys are computed in every partition, never copied
+    return [row[1] for row in cursor.execute(f'PRAGMA main.table_xinfo({table})') if row[6] == 0]
+
+def partition_indexes(cursor):
+    # Every year gets the orders/order_items/reviews indexes, it is written once and only read later
+    return [(index_name, definition) for index_name, definition in SECONDARY_INDEXES
+            if definition.split('(', 1)[0] in PARTITIONED_TABLES and has_index_columns(cursor, definition)]
+
+# ============================================
+# VIEWS
+# ============================================
+
+def create_union_views(cursor, years):
+    # Same columns and order as the original tables, generated date keys included
+    for table in PARTITIONED_TABLES:
+        cursor.execute(f'DROP VIEW IF EXISTS temp.{table}')
+        branches = ' UNION ALL '.join(f'SELECT * FROM {partition_schema(year)}.{table}' for year in years)
+        cursor.execute(f'CREATE TEMP VIEW {table} AS {branches}')
+
+def attach_partitions(conn, db_path, writable=False, immutable=False, years=None):
+    cursor = conn.cursor()
+    directory = os.path.dirname(os.path.abspath(db_path))
+    rows = cursor.execute('SELECT year, file_name FROM main.partitions ORDER BY year').fetchall()
+    if years is not None:
+        rows = [(year, file_name) for year, file_name in rows if year in years]
+    limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(rows) > limit:
+        raise sqlite3.OperationalError(f'{len(rows)} partitions but SQLite attaches at most {limit} databases')
+
+    current_year = open_year(cursor)
+    for year, file_name in rows:
+        closed = year < current_year
+        uri = database_uri(os.path.join(directory, file_name), writable and not closed, immutable or closed)
+        cursor.execute(f'ATTACH DATABASE ? AS {partition_schema(year)}', (uri,))
+    if rows:
+        create_union_views(cursor, [year for year, _ in rows])
+
+def connect_partitioned(db_path, writable=False, immutable=False, years=None, check_same_thread=True):
+    # A plain connection for unpartitioned files, so callers do not have to know the layout.
+    # Read-only unless writable; writable connections still get the closed years read-only.
+    # years limits the views to those partitions: joins and scans that cannot use a date index
+    # read every attached year, so a notebook looking at 2025 is faster with years=[2025].
+    conn = sqlite3.connect(database_uri(db_path, writable, immutable), uri=True, check_same_thread=check_same_thread)
+    if is_partitioned(conn.cursor()):
+        if writable and years is not None:
+            conn.close()
+            raise ValueError('writable connections need every partition, --append reads ids across all years')
+        attach_partitions(conn, db_path, writable, immutable, years)
+    return conn
+
+def rows_by_year(rows, years):
+    # {year: rows} in the original order, years[i] is the partition of rows[i]
+    grouped = {}
+    for year, row in zip(years, rows):
+        grouped.setdefault(year, []).append(row)
+    return grouped
+
+# ============================================
+# SPLIT
+# ============================================
+
+def create_partition_catalog(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS partitions (
+        year INTEGER PRIMARY KEY,
+        file_name TEXT NOT NULL
+    )
+    ''')
+
+def remove_partition_files(directory):
+    # Only the year files this module writes, anything else in the directory is left alone
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if PARTITION_FILE.match(name.split('-')[0]):
+            os.remove(os.path.join(directory, name))
+
+def write_partition(cursor, year, path, table_sql):
+    cursor.execute('ATTACH DATABASE ? AS part', (path,))
+    for table in PARTITIONED_TABLES:
+        cursor.execute(in_schema(table_sql[table], 'part'))
+
+    columns = {table: ', '.join(stored_columns(cursor, table)) for table in PARTITIONED_TABLES}
+    cursor.execute(f"INSERT INTO part.orders ({columns['orders']}) SELECT {columns['orders']} FROM main.orders WHERE {year_expression('order_date')} = ? ORDER BY order_id", (year,))
+    cursor.execute(f'''
+        INSERT INTO part.order_items ({columns['order_items']}) SELECT {columns['order_items']} FROM main.order_items
+        WHERE order_id IN (SELECT order_id FROM part.orders) ORDER BY item_id
+    ''')
+    cursor.execute(f"INSERT INTO part.reviews ({columns['reviews']}) SELECT {columns['reviews']} FROM main.reviews WHERE {year_expression('review_date')} = ? ORDER BY review_id", (year,))
+    rows = sum(cursor.execute(f'SELECT COUNT(*) FROM part.{table}').fetchone()[0] for table in PARTITIONED_TABLES)
+
+    # Indexes after the load, then planner statistics for the finished year
+    for index_name, definition in partition_indexes(cursor):
+        cursor.execute(f'CREATE INDEX part.{index_name} ON {definition}')
+    cursor.execute('ANALYZE part')
+    cursor.connection.commit()
+    cursor.execute('DETACH DATABASE part')
+    return rows
+
+def partition_database(conn, db_path, vacuum=True):
+    # Moves orders, order_items and reviews of a generated database into one file per year,
+    # returns (years, rows moved). ATTACH cannot run inside a transaction, so commit first.
+    cursor = conn.cursor()
+    if is_compact(cursor):
+        raise ValueError('compact databases cannot be partitioned, their orders view reads orders_data')
+    if cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'reviews_fts'").fetchone()[0]:
+        raise ValueError('reviews_fts indexes the reviews table of the main file and cannot follow it into partitions')
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')
+
+    directory = partition_directory(db_path)
+    remove_partition_files(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    table_sql = {table: cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+                 for table in PARTITIONED_TABLES}
+    years = [row[0] for row in cursor.execute(f'''
+        SELECT {year_expression('order_date')} FROM orders UNION SELECT {year_expression('review_date')} FROM reviews ORDER BY 1
+    ''')]
+    moved = 0
+    for year in years:
+        moved += write_partition(cursor, year, os.path.join(directory, f'{year}.db'), table_sql)
+
+    # The rollup triggers on orders go with the table, --append refreshes sales_rollup instead
+    for table in reversed(PARTITIONED_TABLES):
+        cursor.execute(f'DROP TABLE {table}')
+    cursor.execute('DROP TABLE IF EXISTS partitions')
+    create_partition_catalog(cursor)
+    relative_directory = os.path.basename(directory)
+    cursor.executemany('INSERT INTO partitions (year, file_name) VALUES (?, ?)',
+                       [(year, f'{relative_directory}/{year}.db') for year in years])
+    conn.commit()
+    if vacuum:
+        conn.execute('VACUUM')
+    return len(years), moved
+
+def add_partitions(conn, db_path, last_year):
+    # New years for --append, created with the schema of the latest partition and attached to conn.
+    # Returns the years created; the TEMP views are rebuilt to include them.
+    cursor = conn.cursor()
+    years = partition_years(cursor)
+    new_years = list(range(years[-1] + 1, last_year + 1))
+    if not new_years:
+        return []
+    conn.commit()
+
+    template = partition_schema(years[-1])
+    schema_sql = [row[0] for row in cursor.execute(f'''
+        SELECT sql FROM {template}.sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY type = 'index', rowid
+    ''')]
+    directory = partition_directory(db_path)
+    relative_directory = os.path.basename(directory)
+    for year in new_years:
+        path = os.path.join(directory, f'{year}.db')
+        if os.path.exists(path):
+            os.remove(path)
+        cursor.execute(f'ATTACH DATABASE ? AS {partition_schema(year)}', (database_uri(path, writable=True),))
+        for sql in schema_sql:
+            cursor.execute(in_schema(sql, partition_schema(year)))
+        cursor.execute('INSERT INTO main.partitions (year, file_name) VALUES (?, ?)', (year, f'{relative_directory}/{year}.db'))
+    conn.commit()
+    create_union_views(cursor, years + new_years)
+    return new_years
+
+# ============================================
+# MERGE
+# ============================================
+
+def merge_partitions(conn, db_path):
+    # The reverse of partition_database for a copy of the main file (conn) whose year files are still
+    # next to db_path: orders, order_items and reviews are loaded back into tables of the copy, with the
+    # indexes of the year files and the rollup triggers partition_database dropped. The year files are
+    # only read. Returns the rows loaded; afterwards plain sqlite3 connections and writers work on it.
+    cursor = conn.cursor()
+    conn.commit()
+    attach_partitions(conn, db_path)
+    years = partition_years(cursor)
+    template = partition_schema(years[-1])
+    schema_sql = cursor.execute(f'''
+        SELECT type, sql FROM {template}.sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+        ORDER BY type = 'index', rowid
+    ''').fetchall()
+
+    for object_type, sql in schema_sql:
+        if object_type == 'table':
+            cursor.execute(in_schema(sql, 'main'))
+    loaded = 0
+    for table in PARTITIONED_TABLES:
+        columns = ', '.join(stored_columns(cursor, table))
+        loaded += cursor.execute(f'INSERT INTO main.{table} ({columns}) SELECT {columns} FROM temp.{table}').rowcount
+    for object_type, sql in schema_sql:
+        if object_type == 'index':
+            cursor.execute(in_schema(sql, 'main'))
+    # The TEMP views would shadow the new tables for the triggers
+    for table in PARTITIONED_TABLES:
+        cursor.execute(f'DROP VIEW temp.{table}')
+    if cursor.execute("SELECT COUNT(*) FROM main.sqlite_master WHERE name = 'sales_rollup'").fetchone()[0]:
+        create_rollup_triggers(cursor)
+    cursor.execute('DROP TABLE main.partitions')
+    conn.commit()
+
+    for year in years:
+        cursor.execute(f'DETACH DATABASE {partition_schema(year)}')
+    return loaded
+
+def merge_copy(db_path, target):
+    # Single-file copy for sqlite3.connect, %sql sqlite:/// and other tools that cannot attach the years
+    source_conn = sqlite3.connect(database_uri(db_path), uri=True)
+    if not is_partitioned(source_conn.cursor()):
+        source_conn.close()
+        print("[!] Database is not partitioned, it can be opened directly")
+        sys.exit(1)
+    if os.path.exists(target):
+        os.remove(target)
+    print(f"[*] Merging the year files of {db_path} into {target}...")
+    started = time.perf_counter()
+    conn = sqlite3.connect(target)
+    source_conn.backup(conn)
+    source_conn.close()
+    rows = merge_partitions(conn, db_path)
+    conn.close()
+    print(f"[+] {rows:,} rows merged in {time.perf_counter() - started:.2f}s!")
+
+def main():
+    parser = argparse.ArgumentParser(description='Split orders, order_items and reviews of a database into one file per year, or merge them back into a copy.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--merge-to', help='write an unpartitioned copy of a partitioned database to this path instead')
+    args = parser.parse_args()
+
+    if args.merge_to:
+        merge_copy(args.db, args.merge_to)
+        return
+
+    conn = sqlite3.connect(args.db)
+    if is_partitioned(conn.cursor()):
+        conn.close()
+        print("[!] Database is already partitioned")
+        return
+    print(f"[*] Partitioning {args.db} by year...")
+    started = time.perf_counter()
+    try:
+        years, moved = partition_database(conn, args.db)
+    except ValueError as error:
+        conn.close()
+        print(f"[!] {error}")
+        sys.exit(1)
+    conn.close()
+    print(f"[+] {moved:,} rows moved to {years} year files in {partition_directory(args.db)} "
+          f"in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
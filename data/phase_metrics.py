@@ -0,0 +1,158 @@
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, RSS is then reported as null
+    resource = None
+
+TOP_ALLOCATIONS = 10
+TOP_FUNCTIONS = 25
+
+def peak_rss_kb(children=False):
+    # High-water mark of the process (or of its finished worker processes) so far
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+def current_rss_kb():
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def top_allocations(before):
+    # Source lines whose allocations grew the most during the phase and were still alive at its end
+    # (this module's own snapshots and the import machinery left out)
+    ignored = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__),
+               tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'))
+    after = tracemalloc.take_snapshot().filter_traces(ignored)
+    stats = [stat for stat in after.compare_to(before.filter_traces(ignored), 'lineno') if stat.size_diff >= 1024]
+    return [{'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+             'size_kb': stat.size_diff // 1024, 'count': stat.count_diff}
+            for stat in sorted(stats, key=lambda stat: stat.size_diff, reverse=True)[:TOP_ALLOCATIONS]]
+
+def stop_memory_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def rows_per_second(rows, seconds):
+    return None if rows is None else round(rows / max(seconds, 1e-9))
+
+class PhaseMetrics:
+    # Wall time, rows/s and memory of every generation phase. start() marks the beginning of a phase
+    # and add() closes it. RSS comes from the OS: rss_growth_kb is how much the resident set grew (or
+    # shrank) during the phase, process_peak_rss_kb the high-water mark of the whole process so far,
+    # which later, smaller phases repeat. With trace_memory, tracemalloc adds the Python heap peak
+    # inside the phase and its allocation hot spots (slow, so opt-in).
+
+    def __init__(self, trace_memory=False, profile_path=None):
+        self.phases = []
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self.profile = None
+        self.created = time.perf_counter()
+        if trace_memory:
+            tracemalloc.start()
+
+    def start(self):
+        snapshot = None
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            snapshot = tracemalloc.take_snapshot()
+        return time.perf_counter(), snapshot, current_rss_kb()
+
+    def add(self, name, rows, started):
+        started_at, snapshot, rss_before = started
+        seconds = time.perf_counter() - started_at
+        rss_after = current_rss_kb()
+        phase = {
+            'name': name,
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_second': rows_per_second(rows, seconds),
+            'rss_kb': rss_after,
+            'rss_growth_kb': None if rss_after is None or rss_before is None else rss_after - rss_before,
+            'process_peak_rss_kb': peak_rss_kb(),
+        }
+        if snapshot is not None:
+            phase['python_peak_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+            phase['top_allocations'] = top_allocations(snapshot)
+        self.phases.append(phase)
+
+    def add_shared(self, name, rows):
+        # Tables written by the same phase (orders and order_items, sharded workers) share its time and memory
+        previous = self.phases[-1]
+        phase = dict(previous, name=name, rows=rows, rows_per_second=rows_per_second(rows, previous['seconds']),
+                     shared_with=previous.get('shared_with', previous['name']))
+        self.phases.append(phase)
+
+    def run_profiled(self, name, function, *args):
+        # Profiler hook: runs function under cProfile when a profile path was given, the .pstats
+        # file can be opened with snakeviz or pstats
+        if not self.profile_path:
+            return function(*args)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return function(*args)
+        finally:
+            profiler.disable()
+            profiler.dump_stats(self.profile_path)
+            self.profile = {'phase': name, 'stats_file': os.path.abspath(self.profile_path),
+                            'top_functions': top_functions(profiler)}
+
+    def print_report(self):
+        print("\n[*] Phase Report:")
+        for phase in self.phases:
+            memory = ''
+            if phase['rss_growth_kb'] is not None:
+                memory += f", RSS {phase['rss_growth_kb'] / 1024:+,.0f} MB"
+            if phase['process_peak_rss_kb']:
+                memory += f", process peak so far {phase['process_peak_rss_kb'] / 1024:,.0f} MB"
+            if phase['rows'] is None:
+                print(f"   {phase['name']}: {phase['seconds']:.2f}s{memory}")
+            else:
+                print(f"   {phase['name']}: {phase['rows']:,} rows in {phase['seconds']:.2f}s "
+                      f"({phase['rows_per_second']:,} rows/s{memory})")
+
+    def write_json(self, path, run, worker_processes=False):
+        # RUSAGE_CHILDREN counts every child process, so it is read before platform.platform(), which can
+        # start one, and left out when no worker processes ran
+        worker_peak = peak_rss_kb(children=True) if worker_processes else None
+        report = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'run': run,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'total_seconds': round(time.perf_counter() - self.created, 4),
+            'peak_rss_kb': peak_rss_kb(),
+            'worker_peak_rss_kb': worker_peak,
+            'trace_memory': self.trace_memory,
+            'phases': self.phases,
+            'profile': self.profile,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+def top_functions(profiler):
+    # Functions with the most own time, where the order loop actually spends it
+    stats = pstats.Stats(profiler).stats
+    ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS]
+    return [{'function': f'{os.path.basename(filename)}:{line}({function})', 'calls': calls,
+             'own_seconds': round(own_time, 4), 'cumulative_seconds': round(cumulative_time, 4)}
+            for (filename, line, function), (_, calls, own_time, cumulative_time, _) in ranked]
@@ -0,0 +1,216 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from notebook_queries import load_notebook_queries
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Shared read access for notebooks and reports: pooled read-only connections and an LRU cache of
+# query results. Entries are keyed by the file version, so regenerating the database invalidates them.
+DEFAULT_POOL_SIZE = 4
+DEFAULT_CACHE_ENTRIES = 128
+# Larger results are returned but not kept, a few full-table reads would otherwise fill the memory
+DEFAULT_MAX_CACHED_ROWS = 100000
+# Results that change without the file changing: date('now'), julianday('now', '-30 days'),
+# CURRENT_DATE/TIME/TIMESTAMP and random values are never cached
+VOLATILE_SQL = re.compile(r"'now'|\bcurrent_(date|time|timestamp)\b|\brandom(blob)?\s*\(", re.IGNORECASE)
+
+def file_version(db_path):
+    # The header's file change counter (offset 24) is bumped by every commit in rollback-journal mode.
+    # A --bulk-load rebuild is a new file (inode), and WAL commits only touch the -wal file.
+    versions = []
+    for path in (db_path, f'{db_path}-wal'):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            versions.append(None)
+            continue
+        versions.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+    with open(db_path, 'rb') as f:
+        f.seek(24)
+        versions.append(f.read(4))
+    return tuple(versions)
+
+class ConnectionPool:
+    # Read-only connections (URI mode=ro) reused across queries. immutable=1 also skips SQLite's
+    # locking and change detection, so it is only safe while nothing writes the file; the pool checks
+    # file_version on every checkout and reopens its connections when the file has changed.
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, immutable=False):
+        self.db_path = db_path
+        self.immutable = immutable
+        self.size = size
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.idle = []
+        self.version = None
+
+    def connect(self):
+        # A partitioned database comes with its year files attached; closed years are immutable anyway
+        return connect_partitioned(self.db_path, immutable=self.immutable, check_same_thread=False)
+
+    def refresh(self):
+        # Returns the current file version, dropping idle connections opened on an older one
+        version = file_version(self.db_path)
+        with self.lock:
+            if version != self.version:
+                for conn in self.idle:
+                    conn.close()
+                self.idle = []
+                self.version = version
+        return version
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            version = self.refresh()
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                conn = self.connect()
+            try:
+                yield conn
+            finally:
+                with self.lock:
+                    if version == self.version and len(self.idle) < self.size:
+                        self.idle.append(conn)
+                    else:
+                        conn.close()
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle = []
+
+class QueryCache:
+    # LRU of query results keyed by (kind, sql, params, file version). A new file version clears
+    # the older entries at the next lookup, so a regenerated database is never answered from cache.
+    # Queries matching VOLATILE_SQL always go to SQLite.
+
+    def __init__(self, db_path, max_entries=DEFAULT_CACHE_ENTRIES, max_rows=DEFAULT_MAX_CACHED_ROWS,
+                 pool_size=DEFAULT_POOL_SIZE, immutable=False):
+        self.pool = ConnectionPool(db_path, pool_size, immutable)
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def cached(self, kind, sql, params, run):
+        if VOLATILE_SQL.search(sql):
+            with self.lock:
+                self.bypassed += 1
+            with self.pool.connection() as conn:
+                return run(conn)[0]
+
+        version = self.pool.refresh()
+        if isinstance(params, dict):
+            params_key = tuple(sorted(params.items()))
+        else:
+            params_key = tuple(params)
+        key = (kind, sql, params_key, version)
+
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        with self.pool.connection() as conn:
+            result, row_count = run(conn)
+
+        if row_count <= self.max_rows:
+            with self.lock:
+                if key[3] == self.version:
+                    self.entries[key] = result
+                    self.entries.move_to_end(key)
+                    while len(self.entries) > self.max_entries:
+                        self.entries.popitem(last=False)
+        return result
+
+    def execute(self, sql, params=()):
+        # (column names, rows); the rows are tuples, so the cached list is copied, not the values
+        def run(conn):
+            cursor = conn.execute(sql, params)
+            rows = cursor.fetchall()
+            return ([description[0] for description in cursor.description or ()], rows), len(rows)
+        columns, rows = self.cached('rows', sql, params, run)
+        return columns, list(rows)
+
+    def fetchall(self, sql, params=()):
+        return self.execute(sql, params)[1]
+
+    def read_frame(self, sql, params=()):
+        # Compact DataFrame from loader.read_query; callers get a copy, so editing it leaves the cache intact
+        from loader import read_query
+
+        def run(conn):
+            frame = read_query(conn, sql, params)
+            return frame, len(frame)
+        return self.cached('frame', sql, params, run).copy()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'bypassed': self.bypassed}
+
+    def close(self):
+        self.clear()
+        self.pool.close()
+
+# One cache per database file for the whole process, so every notebook cell shares it
+shared_caches = {}
+
+def shared_cache(db_path='data/ecommerce.db', **options):
+    path = os.path.abspath(db_path)
+    if path not in shared_caches:
+        shared_caches[path] = QueryCache(path, **options)
+    return shared_caches[path]
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the notebook queries as repeated report refreshes through the query cache.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--refreshes', type=int, default=3, help='times the whole query set is run (default: 3)')
+    parser.add_argument('--immutable', action='store_true', help='open the pooled connections with immutable=1')
+    args = parser.parse_args()
+
+    cache = QueryCache(args.db, immutable=args.immutable)
+    queries = load_notebook_queries()
+    print(f"[*] Running {len(queries)} notebook queries {args.refreshes} times against {args.db}...")
+    for refresh in range(1, args.refreshes + 1):
+        started = time.perf_counter()
+        failed = 0
+        for _, sql in queries:
+            try:
+                cache.execute(sql)
+            except sqlite3.Error:
+                failed += 1
+        stats = cache.stats()
+        print(f"   refresh {refresh}: {(time.perf_counter() - started) * 1000:.1f} ms, "
+              f"{stats['hits']} hits / {stats['misses']} misses / {stats['bypassed']} uncached so far" + (f", {failed} failed" if failed else ''))
+    cache.close()
+    print("[+] Done!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+from partitions import is_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Full-text search over review_text and per-rating term counts for word clouds. The search index folds
+# diacritics (ç/ğ/ş/ö/ü and İ), so 'kotu' also finds 'kötü'; the dotless ı is a letter of its own and
+# stays distinct. The term counts are shown to people, so they keep the Turkish spelling: diacritics
+# stay and İ/I are lowercased to i/ı before unicode61, which would keep İ and turn I into i.
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+TERMS_TOKENIZER = 'unicode61 remove_diacritics 0'
+FTS_TRIGGERS = ['reviews_fts_insert', 'reviews_fts_delete', 'reviews_fts_update']
+
+def create_text_tables(cursor):
+    # External content table: the index refers to reviews rows instead of keeping a second copy of the text
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+            review_text, content='reviews', content_rowid='review_id', tokenize="{FTS_TOKENIZER}"
+        )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS review_terms (
+        rating INTEGER NOT NULL,
+        term TEXT NOT NULL,
+        occurrences INTEGER NOT NULL,
+        review_count INTEGER NOT NULL,
+        PRIMARY KEY (rating, term)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS review_terms_state (
+        state_id INTEGER PRIMARY KEY CHECK (state_id = 1),
+        last_review_id INTEGER NOT NULL
+    )
+    ''')
+
+def create_fts_triggers(cursor):
+    # The 'delete' command needs the old text, which is why the update trigger removes before it re-adds
+    for trigger_name in FTS_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+    cursor.execute('''
+        CREATE TRIGGER reviews_fts_insert AFTER INSERT ON reviews BEGIN
+            INSERT INTO reviews_fts (rowid, review_text) VALUES (NEW.review_id, NEW.review_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER reviews_fts_delete AFTER DELETE ON reviews BEGIN
+            INSERT INTO reviews_fts (reviews_fts, rowid, review_text) VALUES ('delete', OLD.review_id, OLD.review_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER reviews_fts_update AFTER UPDATE OF review_text ON reviews BEGIN
+            INSERT INTO reviews_fts (reviews_fts, rowid, review_text) VALUES ('delete', OLD.review_id, OLD.review_text);
+            INSERT INTO reviews_fts (rowid, review_text) VALUES (NEW.review_id, NEW.review_text);
+        END
+    ''')
+
+def update_review_terms(cursor, incremental=True):
+    # Counts terms of reviews added since the last run (reviews are assumed append-only, like orders
+    # in segment_customers). New texts are tokenized by a scratch FTS5 table, so the work is proportional
+    # to the new reviews and terms are the words reviews_fts indexes, with their diacritics.
+    state = cursor.execute('SELECT last_review_id FROM review_terms_state').fetchone() if incremental else None
+    if state is None:
+        cursor.execute('DELETE FROM review_terms')
+        last_review_id = 0
+    else:
+        last_review_id = state[0]
+    max_review_id = cursor.execute('SELECT COALESCE(MAX(review_id), 0) FROM reviews').fetchone()[0]
+
+    cursor.execute('DROP TABLE IF EXISTS temp.new_reviews_fts')
+    cursor.execute(f'CREATE VIRTUAL TABLE temp.new_reviews_fts USING fts5(review_text, tokenize="{TERMS_TOKENIZER}")')
+    cursor.execute('''
+        INSERT INTO temp.new_reviews_fts (rowid, review_text)
+        SELECT review_id, replace(replace(review_text, 'İ', 'i'), 'I', 'ı') FROM reviews
+        WHERE review_id > ? AND review_text IS NOT NULL
+    ''', (last_review_id,))
+    cursor.execute('CREATE VIRTUAL TABLE temp.new_reviews_vocab USING fts5vocab(temp, new_reviews_fts, instance)')
+    cursor.execute('''
+        INSERT INTO review_terms (rating, term, occurrences, review_count)
+        SELECT r.rating, vocab.term, COUNT(*), COUNT(DISTINCT vocab.doc)
+        FROM temp.new_reviews_vocab vocab
+        JOIN reviews r ON r.review_id = vocab.doc
+        GROUP BY r.rating, vocab.term
+        ON CONFLICT (rating, term) DO UPDATE SET
+            occurrences = occurrences + excluded.occurrences,
+            review_count = review_count + excluded.review_count
+    ''')
+    new_reviews = cursor.execute('SELECT COUNT(*) FROM temp.new_reviews_fts').fetchone()[0]
+    cursor.execute('DROP TABLE temp.new_reviews_vocab')
+    cursor.execute('DROP TABLE temp.new_reviews_fts')
+
+    cursor.execute('INSERT OR REPLACE INTO review_terms_state (state_id, last_review_id) VALUES (1, ?)', (max_review_id,))
+    return new_reviews
+
+def build_text_index(conn):
+    cursor = conn.cursor()
+    create_text_tables(cursor)
+    cursor.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('rebuild')")
+    create_fts_triggers(cursor)
+    update_review_terms(cursor, incremental=False)
+    conn.commit()
+    return cursor.execute('SELECT COUNT(*) FROM review_terms').fetchone()[0]
+
+def has_text_index(cursor):
+    return cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'review_terms'").fetchone()[0] > 0
+
+def search_reviews(conn, query, limit=10):
+    # FTS5 query syntax: words, "phrases", prefix* and AND/OR/NOT; best matches first
+    return conn.execute('''
+        SELECT r.review_id, r.product_id, r.rating, r.review_text
+        FROM reviews_fts
+        JOIN reviews r ON r.review_id = reviews_fts.rowid
+        WHERE reviews_fts MATCH ?
+        ORDER BY bm25(reviews_fts)
+        LIMIT ?
+    ''', (query, limit)).fetchall()
+
+def term_frequencies(conn, min_rating=1, max_rating=5):
+    # {term: occurrences} for a rating range, ready for WordCloud.generate_from_frequencies
+    return dict(conn.execute('''
+        SELECT term, SUM(occurrences) FROM review_terms
+        WHERE rating BETWEEN ? AND ?
+        GROUP BY term
+    ''', (min_rating, max_rating)).fetchall())
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the review full-text index.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--search', help='run an FTS5 query against reviews_fts instead of rebuilding the index')
+    parser.add_argument('--limit', type=int, default=10, help='rows shown by --search (default: 10)')
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    if is_partitioned(conn.cursor()):
+        # reviews_fts indexes the reviews table of the main file, see partition_database
+        conn.close()
+        print("[!] Partitioned databases have no full-text index, their reviews live in the year files")
+        sys.exit(1)
+    if args.search:
+        for review_id, product_id, rating, review_text in search_reviews(conn, args.search, args.limit):
+            print(f"   #{review_id} product {product_id}, {rating} stars: {review_text}")
+        conn.close()
+        return
+
+    print(f"[*] Building review full-text index in {args.db}...")
+    started = time.perf_counter()
+    count = build_text_index(conn)
+    conn.close()
+    print(f"[+] reviews_fts rebuilt and {count} term counts written in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from partitions import connect_partitioned
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# RFM as in 02_temel_python.ipynb: recency in days before the newest order, frequency = order count,
+# monetary = order total, over all orders of customers who ordered at least once. Scores are quintiles
+# from 1 to 5 (5 = most recent / most frequent / highest spend), ties broken by customer_id like
+# pd.qcut(x.rank(method='first'), 5).
+RFM_BUCKETS = 5
+DEFAULT_CHUNK_SIZE = 50000
+
+def create_rfm_tables(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customer_rfm (
+        customer_id INTEGER PRIMARY KEY,
+        last_order_date DATETIME NOT NULL,
+        frequency INTEGER NOT NULL,
+        monetary REAL NOT NULL,
+        recency INTEGER,
+        r_score INTEGER,
+        f_score INTEGER,
+        m_score INTEGER,
+        rfm_score TEXT,
+        FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS rfm_state (
+        state_id INTEGER PRIMARY KEY CHECK (state_id = 1),
+        last_order_id INTEGER NOT NULL,
+        reference_date DATETIME
+    )
+    ''')
+
+def recency_sql(reference_date_param='?'):
+    return f'CAST(julianday({reference_date_param}) - julianday(last_order_date) AS INTEGER)'
+
+def quintile_cuts(cursor, key_sql, params, customer_count):
+    # (key, customer_id) of the first customer of each score from 2 to 5 in ascending (key, customer_id)
+    # order: rank r (0-based) gets r * 5 // n + 1, so score s starts at rank ceil((s - 1) * n / 5).
+    # ROW_NUMBER() sorts in SQLite, which spills to temporary files, and only four rows come back;
+    # scores no customer reaches (fewer than five customers) have no cut point.
+    ranks = [-(-(score - 1) * customer_count // RFM_BUCKETS) + 1 for score in range(2, RFM_BUCKETS + 1)]
+    cuts = dict((rank, (key, customer_id)) for rank, key, customer_id in cursor.execute(f'''
+        SELECT rank, key, customer_id FROM (
+            SELECT ROW_NUMBER() OVER (ORDER BY key, customer_id) AS rank, key, customer_id
+            FROM (SELECT {key_sql} AS key, customer_id FROM customer_rfm)
+        ) WHERE rank IN ({', '.join('?' for _ in ranks)})
+    ''', params + ranks))
+    return [cuts[rank] for rank in ranks if rank in cuts]
+
+def quantile_scores(keys, customer_ids, cuts):
+    # 1 + the number of cut points at or below each (key, customer_id)
+    scores = np.ones(len(keys), dtype=np.int64)
+    for cut_key, cut_id in cuts:
+        scores += (keys > cut_key) | ((keys == cut_key) & (customer_ids >= cut_id))
+    return scores
+
+def write_scores(cursor, reference_date, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Two passes over customer_rfm with memory bounded by chunk_size: SQLite finds the quintile cut
+    # points of each metric, then customers are scored chunk by chunk in customer_id order and only
+    # changed rows are written back. Recency ranks descending (the most recent get 5).
+    customer_count = cursor.execute('SELECT COUNT(*) FROM customer_rfm').fetchone()[0]
+    cuts = [quintile_cuts(cursor, f'-{recency_sql()}', [reference_date], customer_count),
+            quintile_cuts(cursor, 'frequency', [], customer_count),
+            quintile_cuts(cursor, 'monetary', [], customer_count)]
+
+    changed = 0
+    last_customer_id = -1
+    while True:
+        # Keyset pages: every chunk is a new statement, the UPDATEs never run under an open scan
+        rows = cursor.execute(f'''
+            SELECT customer_id, {recency_sql()}, frequency, monetary,
+                   COALESCE(recency, -1), COALESCE(r_score, 0), COALESCE(f_score, 0), COALESCE(m_score, 0)
+            FROM customer_rfm WHERE customer_id > ? ORDER BY customer_id LIMIT ?
+        ''', (reference_date, last_customer_id, chunk_size)).fetchall()
+        if not rows:
+            break
+        last_customer_id = rows[-1][0]
+        customer_ids, recency, frequency, monetary = (np.array(column) for column in list(zip(*rows))[:4])
+        old_scores = np.array([row[4:] for row in rows], dtype=np.int64).T
+        scores = np.vstack([recency, quantile_scores(-recency, customer_ids, cuts[0]),
+                            quantile_scores(frequency, customer_ids, cuts[1]),
+                            quantile_scores(monetary, customer_ids, cuts[2])])
+
+        rows_changed = np.flatnonzero((scores != old_scores).any(axis=0))
+        recency_col, r_col, f_col, m_col = scores[:, rows_changed].tolist()
+        cursor.executemany('''
+            UPDATE customer_rfm SET recency = ?, r_score = ?, f_score = ?, m_score = ?, rfm_score = ?
+            WHERE customer_id = ?
+        ''', [(days, r_score, f_score, m_score, f'{r_score}{f_score}{m_score}', customer_id)
+              for days, r_score, f_score, m_score, customer_id
+              in zip(recency_col, r_col, f_col, m_col, customer_ids[rows_changed].tolist())])
+        changed += len(rows_changed)
+    return changed
+
+def update_rfm(conn, incremental=True):
+    # Returns (scored_customers, folded_orders). The order aggregation is the only pass over orders,
+    # and incremental runs only fold orders added since the last run (orders are assumed append-only,
+    # like in segment_customers). Recency and the quintiles are then recomputed from customer_rfm,
+    # one row per customer.
+    cursor = conn.cursor()
+    create_rfm_tables(cursor)
+
+    max_order_id = cursor.execute('SELECT COALESCE(MAX(order_id), 0) FROM orders').fetchone()[0]
+    state = cursor.execute('SELECT last_order_id FROM rfm_state').fetchone() if incremental else None
+
+    if state is None:
+        cursor.execute('DELETE FROM customer_rfm')
+        last_order_id = 0
+    else:
+        last_order_id = state[0]
+
+    if last_order_id == max_order_id and state is not None:
+        return cursor.execute('SELECT COUNT(*) FROM customer_rfm').fetchone()[0], 0
+
+    cursor.execute('''
+        INSERT INTO customer_rfm (customer_id, last_order_date, frequency, monetary)
+        SELECT customer_id, MAX(order_date), COUNT(*), SUM(total_amount)
+        FROM orders
+        WHERE order_id > ?
+        GROUP BY customer_id
+        ON CONFLICT(customer_id) DO UPDATE SET
+            last_order_date = MAX(last_order_date, excluded.last_order_date),
+            frequency = frequency + excluded.frequency,
+            monetary = monetary + excluded.monetary
+    ''', (last_order_id,))
+    folded_orders = cursor.execute('SELECT COUNT(*) FROM orders WHERE order_id > ?', (last_order_id,)).fetchone()[0]
+
+    reference_date = cursor.execute('SELECT MAX(last_order_date) FROM customer_rfm').fetchone()[0]
+    write_scores(cursor, reference_date)
+
+    cursor.execute('INSERT OR REPLACE INTO rfm_state (state_id, last_order_id, reference_date) VALUES (1, ?, ?)',
+                   (max_order_id, reference_date))
+    scored_customers = cursor.execute('SELECT COUNT(*) FROM customer_rfm').fetchone()[0]
+    return scored_customers, folded_orders
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute RFM scores into the customer_rfm table.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    parser.add_argument('--full', action='store_true', help='recompute from all orders instead of folding in new ones')
+    args = parser.parse_args()
+
+    conn = connect_partitioned(args.db, writable=True)
+    print(f"[*] Updating RFM scores in {args.db}...")
+    started = time.perf_counter()
+    scored_customers, folded_orders = update_rfm(conn, incremental=not args.full)
+    conn.commit()
+    conn.close()
+    print(f"[+] {folded_orders} orders folded in, {scored_customers} customers scored in {time.perf_counter() - started:.2f}s!")
+
+if __name__ == '__main__':
+    main()
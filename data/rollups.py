@@ -0,0 +1,164 @@
+import argparse
+import sys
+import time
+
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Pre-aggregated sales for dashboards: one row per (grain, period, dimension, value).
+# 'total' rows hold the whole period, the other dimensions break it down one column at a time.
+ROLLUP_GRAINS = [('day', 10), ('month', 7)]
+
+# (dimension, value expression) for an orders row named {row}
+ROLLUP_DIMENSIONS = [
+    ('total', "''"),
+    ('order_status', '{row}.order_status'),
+    ('payment_method', '{row}.payment_method'),
+    ('campaign_id', "COALESCE(CAST({row}.campaign_id AS TEXT), 'none')"),
+    ('city', "COALESCE((SELECT city FROM customers WHERE customer_id = {row}.customer_id), 'none')"),
+]
+
+ROLLUP_TRIGGERS = ['sales_rollup_insert', 'sales_rollup_delete', 'sales_rollup_update']
+
+def create_rollup_table(cursor):
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_rollup (
+        grain TEXT NOT NULL,
+        period TEXT NOT NULL,
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        order_count INTEGER NOT NULL,
+        total_amount REAL NOT NULL,
+        shipping_cost REAL NOT NULL,
+        delivered_count INTEGER NOT NULL,
+        delivered_amount REAL NOT NULL,
+        PRIMARY KEY (grain, period, dimension, value)
+    ) WITHOUT ROWID
+    ''')
+
+def dimension_names():
+    return ' UNION ALL '.join(f"SELECT '{dimension}' AS dimension" for dimension, _ in ROLLUP_DIMENSIONS)
+
+def dimension_value(row):
+    # Joined against dimension_names(), turns one orders row into one row per dimension
+    cases = ' '.join(f"WHEN '{dimension}' THEN {expression.format(row=row)}" for dimension, expression in ROLLUP_DIMENSIONS)
+    return f'CASE dims.dimension {cases} END'
+
+def rollup_delta_sql(row, sign):
+    # Adds (sign = '+') or removes (sign = '-') one orders row from every grain and dimension
+    grains = ' UNION ALL '.join(f"SELECT '{grain}' AS grain, {length} AS length" for grain, length in ROLLUP_GRAINS)
+    return f'''
+        INSERT INTO sales_rollup (grain, period, dimension, value, order_count, total_amount, shipping_cost,
+                                  delivered_count, delivered_amount)
+        SELECT grains.grain, substr({row}.order_date, 1, grains.length), dims.dimension, {dimension_value(row)},
+               {sign}1, {sign}{row}.total_amount, {sign}{row}.shipping_cost,
+               {sign}({row}.order_status = 'teslim_edildi'),
+               {sign}(CASE WHEN {row}.order_status = 'teslim_edildi' THEN {row}.total_amount ELSE 0 END)
+        FROM ({grains}) AS grains, ({dimension_names()}) AS dims
+        WHERE true
+        ON CONFLICT (grain, period, dimension, value) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount,
+            shipping_cost = shipping_cost + excluded.shipping_cost,
+            delivered_count = delivered_count + excluded.delivered_count,
+            delivered_amount = delivered_amount + excluded.delivered_amount;
+    '''
+
+def prune_sql(row):
+    # Periods whose last order went away would otherwise stay behind as all-zero rows
+    periods = ', '.join(f"('{grain}', substr({row}.order_date, 1, {length}))" for grain, length in ROLLUP_GRAINS)
+    return f'DELETE FROM sales_rollup WHERE (grain, period) IN (VALUES {periods}) AND order_count = 0;'
+
+def create_rollup_triggers(cursor):
+    # Every later insert, update or delete on orders (--append, notebooks, simulations) keeps the rollup current.
+    # A customer moving to another city is not tracked, refresh_rollups picks that up.
+    # In a compact database orders is a view, whose triggers can only be INSTEAD OF; they fire next to
+    # the trigger that writes orders_data.
+    drop_rollup_triggers(cursor)
+    view_count = cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'view' AND name = 'orders'").fetchone()[0]
+    timing = 'INSTEAD OF' if view_count else 'AFTER'
+    cursor.execute(f'''
+        CREATE TRIGGER sales_rollup_insert {timing} INSERT ON orders BEGIN
+            {rollup_delta_sql('NEW', '+')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER sales_rollup_delete {timing} DELETE ON orders BEGIN
+            {rollup_delta_sql('OLD', '-')}
+            {prune_sql('OLD')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER sales_rollup_update
+        {timing} UPDATE OF customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id ON orders
+        BEGIN
+            {rollup_delta_sql('OLD', '-')}
+            {rollup_delta_sql('NEW', '+')}
+            {prune_sql('OLD')}
+        END
+    ''')
+
+def drop_rollup_triggers(cursor):
+    for trigger_name in ROLLUP_TRIGGERS:
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger_name}')
+
+def refresh_rollups(cursor):
+    # Full rebuild: the day grain from one pass over orders, the month grain rolled up from the days
+    create_rollup_table(cursor)
+    cursor.execute('DELETE FROM sales_rollup')
+    cursor.execute(f'''
+        INSERT INTO sales_rollup (grain, period, dimension, value, order_count, total_amount, shipping_cost,
+                                  delivered_count, delivered_amount)
+        SELECT 'day', substr(o.order_date, 1, 10), dims.dimension, {dimension_value('o')},
+               COUNT(*), SUM(o.total_amount), SUM(o.shipping_cost),
+               SUM(o.order_status = 'teslim_edildi'),
+               SUM(CASE WHEN o.order_status = 'teslim_edildi' THEN o.total_amount ELSE 0 END)
+        FROM orders o, ({dimension_names()}) AS dims
+        GROUP BY 2, 3, 4
+    ''')
+    for grain, length in ROLLUP_GRAINS:
+        if grain == 'day':
+            continue
+        cursor.execute('''
+            INSERT INTO sales_rollup (grain, period, dimension, value, order_count, total_amount, shipping_cost,
+                                      delivered_count, delivered_amount)
+            SELECT ?, substr(period, 1, ?), dimension, value,
+                   SUM(order_count), SUM(total_amount), SUM(shipping_cost), SUM(delivered_count), SUM(delivered_amount)
+            FROM sales_rollup
+            WHERE grain = 'day'
+            GROUP BY 2, 3, 4
+        ''', (grain, length))
+    return cursor.execute('SELECT COUNT(*) FROM sales_rollup').fetchone()[0]
+
+def build_rollups(conn):
+    cursor = conn.cursor()
+    count = refresh_rollups(cursor)
+    create_rollup_triggers(cursor)
+    conn.commit()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the sales_rollup table and its triggers.')
+    parser.add_argument('--db', default='data/ecommerce.db', help='database path (default: data/ecommerce.db)')
+    args = parser.parse_args()
+
+    # Imported here: partitions.py pulls in the compact schema helpers, which import this module
+    from partitions import connect_partitioned, is_partitioned
+
+    conn = connect_partitioned(args.db, writable=True)
+    print(f"[*] Rebuilding sales rollups in {args.db}...")
+    started = time.perf_counter()
+    if is_partitioned(conn.cursor()):
+        # orders is a TEMP view over the year files there, triggers cannot be put on it
+        count = refresh_rollups(conn.cursor())
+        conn.commit()
+        conn.close()
+        print(f"[+] {count} rollup rows written in {time.perf_counter() - started:.2f}s!")
+        return
+    count = build_rollups(conn)
+    conn.close()
+    print(f"[+] {count} rollup rows written in {time.perf_counter() - started:.2f}s, triggers installed!")
+
+if __name__ == '__main__':
+    main()
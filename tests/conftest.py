@@ -0,0 +1,49 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+# The scripts in data/ import each other as top-level modules
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+sys.path.insert(0, DATA_DIR)
+
+# 500 customers: every table gets rows, a generation takes well under a second
+SCALE = '0.1'
+
+def generate(db_path, *args):
+    # Runs the generator CLI like a user would, returns its stdout
+    result = subprocess.run([sys.executable, os.path.join(DATA_DIR, 'generate_data.py'), '--scale', SCALE, '--db', str(db_path), *args],
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    return result.stdout
+
+def table_rows(conn, table):
+    return conn.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+
+def database_rows(db_path, tables):
+    conn = sqlite3.connect(db_path)
+    rows = {table: table_rows(conn, table) for table in tables}
+    conn.close()
+    return rows
+
+@pytest.fixture(scope='session')
+def base_db(tmp_path_factory):
+    # Generated once with the optional derived tables, tests that write work on a copy (db)
+    path = tmp_path_factory.mktemp('base') / 'ecommerce.db'
+    generate(path, '--co-purchase')
+    return path
+
+@pytest.fixture
+def db(base_db, tmp_path):
+    path = tmp_path / 'ecommerce.db'
+    shutil.copyfile(base_db, path)
+    return path
+
+@pytest.fixture
+def conn(db):
+    conn = sqlite3.connect(db)
+    yield conn
+    conn.close()
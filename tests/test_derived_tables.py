@@ -0,0 +1,204 @@
+from datetime import datetime
+
+import pytest
+
+from category_tree import refresh_category_tree
+from co_purchase import frequently_bought_together, update_co_purchase
+from compact_schema import compact_database, is_compact
+from conftest import table_rows
+from rfm import RFM_BUCKETS, update_rfm, write_scores
+from rollups import refresh_rollups
+
+NEW_ORDER = '''
+    INSERT INTO orders (customer_id, order_date, order_status, total_amount, payment_method, shipping_cost, campaign_id)
+    VALUES (1, '2025-06-01 10:00:00', ?, 250.5, ?, 14.99, NULL)
+'''
+
+def rounded(rows):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+def assert_rollups_current(conn):
+    # What the triggers left behind must be what a rebuild from orders writes
+    maintained = rounded(table_rows(conn, 'sales_rollup'))
+    refresh_rollups(conn.cursor())
+    assert rounded(table_rows(conn, 'sales_rollup')) == maintained
+
+def change_orders(conn):
+    # One of each trigger: a new order, a status change, a moved date, a removed order
+    conn.execute(NEW_ORDER, ('teslim_edildi', 'kredi_karti'))
+    conn.execute("UPDATE orders SET order_status = 'iptal' WHERE order_id = 2")
+    conn.execute("UPDATE orders SET order_date = '2023-01-15 09:30:00', total_amount = total_amount + 10 WHERE order_id = 3")
+    conn.execute('DELETE FROM order_items WHERE order_id = 4')
+    conn.execute('DELETE FROM orders WHERE order_id = 4')
+
+# ============================================
+# SALES ROLLUP
+# ============================================
+
+def test_rollup_triggers_match_a_rebuild(conn):
+    change_orders(conn)
+    assert_rollups_current(conn)
+
+def test_rollup_drops_emptied_groups(conn):
+    # A day whose only order goes away leaves no zero rows behind
+    conn.execute(NEW_ORDER.replace('2025-06-01', '2019-01-01'), ('teslim_edildi', 'kredi_karti'))
+    assert conn.execute("SELECT COUNT(*) FROM sales_rollup WHERE period = '2019-01-01'").fetchone()[0] > 0
+    conn.execute("DELETE FROM orders WHERE order_date LIKE '2019-01-01%'")
+    assert conn.execute("SELECT COUNT(*) FROM sales_rollup WHERE period LIKE '2019-01%'").fetchone()[0] == 0
+
+# ============================================
+# COMPACT SCHEMA
+# ============================================
+
+def test_compact_views_return_the_original_rows(conn):
+    original = {table: table_rows(conn, table) for table in ['customers', 'orders']}
+    compact_database(conn, vacuum=False)
+    assert is_compact(conn.cursor())
+    for table, rows in original.items():
+        assert table_rows(conn, table) == rows, table
+
+def test_compact_views_accept_writes(conn):
+    compact_database(conn, vacuum=False)
+    # A value never seen before gets a new code
+    conn.execute(NEW_ORDER, ('teslim_edildi', 'kripto_para'))
+    order_id = conn.execute('SELECT MAX(order_id) FROM orders').fetchone()[0]
+    assert conn.execute('SELECT order_status, payment_method FROM orders WHERE order_id = ?', (order_id,)).fetchone() == \
+        ('teslim_edildi', 'kripto_para')
+    assert conn.execute("SELECT COUNT(*) FROM payment_methods WHERE payment_method = 'kripto_para'").fetchone()[0] == 1
+
+    conn.execute("UPDATE orders SET order_status = 'hazirlaniyor' WHERE order_id = ?", (order_id,))
+    assert conn.execute('''
+        SELECT s.order_status FROM orders_data d JOIN order_statuses s USING (order_status_id) WHERE d.order_id = ?
+    ''', (order_id,)).fetchone() == ('hazirlaniyor',)
+
+    conn.execute("UPDATE customers SET city = 'Kars', customer_segment = 'gold' WHERE customer_id = 1")
+    assert conn.execute('SELECT city, customer_segment FROM customers WHERE customer_id = 1').fetchone() == ('Kars', 'gold')
+
+    conn.execute('DELETE FROM orders WHERE order_id = ?', (order_id,))
+    assert conn.execute('SELECT COUNT(*) FROM orders_data WHERE order_id = ?', (order_id,)).fetchone()[0] == 0
+
+def test_compact_keeps_the_rollup_triggers(conn):
+    compact_database(conn, vacuum=False)
+    change_orders(conn)
+    assert_rollups_current(conn)
+
+# ============================================
+# CO-PURCHASE
+# ============================================
+
+def test_co_purchase_counts_match_a_self_join(conn):
+    pairs = conn.execute('''
+        SELECT a.product_id, b.product_id, COUNT(DISTINCT a.order_id)
+        FROM order_items a JOIN order_items b ON b.order_id = a.order_id AND b.product_id > a.product_id
+        GROUP BY 1, 2 ORDER BY 1, 2
+    ''').fetchall()
+    assert table_rows(conn, 'product_pairs') == pairs
+    products = conn.execute('SELECT product_id, COUNT(DISTINCT order_id) FROM order_items GROUP BY 1 ORDER BY 1').fetchall()
+    assert table_rows(conn, 'product_orders') == products
+    assert conn.execute('SELECT order_count FROM co_purchase_state').fetchone()[0] == \
+        conn.execute('SELECT COUNT(DISTINCT order_id) FROM order_items').fetchone()[0]
+
+def test_co_purchase_chunks_keep_orders_whole(conn):
+    full = table_rows(conn, 'product_pairs')
+    # Chunks smaller than most baskets: every order still has to be counted in one piece
+    update_co_purchase(conn, incremental=False, chunk_size=3)
+    assert table_rows(conn, 'product_pairs') == full
+
+def test_co_purchase_folds_in_new_orders(conn):
+    conn.execute(NEW_ORDER, ('teslim_edildi', 'kredi_karti'))
+    order_id = conn.execute('SELECT MAX(order_id) FROM orders').fetchone()[0]
+    conn.executemany('INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount_rate) VALUES (?, ?, 1, 10, 0)',
+                     [(order_id, 1), (order_id, 2), (order_id, 2), (order_id, 3)])
+    _, folded_orders = update_co_purchase(conn)
+    assert folded_orders == 1
+    incremental = table_rows(conn, 'product_pairs'), table_rows(conn, 'product_orders')
+    update_co_purchase(conn, incremental=False)
+    assert (table_rows(conn, 'product_pairs'), table_rows(conn, 'product_orders')) == incremental
+
+def test_bought_together_reads_both_halves(conn):
+    product_id = conn.execute('SELECT first_product_id FROM product_pairs GROUP BY 1 ORDER BY COUNT(*) DESC').fetchone()[0]
+    partners = conn.execute('''
+        SELECT second_product_id FROM product_pairs WHERE first_product_id = ?
+        UNION SELECT first_product_id FROM product_pairs WHERE second_product_id = ?
+    ''', (product_id, product_id)).fetchall()
+    rows = frequently_bought_together(conn, product_id, limit=1000)
+    assert sorted(row[0] for row in rows) == sorted(row[0] for row in partners)
+
+# ============================================
+# CATEGORY TREE
+# ============================================
+
+def test_category_triggers_match_a_rebuild(conn):
+    conn.execute("INSERT INTO categories (category_name, parent_category_id) VALUES ('Yeni', NULL)")
+    new_id = conn.execute('SELECT MAX(category_id) FROM categories').fetchone()[0]
+    conn.execute("INSERT INTO categories (category_name, parent_category_id) VALUES ('Yeni Alt', ?)", (new_id,))
+    child_id = new_id + 1
+    # A whole top-level subtree moves under the new leaf, the tree gets a third level
+    top_id = conn.execute('SELECT MIN(category_id) FROM categories WHERE parent_category_id IS NULL').fetchone()[0]
+    conn.execute('UPDATE categories SET parent_category_id = ? WHERE category_id = ?', (child_id, top_id))
+    leaf_id = conn.execute('''
+        SELECT MAX(category_id) FROM categories
+        WHERE category_id NOT IN (SELECT parent_category_id FROM categories WHERE parent_category_id IS NOT NULL)
+    ''').fetchone()[0]
+    conn.execute('DELETE FROM categories WHERE category_id = ?', (leaf_id,))
+
+    maintained = table_rows(conn, 'category_closure'), table_rows(conn, 'category_roots')
+    assert conn.execute('SELECT root_category_id, category_level FROM category_roots WHERE category_id = ?',
+                        (top_id,)).fetchone() == (new_id, 2)
+    refresh_category_tree(conn.cursor())
+    assert (table_rows(conn, 'category_closure'), table_rows(conn, 'category_roots')) == maintained
+
+def test_categories_keep_their_columns(conn):
+    assert [row[1] for row in conn.execute('PRAGMA table_info(categories)')] == ['category_id', 'category_name', 'parent_category_id']
+
+# ============================================
+# RFM
+# ============================================
+
+def reference_scores(conn):
+    # 02_temel_python.ipynb's quintiles, ranked in Python: rank i of n gets i * 5 // n + 1, ties by customer_id
+    rows = conn.execute('SELECT customer_id, last_order_date, frequency, monetary FROM customer_rfm').fetchall()
+    reference_date = max(datetime.fromisoformat(row[1]) for row in rows)
+    recency = {row[0]: (reference_date - datetime.fromisoformat(row[1])).days for row in rows}
+    metrics = [
+        {customer_id: -days for customer_id, days in recency.items()},
+        {row[0]: row[2] for row in rows},
+        {row[0]: row[3] for row in rows},
+    ]
+    scores = {customer_id: [days] for customer_id, days in recency.items()}
+    for metric in metrics:
+        ranked = sorted(metric, key=lambda customer_id: (metric[customer_id], customer_id))
+        for rank, customer_id in enumerate(ranked):
+            scores[customer_id].append(rank * RFM_BUCKETS // len(ranked) + 1)
+    return sorted((customer_id, *values) for customer_id, values in scores.items())
+
+def stored_scores(conn):
+    return conn.execute('SELECT customer_id, recency, r_score, f_score, m_score FROM customer_rfm ORDER BY 1').fetchall()
+
+def test_rfm_matches_the_reference_quintiles(conn):
+    assert stored_scores(conn) == reference_scores(conn)
+    assert conn.execute("SELECT COUNT(*) FROM customer_rfm WHERE rfm_score <> r_score || f_score || m_score").fetchone()[0] == 0
+
+def test_rfm_aggregates_match_orders(conn):
+    expected = conn.execute('''
+        SELECT customer_id, MAX(order_date), COUNT(*), ROUND(SUM(total_amount), 6) FROM orders GROUP BY 1 ORDER BY 1
+    ''').fetchall()
+    assert conn.execute('SELECT customer_id, last_order_date, frequency, ROUND(monetary, 6) FROM customer_rfm ORDER BY 1').fetchall() == expected
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_rfm_scores_do_not_depend_on_the_chunk_size(conn, chunk_size):
+    expected = stored_scores(conn)
+    conn.execute('UPDATE customer_rfm SET recency = NULL, r_score = NULL, f_score = NULL, m_score = NULL, rfm_score = NULL')
+    reference_date = conn.execute('SELECT reference_date FROM rfm_state').fetchone()[0]
+    assert write_scores(conn.cursor(), reference_date, chunk_size) == len(expected)
+    assert stored_scores(conn) == expected
+
+def test_rfm_incremental_matches_a_full_run(conn):
+    conn.execute(NEW_ORDER, ('teslim_edildi', 'kredi_karti'))
+    conn.execute(NEW_ORDER.replace('VALUES (1,', 'VALUES (2,'), ('kargoda', 'havale'))
+    _, folded_orders = update_rfm(conn)
+    assert folded_orders == 2
+    incremental = rounded(table_rows(conn, 'customer_rfm'))
+    update_rfm(conn, incremental=False)
+    assert rounded(table_rows(conn, 'customer_rfm')) == incremental
+    assert stored_scores(conn) == reference_scores(conn)
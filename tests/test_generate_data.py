@@ -0,0 +1,172 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from conftest import database_rows, generate, table_rows
+from co_purchase import update_co_purchase
+from generate_data import segment_customers
+from rfm import update_rfm
+from rollups import refresh_rollups
+
+TABLES = ['categories', 'campaigns', 'products', 'customers', 'orders', 'order_items', 'reviews',
+          'customer_rfm', 'sales_rollup', 'product_pairs', 'product_orders']
+# Generated before any order, so both engines start from the same rows (segments come from the orders)
+SHARED_TABLES = ['categories', 'campaigns', 'products', 'customers']
+APPEND_UNTIL = '2026-03-01'
+
+def without_segment(rows):
+    return [row[:-1] for row in rows]
+
+def rounded(rows):
+    # Sums folded in batches and sums over all rows differ in the last bits of a float
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+def recomputed_totals(conn):
+    # total_amount from the order's items, shipping and campaign, summed in item order like build_order
+    discounts = dict(conn.execute('SELECT campaign_id, discount_rate FROM campaigns'))
+    lines = {}
+    for order_id, quantity, unit_price, discount_rate in conn.execute(
+            'SELECT order_id, quantity, unit_price, discount_rate FROM order_items ORDER BY item_id'):
+        lines.setdefault(order_id, []).append(quantity * unit_price * (1 - discount_rate / 100))
+    totals = {}
+    for order_id, shipping_cost, campaign_id in conn.execute('SELECT order_id, shipping_cost, campaign_id FROM orders'):
+        total = shipping_cost
+        for line_total in lines.get(order_id, []):
+            total += line_total
+        total = round(total, 2)
+        if campaign_id:
+            total = round(total * (1 - discounts[campaign_id] / 100), 2)
+        totals[order_id] = total
+    return totals
+
+# ============================================
+# REPRODUCIBILITY
+# ============================================
+
+def test_same_seed_same_database(base_db, tmp_path):
+    generate(tmp_path / 'again.db', '--co-purchase')
+    assert database_rows(tmp_path / 'again.db', TABLES) == database_rows(base_db, TABLES)
+
+def test_other_seed_other_orders(base_db, tmp_path):
+    generate(tmp_path / 'other.db', '--seed', '7')
+    assert database_rows(tmp_path / 'other.db', ['orders']) != database_rows(base_db, ['orders'])
+
+def test_sharded_runs_are_byte_identical(tmp_path):
+    generate(tmp_path / 'first.db', '--workers', '2')
+    generate(tmp_path / 'second.db', '--workers', '2')
+    assert (tmp_path / 'first.db').read_bytes() == (tmp_path / 'second.db').read_bytes()
+
+def test_sharded_run_replaces_existing_file(base_db, tmp_path):
+    # A file left over from another run must not change the result
+    generate(tmp_path / 'fresh.db', '--workers', '2')
+    shutil.copyfile(base_db, tmp_path / 'reused.db')
+    generate(tmp_path / 'reused.db', '--workers', '2')
+    assert (tmp_path / 'reused.db').read_bytes() == (tmp_path / 'fresh.db').read_bytes()
+
+def test_sharded_run_keeps_the_row_counts(base_db, tmp_path):
+    generate(tmp_path / 'sharded.db', '--workers', '2')
+    sharded = sqlite3.connect(tmp_path / 'sharded.db')
+    plain = sqlite3.connect(base_db)
+    for table in ['customers', 'products', 'reviews']:
+        assert sharded.execute(f'SELECT COUNT(*) FROM {table}').fetchone() == plain.execute(f'SELECT COUNT(*) FROM {table}').fetchone()
+    assert sharded.execute('SELECT COUNT(*) FROM orders o LEFT JOIN customers c USING (customer_id) WHERE c.customer_id IS NULL').fetchone()[0] == 0
+    sharded.close()
+    plain.close()
+
+# ============================================
+# ENGINES
+# ============================================
+
+@pytest.fixture(scope='module')
+def engine_dbs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('engines')
+    for engine in ['python', 'numpy']:
+        generate(directory / f'{engine}.db', '--engine', engine)
+    return {engine: sqlite3.connect(directory / f'{engine}.db') for engine in ['python', 'numpy']}
+
+def test_engines_share_everything_before_the_orders(engine_dbs):
+    for table in SHARED_TABLES:
+        numpy_rows, python_rows = table_rows(engine_dbs['numpy'], table), table_rows(engine_dbs['python'], table)
+        if table == 'customers':
+            numpy_rows, python_rows = without_segment(numpy_rows), without_segment(python_rows)
+        assert numpy_rows == python_rows, table
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_order_totals_follow_the_items(engine_dbs, engine):
+    conn = engine_dbs[engine]
+    totals = recomputed_totals(conn)
+    stored = dict(conn.execute('SELECT order_id, total_amount FROM orders'))
+    # np.round and round() may disagree on the last cent of a half-way value
+    assert stored == pytest.approx(totals, abs=0.011)
+
+@pytest.mark.parametrize('engine', ['python', 'numpy'])
+def test_orders_are_well_formed(engine_dbs, engine):
+    conn = engine_dbs[engine]
+    # Contiguous ids, at least one item each, no product twice in an order, dates after registration
+    assert conn.execute('SELECT MIN(order_id), MAX(order_id) = COUNT(*) FROM orders').fetchone() == (1, 1)
+    assert conn.execute('SELECT COUNT(*) FROM orders WHERE order_id NOT IN (SELECT order_id FROM order_items)').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM order_items GROUP BY order_id, product_id HAVING COUNT(*) > 1)').fetchone()[0] == 0
+    assert conn.execute('''
+        SELECT COUNT(*) FROM orders o JOIN customers c USING (customer_id) WHERE o.order_date < c.registration_date
+    ''').fetchone()[0] == 0
+
+def test_engines_draw_from_the_same_model(engine_dbs):
+    # Different random streams, so only the distributions can match
+    def summary(conn):
+        orders, items, amount = conn.execute('''
+            SELECT COUNT(*), (SELECT COUNT(*) FROM order_items), AVG(total_amount) FROM orders
+        ''').fetchone()
+        statuses = {row[0] for row in conn.execute('SELECT DISTINCT order_status FROM orders')}
+        return orders, items / orders, amount, statuses
+
+    python_orders, python_items, python_amount, python_statuses = summary(engine_dbs['python'])
+    numpy_orders, numpy_items, numpy_amount, numpy_statuses = summary(engine_dbs['numpy'])
+    assert numpy_orders == pytest.approx(python_orders, rel=0.2)
+    assert numpy_items == pytest.approx(python_items, rel=0.1)
+    assert numpy_amount == pytest.approx(python_amount, rel=0.2)
+    assert numpy_statuses == python_statuses
+
+# ============================================
+# APPEND
+# ============================================
+
+@pytest.fixture
+def appended_db(db):
+    generate(db, '--append', '--until', APPEND_UNTIL)
+    return db
+
+def test_append_adds_history(base_db, appended_db):
+    before = sqlite3.connect(base_db)
+    after = sqlite3.connect(appended_db)
+    for table in ['customers', 'orders', 'order_items']:
+        assert after.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] > before.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    assert after.execute('SELECT MAX(order_date) FROM orders').fetchone()[0] < APPEND_UNTIL
+    assert after.execute('SELECT history_end FROM generation_state').fetchone()[0][:10] == APPEND_UNTIL
+    # Earlier rows are left alone
+    for table in ['orders', 'order_items']:
+        old_rows = table_rows(before, table)
+        assert table_rows(after, table)[:len(old_rows)] == old_rows
+    before.close()
+    after.close()
+
+def test_append_is_reproducible(base_db, appended_db, tmp_path):
+    shutil.copyfile(base_db, tmp_path / 'again.db')
+    generate(tmp_path / 'again.db', '--append', '--until', APPEND_UNTIL)
+    assert database_rows(tmp_path / 'again.db', TABLES) == database_rows(appended_db, TABLES)
+
+def test_append_updates_match_a_full_recompute(appended_db):
+    conn = sqlite3.connect(appended_db)
+    incremental = {table: rounded(table_rows(conn, table)) for table in ['customers', 'customer_rfm', 'sales_rollup', 'product_pairs', 'product_orders']}
+
+    segment_customers(conn, incremental=False)
+    update_rfm(conn, incremental=False)
+    refresh_rollups(conn.cursor())
+    update_co_purchase(conn, incremental=False)
+    for table, rows in incremental.items():
+        assert rounded(table_rows(conn, table)) == rows, table
+    conn.close()
+
+def test_resegment_without_new_orders_changes_nothing(db):
+    output = generate(db, '--resegment')
+    assert '[+] 0 of' in output
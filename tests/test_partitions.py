@@ -0,0 +1,110 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from conftest import DATA_DIR, generate, table_rows
+from partitions import connect_partitioned, merge_partitions, partition_directory
+from query_cache import QueryCache
+
+TABLES = ['customers', 'orders', 'order_items', 'reviews', 'customer_rfm', 'campaigns']
+YEAR_DATES = {'orders': 'order_date', 'reviews': 'review_date'}
+
+def rounded(rows):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+@pytest.fixture(scope='module')
+def partitioned_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp('partitioned') / 'ecommerce.db'
+    generate(path, '--partition-by-year')
+    return path
+
+@pytest.fixture
+def plain(base_db):
+    conn = sqlite3.connect(base_db)
+    yield conn
+    conn.close()
+
+def test_views_return_the_unpartitioned_rows(partitioned_db, plain):
+    conn = connect_partitioned(partitioned_db)
+    for table in TABLES:
+        assert table_rows(conn, table) == table_rows(plain, table), table
+    conn.close()
+
+def test_main_file_has_no_partitioned_tables(partitioned_db):
+    conn = sqlite3.connect(partitioned_db)
+    with pytest.raises(sqlite3.OperationalError, match='no such table: orders'):
+        conn.execute('SELECT COUNT(*) FROM orders')
+    conn.close()
+
+def test_every_year_file_holds_its_year(partitioned_db):
+    directory = partition_directory(partitioned_db)
+    years = sorted(int(name[:4]) for name in os.listdir(directory))
+    assert years
+    for year in years:
+        conn = sqlite3.connect(os.path.join(directory, f'{year}.db'))
+        for table, column in YEAR_DATES.items():
+            assert conn.execute(f'SELECT COUNT(*) FROM {table} WHERE substr({column}, 1, 4) <> ?', (str(year),)).fetchone()[0] == 0
+        # Items follow their order into the order's year
+        assert conn.execute('SELECT COUNT(*) FROM order_items WHERE order_id NOT IN (SELECT order_id FROM orders)').fetchone()[0] == 0
+        conn.close()
+
+def test_years_limit_the_views(partitioned_db, plain):
+    year = plain.execute('SELECT MAX(substr(order_date, 1, 4)) FROM orders').fetchone()[0]
+    conn = connect_partitioned(partitioned_db, years=[int(year)])
+    assert table_rows(conn, 'orders') == plain.execute('SELECT * FROM orders WHERE substr(order_date, 1, 4) = ? ORDER BY 1', (year,)).fetchall()
+    conn.close()
+
+def test_closed_years_are_read_only(partitioned_db):
+    conn = connect_partitioned(partitioned_db, writable=True)
+    first_year = conn.execute('SELECT MIN(year) FROM partitions').fetchone()[0]
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        conn.execute(f'DELETE FROM p{first_year}.orders')
+    conn.close()
+
+def test_merged_copy_matches_the_unpartitioned_database(partitioned_db, plain, tmp_path):
+    copy = sqlite3.connect(tmp_path / 'merged.db')
+    source = sqlite3.connect(partitioned_db)
+    source.backup(copy)
+    source.close()
+    merge_partitions(copy, partitioned_db)
+    assert copy.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'partitions'").fetchone()[0] == 0
+    for table in TABLES:
+        assert table_rows(copy, table) == table_rows(plain, table), table
+    # The rollup triggers are back on the merged orders table
+    assert copy.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'orders'").fetchone()[0] == 3
+    copy.close()
+
+def test_append_matches_an_unpartitioned_append(partitioned_db, db, tmp_path):
+    # A copy with its year files, the module-wide database stays as generated. The catalog keeps the
+    # year files relative to the main file, so the copy keeps its name.
+    (tmp_path / 'partitioned').mkdir()
+    appended = tmp_path / 'partitioned' / 'ecommerce.db'
+    shutil.copyfile(partitioned_db, appended)
+    shutil.copytree(partition_directory(partitioned_db), partition_directory(appended))
+
+    generate(appended, '--append', '--until', '2026-03-01')
+    generate(db, '--append', '--until', '2026-03-01')
+    conn = connect_partitioned(appended)
+    plain = sqlite3.connect(db)
+    for table in TABLES:
+        assert table_rows(conn, table) == table_rows(plain, table), table
+    assert rounded(conn.execute('SELECT * FROM sales_rollup ORDER BY 1, 2, 3, 4').fetchall()) == \
+        rounded(plain.execute('SELECT * FROM sales_rollup ORDER BY 1, 2, 3, 4').fetchall())
+    conn.close()
+    plain.close()
+
+def test_query_cache_reads_partitioned_databases(partitioned_db, plain):
+    cache = QueryCache(str(partitioned_db))
+    assert cache.fetchall('SELECT COUNT(*) FROM orders') == plain.execute('SELECT COUNT(*) FROM orders').fetchall()
+    cache.close()
+
+@pytest.mark.parametrize('script', ['date_keys.py', 'compact_schema.py', 'review_search.py'])
+def test_single_file_tools_refuse_partitioned_databases(partitioned_db, script):
+    result = subprocess.run([sys.executable, os.path.join(DATA_DIR, script), '--db', str(partitioned_db)],
+                            capture_output=True, text=True)
+    assert result.returncode == 1
+    assert result.stdout.startswith('[!] Partitioned databases')
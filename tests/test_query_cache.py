@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from query_cache import QueryCache
+
+STATUS_COUNTS = 'SELECT order_status, COUNT(*) FROM orders GROUP BY order_status ORDER BY order_status'
+
+@pytest.fixture
+def cache(db):
+    cache = QueryCache(str(db))
+    yield cache
+    cache.close()
+
+def test_repeated_queries_are_served_from_the_cache(cache):
+    first = cache.fetchall(STATUS_COUNTS)
+    assert cache.fetchall(STATUS_COUNTS) == first
+    assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'bypassed': 0}
+
+def test_parameters_are_part_of_the_key(cache):
+    sql = 'SELECT COUNT(*) FROM orders WHERE customer_id = ?'
+    assert cache.fetchall(sql, (1,)) != cache.fetchall(sql, (-1,))
+    assert cache.stats()['misses'] == 2
+
+def test_a_commit_invalidates_the_cache(cache, db):
+    before = cache.fetchall('SELECT COUNT(*) FROM orders')[0][0]
+    conn = sqlite3.connect(db)
+    conn.execute("DELETE FROM orders WHERE order_id = 1")
+    conn.commit()
+    conn.close()
+    assert cache.fetchall('SELECT COUNT(*) FROM orders')[0][0] == before - 1
+    assert cache.stats()['hits'] == 0
+
+def test_a_rebuilt_file_invalidates_the_cache(cache, db, tmp_path):
+    # --bulk-load and --workers write a new file under the same name
+    cache.fetchall('SELECT COUNT(*) FROM customers')
+    conn = sqlite3.connect(tmp_path / 'other.db')
+    conn.execute('CREATE TABLE customers (customer_id INTEGER PRIMARY KEY)')
+    conn.commit()
+    conn.close()
+    (tmp_path / 'other.db').replace(db)
+    assert cache.fetchall('SELECT COUNT(*) FROM customers') == [(0,)]
+
+@pytest.mark.parametrize('sql', [
+    "SELECT date('now')",
+    "SELECT COUNT(*) FROM orders WHERE order_date >= date('now', '-30 days')",
+    'SELECT CURRENT_TIMESTAMP',
+    'SELECT customer_id FROM customers ORDER BY RANDOM() LIMIT 5',
+])
+def test_volatile_queries_are_never_cached(cache, sql):
+    cache.fetchall(sql)
+    cache.fetchall(sql)
+    assert cache.stats() == {'entries': 0, 'hits': 0, 'misses': 0, 'bypassed': 2}
+
+def test_large_results_are_not_kept(db):
+    cache = QueryCache(str(db), max_rows=10)
+    cache.fetchall('SELECT customer_id FROM customers')
+    cache.fetchall('SELECT customer_id FROM customers')
+    assert cache.stats()['entries'] == 0
+    assert cache.stats()['hits'] == 0
+    cache.close()
+
+def test_frames_are_copies(cache):
+    frame = cache.read_frame('SELECT customer_id, total_amount FROM orders ORDER BY order_id LIMIT 5')
+    frame.loc[0, 'total_amount'] = -1
+    assert cache.read_frame('SELECT customer_id, total_amount FROM orders ORDER BY order_id LIMIT 5').loc[0, 'total_amount'] != -1
+
+def test_pooled_connections_are_read_only(cache):
+    with pytest.raises(sqlite3.OperationalError, match='readonly'):
+        cache.execute('DELETE FROM orders')